@@ -0,0 +1,20 @@
+#!/bin/sh
+# Start RabbitMQ with the plugins and policies the livetiming topology needs
+set -e
+
+# Shard queues are fed by a consistent-hash exchange
+rabbitmq-plugins enable --offline rabbitmq_consistent_hash_exchange
+
+# Expired and rejected messages of the timing/sensor queues (and their shards)
+# are dead-lettered to quarantine. A policy applies to queues that already
+# exist; a queue argument would need them to be deleted and declared again.
+(
+    until rabbitmqctl -q await_startup >/dev/null 2>&1; do
+        sleep 1
+    done
+    rabbitmqctl set_policy --apply-to queues livetiming-dead-letter \
+        '^(timing|sensor)_data(\.shard\.[0-9]+)?$' \
+        '{"dead-letter-exchange": "livetiming.quarantine"}'
+) &
+
+exec rabbitmq-server
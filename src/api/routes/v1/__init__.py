@@ -1,3 +1,4 @@
+from .admin import router as admin_router
 from .rest import router as rest_router
 from .websocket import router as websocket_router
 from fastapi import APIRouter
@@ -6,3 +7,4 @@ from fastapi import APIRouter
 router = APIRouter()
 router.include_router(rest_router, tags=["rest"])
 router.include_router(websocket_router, prefix="/ws", tags=["websocket"])
+router.include_router(admin_router, prefix="/admin", tags=["admin"])
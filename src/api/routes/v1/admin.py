@@ -0,0 +1,141 @@
+import base64
+import hmac
+import logging
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from config import settings
+from models.schemas import HeldMessage, HeldQueueResponse, LogLevelUpdate
+from services.codec import CodecError, decode
+from services.redis_service import RedisService
+from services.structured_logging import get_levels, set_level
+
+logger = logging.getLogger(__name__)
+
+redis_service = RedisService()
+# Created by the first queue request: aio-pika is slow to import and the
+# endpoints are rarely used
+rabbitmq_service = None
+
+
+class HeldQueue(str, Enum):
+    """Queues holding messages the consumer gave up on"""
+
+    quarantine = "quarantine"
+    dead_letter = "dead_letter"
+
+    @property
+    def queue_name(self) -> str:
+        if self is HeldQueue.quarantine:
+            return settings.QUARANTINE_QUEUE
+        return settings.DEAD_LETTER_QUEUE
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject the request unless it carries ADMIN_TOKEN; without one, reject all"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not hmac.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+async def broker():
+    """The API's broker connection; an unreachable broker is a 503"""
+    global rabbitmq_service
+    from aio_pika.exceptions import AMQPConnectionError
+    from services.rabbitmq_service import AsyncRabbitMQService
+
+    if rabbitmq_service is None:
+        rabbitmq_service = AsyncRabbitMQService()
+    try:
+        yield rabbitmq_service
+    except AMQPConnectionError:
+        raise HTTPException(status_code=503, detail="Broker unavailable")
+
+
+async def close_broker() -> None:
+    """Close the broker connection, if one was made"""
+    if rabbitmq_service is not None:
+        await rabbitmq_service.close()
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/logging")
+async def get_log_levels() -> Dict[str, str]:
+    """Log levels of this process: the root logger and any overridden loggers"""
+    return get_levels()
+
+
+@router.put("/logging")
+async def update_log_level(update: LogLevelUpdate):
+    """Change a log level here and, through Redis, in every API and consumer process"""
+    try:
+        set_level(update.level, update.logger)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    command = update.model_dump()
+    try:
+        await redis_service.publish(settings.LOG_LEVEL_CHANNEL, command)
+        propagated = True
+    except Exception:
+        # Already applied locally; other processes keep their level
+        propagated = False
+    return {**command, "level": update.level.upper(), "propagated": propagated}
+
+
+def _held_message(message: Any) -> HeldMessage:
+    from services.rabbitmq_service import ATTEMPTS_HEADER
+
+    headers = {
+        name: value.decode(errors="replace") if isinstance(value, bytes) else value
+        for name, value in (message.headers or {}).items()
+    }
+    held = HeldMessage(
+        routing_key=headers.get("x-original-routing-key") or message.routing_key or "",
+        reason=headers.get("x-reject-reason") or headers.get("x-first-death-reason"),
+        attempts=int(headers.get(ATTEMPTS_HEADER, 0)),
+        headers=headers,
+    )
+    try:
+        held.payload = decode(message.body, message.content_type)
+    except CodecError:
+        held.raw = base64.b64encode(message.body).decode()
+    return held
+
+
+@router.get("/queues/{queue}", response_model=HeldQueueResponse)
+async def inspect_queue(
+    queue: HeldQueue,
+    limit: int = Query(20, ge=1, le=1000),
+    rabbitmq=Depends(broker),
+):
+    """The oldest quarantined or dead-lettered messages, left in the queue"""
+    count, messages = await rabbitmq.peek_messages(queue.queue_name, limit)
+    return HeldQueueResponse(
+        queue=queue.queue_name,
+        message_count=count,
+        messages=[_held_message(message) for message in messages],
+    )
+
+
+@router.post("/queues/{queue}/replay")
+async def replay_queue(
+    queue: HeldQueue,
+    limit: int = Query(100, ge=1, le=100000),
+    rabbitmq=Depends(broker),
+):
+    """Publish the oldest ``limit`` messages again under their original routing key"""
+    replayed = await rabbitmq.replay_messages(queue.queue_name, limit)
+    return {"queue": queue.queue_name, "replayed": replayed}
+
+
+@router.delete("/queues/{queue}")
+async def purge_queue(queue: HeldQueue, rabbitmq=Depends(broker)):
+    """Delete every message in the queue"""
+    purged = await rabbitmq.purge_queue(queue.queue_name)
+    logger.warning("Purged %d messages from %s", purged, queue.queue_name)
+    return {"queue": queue.queue_name, "purged": purged}
@@ -1,6 +1,56 @@
-from fastapi import APIRouter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from config import settings
+from models.schemas import (
+    DownsampleMethod,
+    LapRecord,
+    SensorHistoryPoint,
+    SensorHistoryResponse,
+    SensorResponse,
+    StandingsResponse,
+    TimingBoardResponse,
+    TimingHistoryResponse,
+    TimingResponse,
+)
+from services.latest_cache import Cached, etag_matches, latest_values
+from services.redis_service import (
+    RedisService,
+    stream_id_ms,
+    timing_key,
+    to_epoch_ms,
+)
 
 router = APIRouter()
+redis_service = RedisService()
+# History cursors are the stream ID of the last entry of the previous page
+CURSOR_PATTERN = r"^\d+-\d+$"
+# Opened by the first history request, like the NumPy-based modules it needs
+cold_store = None
+
+
+def _from_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def _to_ms(value: Optional[datetime]) -> Optional[int]:
+    return None if value is None else to_epoch_ms(value)
+
+
+def _not_modified(request: Request, response: Response, cached: Cached) -> bool:
+    """Set the validators of a latest-value response; True if the client's
+    copy is current and a bare 304 should be sent instead"""
+    response.headers["ETag"] = cached.etag
+    response.headers["Cache-Control"] = "no-cache"
+    return etag_matches(request.headers.get("if-none-match"), cached.etag)
+
+
+def _304(cached: Cached) -> Response:
+    return Response(
+        status_code=304, headers={"ETag": cached.etag, "Cache-Control": "no-cache"}
+    )
 
 
 @router.get("/")
@@ -11,3 +61,179 @@ async def root():
 @router.get("/status")
 async def status():
     return {"status": "operational"}
+
+
+@router.get("/timing", response_model=TimingBoardResponse)
+async def get_timing_board(request: Request, response: Response):
+    """Latest lap and summary of every device, keyed by device_id"""
+    cached = await latest_values.timing_board(redis_service.get_timing_board)
+    if _not_modified(request, response, cached):
+        return _304(cached)
+    return TimingBoardResponse(devices=cached.value)
+
+
+@router.get("/standings", response_model=StandingsResponse)
+async def get_standings():
+    """Running order with gaps, and the overall best lap and sectors"""
+    return StandingsResponse(**await redis_service.get_standings())
+
+
+@router.get("/timing/{device_id}", response_model=TimingResponse)
+async def get_timing(device_id: str, request: Request, response: Response):
+    """Latest and best lap for a device"""
+    cached = await latest_values.timing_row(
+        device_id, lambda: redis_service.get_timing_latest(device_id)
+    )
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Timing device not found")
+    if _not_modified(request, response, cached):
+        return _304(cached)
+    row = cached.value
+    return TimingResponse(
+        device_id=device_id,
+        latest_lap=row["latest_lap"],
+        best_lap=row["best_lap"],
+        last_update=_from_ms(row["last_update"]),
+    )
+
+
+@router.get("/timing/{device_id}/history", response_model=TimingHistoryResponse)
+async def get_timing_history(
+    device_id: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=10000),
+    cursor: Optional[str] = Query(
+        None, pattern=CURSOR_PATTERN, description="next_cursor of the previous page"
+    ),
+):
+    """Laps recorded for a device, oldest first, one page at a time"""
+    entries, next_cursor = await redis_service.get_history(
+        timing_key(device_id, "history"),
+        _to_ms(start_time),
+        _to_ms(end_time),
+        count=limit,
+        cursor=cursor,
+    )
+    return TimingHistoryResponse(
+        device_id=device_id,
+        laps=[
+            LapRecord(
+                timestamp=_from_ms(stream_id_ms(entry_id)),
+                lap_time=float(fields["lap_time"]),
+                sector=int(fields["sector"]) if fields.get("sector") else None,
+                segment=fields.get("segment") or None,
+            )
+            for entry_id, fields in entries
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/sensor/{device_id}", response_model=List[SensorResponse])
+async def get_sensor(device_id: str, request: Request, response: Response):
+    """Latest reading of every sensor type reported by a device"""
+    cached = await latest_values.sensor_readings(
+        device_id, lambda: redis_service.get_sensor_latest(device_id)
+    )
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Sensor device not found")
+    if _not_modified(request, response, cached):
+        return _304(cached)
+    return [_sensor_response(reading) for reading in cached.value]
+
+
+@router.get(
+    "/sensor/{device_id}/{sensor_type}/history", response_model=SensorHistoryResponse
+)
+async def get_sensor_history(
+    device_id: str,
+    sensor_type: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    points: Optional[int] = Query(
+        None, ge=2, le=10000, description="Downsample the range to this many points"
+    ),
+    method: DownsampleMethod = DownsampleMethod.LTTB,
+    limit: int = Query(1000, ge=1, le=10000, description="Page size without `points`"),
+    cursor: Optional[str] = Query(
+        None, pattern=CURSOR_PATTERN, description="next_cursor of the previous page"
+    ),
+):
+    """Readings for one sensor between ``start_time`` and ``end_time``.
+
+    With ``points`` the whole range is reduced server-side (``method`` avg,
+    min, max or lttb) and returned in one response. Without it raw readings
+    are paginated with ``limit`` and ``cursor``. Readings moved to cold
+    storage are merged in transparently.
+    """
+    global cold_store
+    from services.cold_storage import ColdStore, read_sensor_history
+    from services.downsampling import downsample
+
+    latest = await latest_values.sensor_reading(
+        device_id, sensor_type, lambda: redis_service.get_sensor_latest(device_id)
+    )
+    if latest is None:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+
+    if cold_store is None and settings.COLD_STORAGE_DIR:
+        cold_store = ColdStore(settings.COLD_STORAGE_DIR)
+    timestamps, values, next_cursor = await read_sensor_history(
+        redis_service,
+        cold_store,
+        device_id,
+        sensor_type,
+        _to_ms(start_time),
+        _to_ms(end_time),
+        count=None if points else limit,
+        cursor=cursor,
+    )
+
+    mins = maxs = None
+    applied = None
+    if points and len(values) > points:
+        timestamps, values, mins, maxs = downsample(timestamps, values, points, method)
+        applied = method.value
+
+    return SensorHistoryResponse(
+        device_id=device_id,
+        sensor_type=sensor_type,
+        unit=latest.value["unit"],
+        downsample=applied,
+        points=[
+            SensorHistoryPoint(
+                timestamp=_from_ms(int(ts)),
+                value=float(value),
+                min=None if mins is None else float(mins[i]),
+                max=None if maxs is None else float(maxs[i]),
+            )
+            for i, (ts, value) in enumerate(zip(timestamps, values))
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/sensor/{device_id}/{sensor_type}", response_model=SensorResponse)
+async def get_sensor_type(
+    device_id: str, sensor_type: str, request: Request, response: Response
+):
+    """Latest reading of one sensor type"""
+    cached = await latest_values.sensor_reading(
+        device_id, sensor_type, lambda: redis_service.get_sensor_latest(device_id)
+    )
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    if _not_modified(request, response, cached):
+        return _304(cached)
+    return _sensor_response(cached.value)
+
+
+def _sensor_response(reading: dict) -> SensorResponse:
+    return SensorResponse(
+        device_id=reading["device_id"],
+        sensor_type=reading["sensor_type"],
+        latest_value=reading["value"],
+        unit=reading["unit"],
+        last_update=_from_ms(reading["last_update"]),
+    )
@@ -1,89 +1,287 @@
 # src/api/routes/v1/websocket.py
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Set
-import json
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
 import asyncio
 import logging
-from services.redis_service import RedisService
-
-# from config import settings
+import time
+from services.redis_service import RedisService, parse_sensor_channel, to_epoch_ms
+from services.pubsub_reader import RedisSubscriber
+from services.pubsub_relay import RelaySubscriber
+from services.subscriptions import SubscriptionIndex, WILDCARD
+from services.broadcaster import Broadcaster, Frame, OverflowPolicy
+from services.timing_board import TimingBoard
+from services.codec import JSON, WIRE_FORMATS, CodecError, Payload, decode
+from services.latest_cache import LatestValueCache, latest_values
+from services.metrics import PUBSUB_LAG_SECONDS, WS_CLIENTS, WS_QUEUE_DEPTH
+from services.structured_logging import apply_level_command
+from services.tasks import TaskSupervisor
+from config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Sensor updates are routed without decoding; only every Nth one is decoded
+# to measure pub/sub lag.
+SENSOR_LAG_SAMPLE_EVERY = 100
+TIMING_LAG = PUBSUB_LAG_SECONDS.labels("timing")
+SENSOR_LAG = PUBSUB_LAG_SECONDS.labels("sensor")
+
+
+def _observe_lag(histogram, update: Any) -> None:
+    if isinstance(update, dict):
+        lag = time.time() - to_epoch_ms(update.get("timestamp")) / 1000
+        histogram.observe(max(lag, 0.0))
+
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        redis: Optional[RedisService] = None,
+        latest: Optional[LatestValueCache] = None,
+    ):
         self.active_connections: Dict[str, Set[WebSocket]] = {
             "timing": set(),
             "sensor": set(),
         }
-        self.redis = RedisService()
+        # Sensor clients only receive the (device_id, sensor_type) pairs they asked for
+        self.sensor_subscriptions = SubscriptionIndex()
+        # Each client gets its own bounded send queue and writer task
+        self.broadcaster = Broadcaster(
+            max_queue=settings.WS_SEND_QUEUE_SIZE,
+            policy=OverflowPolicy(settings.WS_OVERFLOW_POLICY),
+            send_timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+            on_client_closed=self.disconnect,
+        )
+        # Live timing table; timing clients get a snapshot, then deltas
+        self.timing_board = TimingBoard()
+        # Timing updates received while the board is loaded from Redis
+        self._timing_backlog: Optional[List[Dict[str, Any]]] = None
+        self._board_load: Optional[asyncio.Task] = None
+        self.redis = redis or RedisService()
+        # Latest values served by the REST API, kept current from pub/sub
+        self.latest = latest or latest_values
         self._running = False
+        # One pub/sub connection for the whole process, or one for every
+        # worker on the host behind the relay
+        if settings.PUBSUB_RELAY_SOCKET:
+            self.subscriber = RelaySubscriber(settings.PUBSUB_RELAY_SOCKET)
+        else:
+            self.subscriber = RedisSubscriber(self.redis)
+        self.subscriber.add_pattern(
+            f"{settings.TIMING_UPDATES_CHANNEL}:*", self.on_timing_update
+        )
+        self.subscriber.add_pattern(
+            f"{settings.SENSOR_UPDATES_CHANNEL}:*", self.on_sensor_update
+        )
+        self.subscriber.add_channel(
+            settings.LOG_LEVEL_CHANNEL, lambda _, data: apply_level_command(data)
+        )
+        self.subscriber.add_state_handler(self.latest.set_live)
+        self.subscriber.add_state_handler(self._on_subscribed)
+        self._sensor_updates = 0
+        # Evaluated on scrape only
+        for client_type in self.active_connections:
+            WS_CLIENTS.labels(client_type).set_function(
+                lambda t=client_type: len(self.active_connections[t])
+            )
+            WS_QUEUE_DEPTH.labels(client_type).set_function(
+                lambda t=client_type: self.broadcaster.queued(t)
+            )
 
-    async def connect(self, websocket: WebSocket, client_type: str):
+    async def connect(
+        self, websocket: WebSocket, client_type: str, content_type: str = JSON
+    ):
         await websocket.accept()
         self.active_connections[client_type].add(websocket)
+        self.broadcaster.register(websocket, client_type, content_type)
         logger.info(
             f"New {client_type} client connected. Total {client_type} clients: {len(self.active_connections[client_type])}"
         )
 
     def disconnect(self, websocket: WebSocket, client_type: str):
-        self.active_connections[client_type].remove(websocket)
+        self.active_connections[client_type].discard(websocket)
+        self.broadcaster.unregister(websocket)
+        if client_type == "sensor":
+            self.sensor_subscriptions.remove(websocket)
         logger.info(
             f"{client_type} client disconnected. Total {client_type} clients: {len(self.active_connections[client_type])}"
         )
 
-    async def broadcast_to_clients(self, client_type: str, message: str):
-        disconnected = set()
-        for connection in self.active_connections[client_type]:
-            try:
-                await connection.send_text(message)
-            except WebSocketDisconnect:
-                disconnected.add(connection)
-            except Exception as e:
-                logger.error(f"Error broadcasting to {client_type} client: {e}")
-                disconnected.add(connection)
-
-        for conn in disconnected:
-            self.disconnect(conn, client_type)
-
-    async def subscribe_to_redis(self, channel: str, client_type: str):
-        """Subscribe to Redis channel and broadcast messages to WebSocket clients"""
+    def broadcast_to_clients(
+        self,
+        client_type: str,
+        message: Frame,
+        recipients: Optional[Iterable[WebSocket]] = None,
+        key: Optional[Hashable] = None,
+    ) -> int:
+        """Queue a message for ``recipients``, or for every client of the type.
+
+        Never waits on the network: each client's writer task drains its own
+        queue, so a slow client cannot delay the others or the Redis reader.
+        ``key`` identifies the message for the coalescing overflow policy.
+        Pass a ``Payload`` to let each client receive its own wire format.
+        """
+        if recipients is None:
+            recipients = self.active_connections[client_type]
+        return self.broadcaster.publish(message, recipients, key)
+
+    def send_to_client(self, websocket: WebSocket, client_type: str, obj: Any):
+        """Queue a single object for one client in its wire format"""
+        self.broadcast_to_clients(client_type, Payload(obj), [websocket])
+
+    async def receive_command(self, websocket: WebSocket) -> Any:
+        """Wait for the next client command (JSON text or msgpack binary frame).
+
+        Returns None if the frame cannot be decoded.
+        """
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        body = message.get("text")
+        if body is None:
+            body = message.get("bytes")
         try:
-            pubsub = await self.redis.get_pubsub()
-            await pubsub.subscribe(channel)
-            logger.info(f"Subscribed to Redis channel: {channel}")
+            return decode(body)
+        except CodecError:
+            return None
 
-            while self._running:
-                try:
-                    message = await pubsub.get_message(ignore_subscribe_messages=True)
-                    if message and message["type"] == "message":
-                        await self.broadcast_to_clients(client_type, message["data"])
-                except Exception as e:
-                    logger.error(f"Error processing message from {channel}: {e}")
-                    await asyncio.sleep(1)  # Prevent tight loop on errors
-        except Exception as e:
-            logger.error(f"Error in Redis subscription to {channel}: {e}")
-        finally:
-            await pubsub.unsubscribe(channel)
-            logger.info(f"Unsubscribed from Redis channel: {channel}")
+    def on_timing_update(self, channel: str, message: bytes):
+        """Pub/sub handler for ``timing_updates:{device_id}``.
 
-    async def start_redis_subscribers(self):
-        """Start Redis pub/sub listeners for all channels"""
-        self._running = True
+        Updates are folded into the timing board; clients receive them with
+        the next delta frame.
+        """
+        update = decode(message)
+        _observe_lag(TIMING_LAG, update)
+        if self._timing_backlog is not None:
+            self._timing_backlog.append(update)
+        else:
+            self.timing_board.apply(update)
+        self.latest.on_timing_update(update)
+
+    def send_timing_snapshot(self, websocket: WebSocket):
+        """Queue the full timing board for one client"""
+        self.send_to_client(websocket, "timing", self.timing_board.snapshot())
+
+    async def run_timing_frames(self):
+        """Broadcast coalesced timing deltas every TIMING_FRAME_INTERVAL_MS"""
+        interval = settings.TIMING_FRAME_INTERVAL_MS / 1000
+        while self._running:
+            await asyncio.sleep(interval)
+            delta = self.timing_board.take_delta()
+            if delta is not None and self.active_connections["timing"]:
+                self.broadcast_to_clients("timing", Payload(delta))
+
+    def _on_subscribed(self, connected: bool):
+        """(Re)load the timing board once subscribed, so no lap falls in between"""
+        if not connected:
+            return
+        if self._board_load is not None:
+            self._board_load.cancel()
+        if self._timing_backlog is None:
+            self._timing_backlog = []
+        self._board_load = asyncio.get_running_loop().create_task(
+            self.load_timing_board()
+        )
+
+    async def load_timing_board(self):
+        """Seed the timing board from Redis so late joiners see every car.
+
+        Updates that arrived since subscribing are applied on top; those the
+        snapshot already holds are older than its rows and are dropped.
+        """
         try:
-            await asyncio.gather(
-                self.subscribe_to_redis("timing_updates", "timing"),
-                self.subscribe_to_redis("sensor_updates", "sensor"),
-            )
+            self.timing_board.load(await self.redis.get_timing_board())
         except Exception as e:
-            logger.error(f"Error starting Redis subscribers: {e}")
-            self._running = False
+            logger.error(f"Could not load timing board from Redis: {e}")
+        backlog, self._timing_backlog = self._timing_backlog or [], None
+        for update in backlog:
+            self.timing_board.apply(update)
+
+    def on_sensor_update(self, channel: str, message: bytes):
+        """Pub/sub handler for ``sensor_updates:{device_id}:{sensor_type}``.
+
+        The device and sensor type come from the channel name, so routing
+        never has to decode the payload; it is only transcoded for clients
+        that asked for a different wire format than the producer used.
+        """
+        device_id, sensor_type = parse_sensor_channel(channel)
+        self.latest.on_sensor_update(device_id, sensor_type, message)
+        self._sensor_updates += 1
+        if self._sensor_updates % SENSOR_LAG_SAMPLE_EVERY == 0:
+            try:
+                _observe_lag(SENSOR_LAG, decode(message))
+            except (CodecError, ValueError):
+                pass
+        recipients = self.sensor_subscriptions.match(device_id, sensor_type)
+        if recipients:
+            self.broadcast_to_clients(
+                "sensor", Payload(raw=message), recipients, key=(device_id, sensor_type)
+            )
+
+    def handle_sensor_command(self, websocket: WebSocket, command: Any):
+        """Apply a subscription command received from a sensor client.
+
+        Commands are objects such as
+        ``{"action": "subscribe", "device_id": "ev_001", "sensor_type": "battery"}``.
+        ``action`` is one of subscribe, unsubscribe, clear or list; omitted
+        ``device_id``/``sensor_type`` default to the ``*`` wildcard. The client
+        is answered with its current subscription list.
+        """
+        if not isinstance(command, dict) or "action" not in command:
+            self.send_to_client(
+                websocket,
+                "sensor",
+                {"type": "error", "detail": "Expected an object with an 'action'"},
+            )
+            return
+        action = command["action"]
+
+        device_id = str(command.get("device_id") or WILDCARD)
+        sensor_type = str(command.get("sensor_type") or WILDCARD)
+        if action == "subscribe":
+            self.sensor_subscriptions.subscribe(websocket, device_id, sensor_type)
+        elif action == "unsubscribe":
+            self.sensor_subscriptions.unsubscribe(websocket, device_id, sensor_type)
+        elif action == "clear":
+            self.sensor_subscriptions.remove(websocket)
+        elif action != "list":
+            self.send_to_client(
+                websocket,
+                "sensor",
+                {"type": "error", "detail": f"Unknown action: {action}"},
+            )
+            return
+
+        self.send_to_client(
+            websocket,
+            "sensor",
+            {
+                "type": "subscriptions",
+                "subscriptions": [
+                    {"device_id": d, "sensor_type": t}
+                    for d, t in self.sensor_subscriptions.subscriptions(websocket)
+                ],
+            },
+        )
+
+    def start(self, tasks: TaskSupervisor):
+        """Run the pub/sub reader and the timing frame loop as supervised tasks"""
+        self._running = True
+        tasks.start("pubsub", self._read_updates)
+        tasks.start("timing_frames", self.run_timing_frames)
+
+    async def _read_updates(self):
+        # The timing board is (re)loaded every time the reader subscribes
+        await self.subscriber.run()
 
     async def shutdown(self):
-        """Gracefully shutdown the connection manager"""
+        """Gracefully shutdown the connection manager (its tasks stopped first)"""
         self._running = False
+        self.subscriber.stop()
+        if self._board_load is not None:
+            self._board_load.cancel()
+        await self.broadcaster.close()
         # Close all websocket connections
         for client_type in self.active_connections:
             for connection in self.active_connections[client_type].copy():
@@ -92,6 +290,7 @@ class ConnectionManager:
                 except Exception:
                     pass
             self.active_connections[client_type].clear()
+        self.sensor_subscriptions = SubscriptionIndex()
         # Close Redis connection
         await self.redis.close()
 
@@ -100,34 +299,54 @@ manager = ConnectionManager()
 
 
 @router.websocket("/timing")
-async def websocket_timing_endpoint(websocket: WebSocket):
-    await manager.connect(websocket, "timing")
+async def websocket_timing_endpoint(websocket: WebSocket, format: str = "json"):
+    """Stream the live timing board.
+
+    The first frame is a full ``snapshot``; after that the client receives
+    ``delta`` frames holding only changed fields. Sending
+    ``{"action": "snapshot"}`` requests a fresh snapshot, e.g. after a gap in
+    ``seq``. ``format=msgpack`` switches to binary msgpack frames.
+    """
+    if format not in WIRE_FORMATS:
+        await websocket.close(code=1003)
+        return
+    await manager.connect(websocket, "timing", WIRE_FORMATS[format])
+    manager.send_timing_snapshot(websocket)
     try:
         while True:
-            data = await websocket.receive_text()
-            # Handle incoming messages if needed
+            command = await manager.receive_command(websocket)
+            if isinstance(command, dict) and command.get("action") == "snapshot":
+                manager.send_timing_snapshot(websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket, "timing")
 
 
 @router.websocket("/sensor/{sensor_type}")
-async def websocket_sensor_endpoint(websocket: WebSocket, sensor_type: str):
-    await manager.connect(websocket, "sensor")
+async def websocket_sensor_endpoint(
+    websocket: WebSocket, sensor_type: str, device_id: str = WILDCARD, format: str = "json"
+):
+    """Stream sensor updates for ``sensor_type`` ("all" or "*" for every type).
+
+    The optional ``device_id`` query parameter narrows the initial
+    subscription; clients can change it later by sending subscription commands.
+    ``format=msgpack`` switches to binary msgpack frames.
+    """
+    if format not in WIRE_FORMATS:
+        await websocket.close(code=1003)
+        return
+    await manager.connect(websocket, "sensor", WIRE_FORMATS[format])
+    manager.sensor_subscriptions.subscribe(
+        websocket, device_id, WILDCARD if sensor_type == "all" else sensor_type
+    )
     try:
         while True:
-            data = await websocket.receive_text()
-            # Handle sensor-specific messages if needed
+            command = await manager.receive_command(websocket)
+            manager.handle_sensor_command(websocket, command)
     except WebSocketDisconnect:
         manager.disconnect(websocket, "sensor")
 
 
-# Startup and shutdown events
-@router.on_event("startup")
-async def startup_event():
-    await manager.redis.get_connection()  # Initialize Redis connection
-    asyncio.create_task(manager.start_redis_subscribers())
-
-
-@router.on_event("shutdown")
-async def shutdown_event():
-    await manager.shutdown()
+@router.get("/clients")
+async def websocket_client_stats():
+    """Per-client queue depth, drop counts and delivery lag"""
+    return manager.broadcaster.stats()
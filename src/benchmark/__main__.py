@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmark.harness import run_benchmark
+from services.structured_logging import configure_logging
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.benchmark",
+        description="End-to-end load test: AMQP → consumer → Redis → WebSocket",
+    )
+    parser.add_argument("--cars", type=int, default=20)
+    parser.add_argument("--sensors", type=int, default=8, help="sensors per car")
+    parser.add_argument("--hz", type=float, default=10.0, help="samples per sensor/s")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--clients", type=int, default=1, help="WebSocket clients")
+    parser.add_argument("--broker", choices=["memory", "amqp"], default="memory")
+    parser.add_argument("--redis", choices=["memory", "server"], default="memory")
+    parser.add_argument(
+        "--api", help="WebSocket base URL, e.g. ws://localhost:8000/api/v1/ws"
+    )
+    parser.add_argument(
+        "--external-consumer",
+        action="store_true",
+        help="consumer workers are already running; only publish and listen",
+    )
+    parser.add_argument("--prefetch", type=int, default=None)
+    parser.add_argument("--format", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--lap-seconds", type=float, default=30.0)
+    parser.add_argument(
+        "--max-p99-ms",
+        type=float,
+        help="exit with status 1 if p99 latency exceeds this (for CI)",
+    )
+    parser.add_argument("--json", action="store_true", help="print the raw report")
+    args = parser.parse_args()
+
+    configure_logging(level="WARNING", json_format=False)
+    report = asyncio.run(
+        run_benchmark(
+            cars=args.cars,
+            sensors=args.sensors,
+            hz=args.hz,
+            duration=args.duration,
+            clients=args.clients,
+            broker=args.broker,
+            redis=args.redis,
+            api_url=args.api,
+            external_consumer=args.external_consumer,
+            prefetch_count=args.prefetch,
+            wire_format=args.format,
+            lap_seconds=args.lap_seconds,
+        )
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        published, delivered, latency = (
+            report["published"],
+            report["delivered"],
+            report["latency"],
+        )
+        print(
+            f"published  {published['sensor']} sensor + {published['timing']} timing "
+            f"messages at {published['rate']}/s (target {published['target_rate']}/s, "
+            f"{published['late_ticks']} late ticks)"
+        )
+        coalesced = ""
+        if "coalesced" in delivered:
+            coalesced = (
+                f" ({delivered['coalesced']} coalesced, {delivered['dropped']} "
+                f"dropped by the {delivered['policy']} policy)"
+            )
+        print(
+            f"delivered  {delivered['frames']} frames, "
+            f"{delivered['ratio']:.2%} of sensor messages per client{coalesced}"
+        )
+        if latency["count"]:
+            print(
+                f"latency    p50 {latency['p50_ms']} ms  p99 {latency['p99_ms']} ms  "
+                f"p99.9 {latency['p999_ms']} ms  max {latency['max_ms']} ms  "
+                f"({latency['throughput']} msg/s on screen)"
+            )
+
+    p99 = report["latency"].get("p99_ms")
+    if args.max_p99_ms is not None and (p99 is None or p99 > args.max_p99_ms):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
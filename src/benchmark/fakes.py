@@ -0,0 +1,322 @@
+# src/benchmark/fakes.py
+"""In-memory stand-ins for RabbitMQ, Redis and WebSocket clients.
+
+They implement just what the consumer, the WebSocket fan-out and the admin
+API use, so the whole pipeline can run in one process without any external
+service.
+"""
+
+import asyncio
+import zlib
+from collections import OrderedDict, deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from config import settings
+from services.codec import JSON, encode, normalize_content_type
+from services.rabbitmq_service import (
+    QUARANTINE_EXCHANGE,
+    PublishResult,
+    dead_letter_headers,
+    message_headers,
+    replay_target,
+    retry_destination,
+    retry_exchange,
+    retry_queue,
+    shard_queue,
+)
+
+Callback = Callable[[Any], Awaitable[Any]]
+Delivery = Tuple[bytes, str, str, Dict[str, Any]]
+
+
+class InMemoryMessage:
+    """The parts of ``aio_pika.IncomingMessage`` the consumer relies on"""
+
+    def __init__(
+        self,
+        queue: "InMemoryQueue",
+        delivery: Delivery,
+        delivery_tag: int,
+        consumer_tag: str,
+    ):
+        self._queue = queue
+        self.body, self.content_type, self.routing_key, self.headers = delivery
+        self.delivery_tag = delivery_tag
+        self.consumer_tag = consumer_tag
+        self.redelivered = False
+
+    async def ack(self, multiple: bool = False):
+        self._queue.settle(self, multiple, requeue=None)
+
+    async def nack(self, multiple: bool = False, requeue: bool = True):
+        self._queue.settle(self, multiple, requeue=requeue)
+
+    async def reject(self, requeue: bool = False):
+        self._queue.settle(self, False, requeue=requeue)
+
+
+class InMemoryQueue:
+    """FIFO queue delivering to one consumer with a prefetch window"""
+
+    def __init__(self, name: str, prefetch_count: int):
+        self.name = name
+        self.prefetch_count = prefetch_count
+        self.pending: Deque[Delivery] = deque()
+        self.unacked: "OrderedDict[int, InMemoryMessage]" = OrderedDict()
+        self.acked = 0
+        self.dropped = 0
+        self._next_tag = 0
+        # Requeued deliveries waiting at the head of ``pending``
+        self._redeliveries = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._handlers: Set[asyncio.Task] = set()
+
+    def put(self, delivery: Delivery):
+        self.pending.append(delivery)
+        self._wakeup.set()
+
+    def settle(self, message: InMemoryMessage, multiple: bool, requeue: Optional[bool]):
+        """Ack (``requeue`` None), requeue or drop a message, or all up to it"""
+        if multiple:
+            tags = [tag for tag in self.unacked if tag <= message.delivery_tag]
+        else:
+            tags = [message.delivery_tag]
+        requeued = []
+        for tag in tags:
+            settled = self.unacked.pop(tag, None)
+            if settled is None:
+                continue
+            if requeue is None:
+                self.acked += 1
+            elif requeue:
+                requeued.append(
+                    (
+                        settled.body,
+                        settled.content_type,
+                        settled.routing_key,
+                        settled.headers,
+                    )
+                )
+            else:
+                self.dropped += 1
+        self.pending.extendleft(reversed(requeued))
+        self._redeliveries += len(requeued)
+        self._wakeup.set()
+
+    def consume(self, callback: Callback, consumer_tag: str):
+        self._task = asyncio.create_task(self._deliver(callback, consumer_tag))
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _deliver(self, callback: Callback, consumer_tag: str):
+        while True:
+            while not self.pending or len(self.unacked) >= self.prefetch_count:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            self._next_tag += 1
+            message = InMemoryMessage(
+                self, self.pending.popleft(), self._next_tag, consumer_tag
+            )
+            if self._redeliveries:
+                message.redelivered = True
+                self._redeliveries -= 1
+            self.unacked[message.delivery_tag] = message
+            # Like aio-pika: one task per delivery, started in delivery order
+            task = asyncio.create_task(callback(message))
+            self._handlers.add(task)
+            task.add_done_callback(self._handlers.discard)
+
+
+class InMemoryBroker:
+    """Drop-in for ``AsyncRabbitMQService`` with the same routing and sharding.
+
+    ``timing.*``/``sensor.*`` keys go to the timing/sensor queues; with
+    ``CONSUMER_SHARDS`` set, the device_id header picks the shard queue.
+    """
+
+    def __init__(self, prefetch_count: Optional[int] = None):
+        self.prefetch_count = prefetch_count or settings.CONSUMER_PREFETCH_COUNT
+        self.queues: Dict[str, InMemoryQueue] = {}
+        self.unroutable = 0
+
+    def _queue(self, name: str) -> InMemoryQueue:
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = InMemoryQueue(name, self.prefetch_count)
+        return queue
+
+    def _route(self, routing_key: str, headers: Dict[str, Any]) -> Optional[str]:
+        kind = routing_key.split(".", 1)[0]
+        queue = {"timing": settings.TIMING_QUEUE, "sensor": settings.SENSOR_QUEUE}
+        name = queue.get(kind)
+        if name is None or not settings.CONSUMER_SHARDS:
+            return name
+        device_id = str(headers.get(settings.SHARD_HASH_HEADER, ""))
+        shard = zlib.crc32(device_id.encode()) % settings.CONSUMER_SHARDS
+        return shard_queue(name, shard)
+
+    async def connect(self):
+        pass
+
+    async def publish_message(
+        self, routing_key: str, message: Dict[str, Any], content_type: str = JSON
+    ) -> bool:
+        content_type = normalize_content_type(content_type)
+        headers = message_headers(message)
+        name = self._route(routing_key, headers)
+        if name is None:
+            self.unroutable += 1
+            return False
+        body = encode(message, content_type)
+        self._queue(name).put((body, content_type, routing_key, headers))
+        return True
+
+    async def publish_batch(
+        self, messages: Iterable[Tuple[str, Dict[str, Any]]], content_type: str = JSON
+    ) -> PublishResult:
+        confirmed, failed = 0, []
+        for index, (routing_key, message) in enumerate(messages):
+            if await self.publish_message(routing_key, message, content_type):
+                confirmed += 1
+            else:
+                failed.append(index)
+        return PublishResult(confirmed, failed)
+
+    async def dead_letter(
+        self, message: InMemoryMessage, reason: str, detail: str, queue: str
+    ) -> bool:
+        headers = dead_letter_headers(
+            message.headers, reason, detail, queue, message.routing_key
+        )
+        self._queue(settings.DEAD_LETTER_QUEUE).put(
+            (message.body, message.content_type, message.routing_key, headers)
+        )
+        return True
+
+    async def retry(
+        self, message: InMemoryMessage, reason: str, detail: str, queue: str
+    ) -> bool:
+        exchange, headers = retry_destination(
+            message.headers, reason, detail, queue, message.routing_key
+        )
+        delivery = (message.body, message.content_type, message.routing_key, headers)
+        if exchange == QUARANTINE_EXCHANGE:
+            self._queue(settings.QUARANTINE_QUEUE).put(delivery)
+            return True
+        # Like a retry queue with a message TTL: held, then routed again
+        delay = next(
+            d for d in settings.RETRY_DELAYS_MS if retry_exchange(d) == exchange
+        )
+        held = self._queue(retry_queue(delay))
+        held.pending.append(delivery)
+        asyncio.get_running_loop().call_later(delay / 1000, self._expire, held)
+        return False
+
+    def _expire(self, held: InMemoryQueue):
+        self._reroute(held.pending.popleft())
+
+    def _reroute(self, delivery: Delivery):
+        body, content_type, routing_key, headers = delivery
+        name = self._route(routing_key, headers)
+        if name is None:
+            self.unroutable += 1
+        else:
+            self._queue(name).put(delivery)
+
+    async def peek_messages(self, queue: str, limit: int):
+        pending = self._queue(queue).pending
+        messages = [
+            InMemoryMessage(self._queue(queue), delivery, 0, "")
+            for delivery in list(pending)[:limit]
+        ]
+        return len(pending), messages
+
+    async def replay_messages(self, queue: str, limit: int) -> int:
+        pending = self._queue(queue).pending
+        replayed = 0
+        while pending and replayed < limit:
+            body, content_type, routing_key, headers = pending.popleft()
+            routing_key, headers = replay_target(headers, routing_key)
+            self._reroute((body, content_type, routing_key, headers))
+            replayed += 1
+        return replayed
+
+    async def purge_queue(self, queue: str) -> int:
+        pending = self._queue(queue).pending
+        count = len(pending)
+        pending.clear()
+        return count
+
+    async def consume_messages(self, queue: str, callback: Callback) -> str:
+        consumer_tag = f"ctag-{queue}"
+        self._queue(queue).consume(callback, consumer_tag)
+        return consumer_tag
+
+    async def get_queue_message_count(self, queue: str) -> int:
+        return len(self._queue(queue).pending)
+
+    async def set_prefetch(self, queues: Iterable[str], prefetch_count: int):
+        for name in queues:
+            queue = self._queue(name)
+            queue.prefetch_count = prefetch_count
+            queue._wakeup.set()
+
+    async def cancel_consumers(self):
+        for queue in self.queues.values():
+            queue.cancel()
+
+    async def close(self):
+        await self.cancel_consumers()
+
+
+def memory_redis_factory() -> Callable[..., Any]:
+    """``RedisService`` client factory backed by one shared fakeredis server"""
+    try:
+        import fakeredis
+    except ImportError as e:
+        raise RuntimeError(
+            "The in-memory Redis needs fakeredis: pip install 'fakeredis[lua]'"
+        ) from e
+
+    server = fakeredis.FakeServer()
+
+    def factory(decode_responses: bool):
+        return fakeredis.FakeAsyncRedis(
+            server=server, decode_responses=decode_responses
+        )
+
+    return factory
+
+
+class RecordingWebSocket:
+    """Stand-in for a Starlette WebSocket that hands every frame to ``on_frame``"""
+
+    def __init__(self, on_frame: Callable[[Any], None]):
+        self.on_frame = on_frame
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.on_frame(data)
+
+    async def send_bytes(self, data: bytes):
+        self.on_frame(data)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
@@ -0,0 +1,184 @@
+# src/benchmark/harness.py
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import websockets
+
+from api.routes.v1.websocket import ConnectionManager
+from consumer import MessageConsumer
+from services.codec import WIRE_FORMATS, CodecError, decode
+from services.rabbitmq_service import AsyncRabbitMQService
+from services.redis_service import RedisService
+from services.subscriptions import WILDCARD
+from services.tasks import TaskSupervisor
+from benchmark.fakes import InMemoryBroker, RecordingWebSocket, memory_redis_factory
+from benchmark.latency import LatencyRecorder
+from benchmark.workload import STAMP_FIELD, Workload
+
+logger = logging.getLogger(__name__)
+
+
+class Screen:
+    """Counts frames reaching WebSocket clients and records their latency"""
+
+    def __init__(self):
+        self.recorder = LatencyRecorder()
+        self.frames = 0
+        self.undecodable = 0
+
+    def on_frame(self, frame: Any) -> None:
+        received_ns = time.time_ns()
+        self.frames += 1
+        try:
+            message = decode(frame)
+        except CodecError:
+            self.undecodable += 1
+            return
+        if isinstance(message, dict) and STAMP_FIELD in message:
+            self.recorder.record(message[STAMP_FIELD], received_ns)
+
+
+async def _remote_client(url: str, screen: Screen, ready: asyncio.Event) -> None:
+    async with websockets.connect(url, max_size=None) as websocket:
+        ready.set()
+        async for frame in websocket:
+            screen.on_frame(frame)
+
+
+async def _wait_for_drain(screen: Screen, idle: float, timeout: float) -> None:
+    """Return once no frame has arrived for ``idle`` seconds"""
+    deadline = time.monotonic() + timeout
+    seen = -1
+    while screen.frames != seen and time.monotonic() < deadline:
+        seen = screen.frames
+        await asyncio.sleep(idle)
+
+
+async def run_benchmark(
+    cars: int = 20,
+    sensors: int = 8,
+    hz: float = 10.0,
+    duration: float = 10.0,
+    clients: int = 1,
+    broker: str = "memory",
+    redis: str = "memory",
+    api_url: Optional[str] = None,
+    external_consumer: bool = False,
+    prefetch_count: Optional[int] = None,
+    wire_format: str = "json",
+    lap_seconds: float = 30.0,
+    warmup: float = 1.0,
+    drain_timeout: float = 10.0,
+) -> Dict[str, Any]:
+    """Drive AMQP → consumer → Redis → pub/sub → WebSocket and measure it.
+
+    ``broker``/``redis`` pick the in-memory fakes ("memory") or the services
+    from the settings ("amqp"/"server"). WebSocket clients connect to
+    ``api_url`` (e.g. ``ws://localhost:8000/api/v1/ws``) when given, otherwise
+    to an in-process ``ConnectionManager`` on the same Redis. With
+    ``external_consumer`` the consumer workers are expected to be running
+    already (e.g. ``python -m src.supervisor``).
+    """
+    client_factory: Optional[Callable[..., Any]] = None
+    if redis == "memory":
+        client_factory = memory_redis_factory()
+    if broker == "memory":
+        if redis != "memory" or api_url or external_consumer:
+            raise ValueError(
+                "The in-memory broker only works with the in-memory Redis, "
+                "the in-process consumer and in-process WebSocket clients"
+            )
+        publisher = consumer_broker = InMemoryBroker(prefetch_count)
+    else:
+        publisher = AsyncRabbitMQService(prefetch_count)
+        consumer_broker = AsyncRabbitMQService(prefetch_count)
+    content_type = WIRE_FORMATS[wire_format]
+
+    screen = Screen()
+    tasks: List[asyncio.Task] = []
+    consumer = consumer_task = None
+    if not external_consumer:
+        consumer = MessageConsumer(
+            prefetch_count=prefetch_count,
+            redis=RedisService(client_factory),
+            rabbitmq=consumer_broker,
+        )
+        consumer_task = asyncio.create_task(consumer.run())
+
+    manager = None
+    background = TaskSupervisor()
+    if api_url:
+        for _ in range(clients):
+            ready = asyncio.Event()
+            url = f"{api_url}/sensor/all?format={wire_format}"
+            tasks.append(asyncio.create_task(_remote_client(url, screen, ready)))
+            await asyncio.wait_for(ready.wait(), timeout=10)
+    else:
+        manager = ConnectionManager(redis=RedisService(client_factory))
+        await manager.redis.get_connection()
+        manager.start(background)
+        for _ in range(clients):
+            websocket = RecordingWebSocket(screen.on_frame)
+            await manager.connect(websocket, "sensor", content_type)
+            manager.sensor_subscriptions.subscribe(websocket, WILDCARD, WILDCARD)
+
+    await asyncio.sleep(warmup)  # let consumers and subscriptions settle
+    workload = Workload(cars, sensors, hz, lap_seconds)
+    started = time.monotonic()
+    await workload.run(
+        lambda key, payload: publisher.publish_message(key, payload, content_type),
+        duration,
+    )
+    publish_seconds = time.monotonic() - started
+    await _wait_for_drain(screen, idle=1.0, timeout=drain_timeout)
+
+    fan_out: Dict[str, Any] = {}
+    if manager is not None:
+        stats = manager.broadcaster.stats()
+        fan_out = {
+            "policy": stats["policy"],
+            "coalesced": sum(s["coalesced"] for s in stats["sessions"]),
+            "dropped": stats["dropped"],
+        }
+
+    if consumer is not None:
+        consumer.stop()
+        await consumer_task
+    await background.stop()
+    if manager is not None:
+        await manager.shutdown()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await publisher.close()
+
+    expected = workload.sensor_messages * clients
+    return {
+        "config": {
+            "cars": cars,
+            "sensors": sensors,
+            "hz": hz,
+            "duration": duration,
+            "clients": clients,
+            "broker": broker,
+            "redis": redis,
+            "api": api_url or "in-process",
+            "format": wire_format,
+        },
+        "published": {
+            "sensor": workload.sensor_messages,
+            "timing": workload.timing_messages,
+            "target_rate": workload.rate,
+            "rate": round(workload.sensor_messages / publish_seconds, 1),
+            "late_ticks": workload.late_ticks,
+        },
+        "delivered": {
+            "frames": screen.frames,
+            "expected": expected,
+            "ratio": round(len(screen.recorder) / expected, 4) if expected else 0.0,
+            **fan_out,
+        },
+        "latency": screen.recorder.summary(),
+    }
@@ -0,0 +1,42 @@
+# src/benchmark/latency.py
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+PERCENTILES = {"p50_ms": 50, "p99_ms": 99, "p999_ms": 99.9}
+
+
+class LatencyRecorder:
+    """Ingest-to-screen latencies, summarised as throughput and percentiles"""
+
+    def __init__(self):
+        self._latencies: List[int] = []
+        self.first_ns: Optional[int] = None
+        self.last_ns: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def record(self, sent_ns: int, received_ns: int) -> None:
+        self._latencies.append(received_ns - sent_ns)
+        if self.first_ns is None:
+            self.first_ns = received_ns
+        self.last_ns = received_ns
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self._latencies)
+        result: Dict[str, Any] = {"count": count, "throughput": 0.0}
+        if not count:
+            return result
+        latencies_ms = np.asarray(self._latencies, dtype=np.float64) / 1e6
+        span = (self.last_ns - self.first_ns) / 1e9
+        if span > 0:
+            result["throughput"] = round(count / span, 1)
+        for name, value in zip(
+            PERCENTILES,
+            np.percentile(latencies_ms, list(PERCENTILES.values())),
+        ):
+            result[name] = round(float(value), 3)
+        result["mean_ms"] = round(float(latencies_ms.mean()), 3)
+        result["max_ms"] = round(float(latencies_ms.max()), 3)
+        return result
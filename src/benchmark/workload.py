@@ -0,0 +1,127 @@
+# src/benchmark/workload.py
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from models.schemas import SensorData, TimingData
+
+SENSOR_UNITS = {
+    "battery": "percentage",
+    "temperature": "celsius",
+    "speed": "km/h",
+    "tire_pressure": "bar",
+    "motor_rpm": "rpm",
+    "voltage": "V",
+    "current": "A",
+    "brake_temperature": "celsius",
+}
+
+# Send time (time.time_ns()) added to every payload. It travels untouched
+# through Redis pub/sub to WebSocket clients, which compute the latency.
+STAMP_FIELD = "sent_at_ns"
+
+Publish = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+class Workload:
+    """``cars`` × ``sensors`` readings at ``hz``, plus a lap per car every ``lap_seconds``.
+
+    Payloads are built from the ``SensorData``/``TimingData`` models, so they
+    look exactly like real producer traffic, and are published with the real
+    routing keys (``sensor.{device_id}.{sensor_type}``, ``timing.{device_id}``).
+    """
+
+    def __init__(
+        self,
+        cars: int,
+        sensors: int,
+        hz: float,
+        lap_seconds: float = 30.0,
+        seed: int = 0,
+    ):
+        self.devices = [f"car_{i:03d}" for i in range(cars)]
+        names = list(SENSOR_UNITS)
+        self.sensor_types = [
+            names[k] if k < len(names) else f"sensor_{k}" for k in range(sensors)
+        ]
+        self.hz = hz
+        self.lap_seconds = lap_seconds
+        self._rng = random.Random(seed)
+        self._values = {
+            (device, sensor_type): self._rng.uniform(20, 100)
+            for device in self.devices
+            for sensor_type in self.sensor_types
+        }
+        # Laps are staggered so cars do not all cross the line together
+        self._next_lap = [lap_seconds * (1 + i / max(cars, 1)) for i in range(cars)]
+        self.sensor_messages = 0
+        self.timing_messages = 0
+        # Ticks that started late because publishing could not keep up
+        self.late_ticks = 0
+
+    @property
+    def rate(self) -> float:
+        """Target sensor messages per second"""
+        return len(self.devices) * len(self.sensor_types) * self.hz
+
+    def _sensor_payloads(self, timestamp: datetime) -> List[Dict[str, Any]]:
+        payloads = []
+        for (device, sensor_type), value in self._values.items():
+            value += self._rng.gauss(0, 0.5)
+            self._values[device, sensor_type] = value
+            payloads.append(
+                SensorData(
+                    device_id=device,
+                    sensor_type=sensor_type,
+                    timestamp=timestamp,
+                    value=round(value, 3),
+                    unit=SENSOR_UNITS.get(sensor_type, "unit"),
+                ).model_dump(mode="json")
+            )
+        return payloads
+
+    def _lap_payload(self, device: str, timestamp: datetime) -> Dict[str, Any]:
+        lap_time = self.lap_seconds * self._rng.uniform(0.98, 1.02)
+        splits = [self._rng.uniform(0.3, 0.36), self._rng.uniform(0.3, 0.36)]
+        splits.append(1 - sum(splits))
+        return TimingData(
+            device_id=device,
+            timestamp=timestamp,
+            lap_time=round(lap_time, 3),
+            sector=3,
+            segment="finish",
+            sector_times=[round(lap_time * split, 3) for split in splits],
+        ).model_dump(mode="json")
+
+    async def run(self, publish: Publish, duration: float) -> None:
+        """Publish the workload for ``duration`` seconds on a fixed tick schedule"""
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.hz
+        start = loop.time()
+        tick = 0
+        while (elapsed := loop.time() - start) < duration:
+            timestamp = datetime.now(timezone.utc)
+            for payload in self._sensor_payloads(timestamp):
+                payload[STAMP_FIELD] = time.time_ns()
+                await publish(
+                    f"sensor.{payload['device_id']}.{payload['sensor_type']}", payload
+                )
+                self.sensor_messages += 1
+
+            for i, device in enumerate(self.devices):
+                if elapsed >= self._next_lap[i]:
+                    self._next_lap[i] += self.lap_seconds
+                    payload = self._lap_payload(device, timestamp)
+                    payload[STAMP_FIELD] = time.time_ns()
+                    await publish(f"timing.{device}", payload)
+                    self.timing_messages += 1
+
+            tick += 1
+            delay = start + tick * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late_ticks += 1
+                await asyncio.sleep(0)
@@ -0,0 +1,79 @@
+import asyncio
+import fcntl
+import logging
+import signal
+import time
+from pathlib import Path
+from typing import Optional
+
+from config import settings
+from services.cold_storage import ColdStore, Compactor
+from services.redis_service import RedisService
+from services.structured_logging import configure_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+
+class CompactorService:
+    """Run ``Compactor`` passes every COLD_STORAGE_INTERVAL_SECONDS until stopped.
+
+    Holds an exclusive lock on the storage directory, so a second compactor
+    for the same directory exits instead of archiving the same entries twice.
+    """
+
+    def __init__(self, root: str, redis: Optional[RedisService] = None):
+        self.root = Path(root)
+        self.redis = redis or RedisService()
+        self.compactor = Compactor(self.redis, ColdStore(self.root))
+        self._stop_event: Optional[asyncio.Event] = None
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def run(self):
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".compactor.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.error(f"Another compactor is running for {self.root}")
+                return
+            try:
+                while not self._stop_event.is_set():
+                    start = time.perf_counter()
+                    try:
+                        archived = await self.compactor.compact(int(time.time() * 1000))
+                        logger.info(
+                            f"Archived {archived} samples in "
+                            f"{time.perf_counter() - start:.1f}s"
+                        )
+                    except Exception as e:
+                        logger.error(f"Compaction failed: {e}")
+                    try:
+                        await asyncio.wait_for(
+                            self._stop_event.wait(),
+                            settings.COLD_STORAGE_INTERVAL_SECONDS,
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                await self.redis.close()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    if not settings.COLD_STORAGE_DIR:
+        raise SystemExit("COLD_STORAGE_DIR is not set")
+    try:
+        asyncio.run(CompactorService(settings.COLD_STORAGE_DIR).run())
+    finally:
+        shutdown_logging()
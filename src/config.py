@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -7,12 +8,108 @@ class Settings(BaseSettings):
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "LiveTiming Backend"
     DEBUG: bool = True
+    # Required in the X-Admin-Token header of /admin endpoints, which are
+    # disabled while it is empty
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+    # Logging: json or text lines, written by a background thread
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE: int = 10000
+    # Records per second per device_id before sampling kicks in (0 = off)
+    LOG_SAMPLE_PER_DEVICE_PER_SECOND: float = float(
+        os.getenv("LOG_SAMPLE_PER_DEVICE_PER_SECOND", 1.0)
+    )
+    # Runtime level changes are broadcast here to every API and consumer process
+    LOG_LEVEL_CHANNEL: str = "admin:log_level"
     
     # Redis settings
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
     REDIS_DB: int = 0
+    # Connection pools shared by every RedisService of a process (API, consumer).
+    # At REDIS_MAX_CONNECTIONS per pool, callers wait up to
+    # REDIS_POOL_TIMEOUT_SECONDS for a free connection instead of opening more.
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 64))
+    REDIS_POOL_TIMEOUT_SECONDS: float = 5.0
+    REDIS_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    # Idle connections are pinged before reuse after this long
+    REDIS_HEALTH_CHECK_SECONDS: int = 30
+
+    # Redis pub/sub channels. Updates are published per device, e.g.
+    # "timing_updates:{device_id}" and "sensor_updates:{device_id}:{sensor_type}",
+    # and subscribers use pattern subscriptions on these prefixes.
+    TIMING_UPDATES_CHANNEL: str = "timing_updates"
+    SENSOR_UPDATES_CHANNEL: str = "sensor_updates"
+    PUBSUB_RECONNECT_MIN_SECONDS: float = 0.5
+    PUBSUB_RECONNECT_MAX_SECONDS: float = 30.0
+    # Multi-worker serving (python -m src.serve). The API workers of a host get
+    # their pub/sub messages from one relay process over this Unix socket
+    # instead of subscribing to Redis themselves; unset, each subscribes directly.
+    PUBSUB_RELAY_SOCKET: str = os.getenv("PUBSUB_RELAY_SOCKET", "")
+    # Unsent bytes per worker before the relay disconnects it
+    PUBSUB_RELAY_MAX_BUFFER_BYTES: int = 16 * 1024 * 1024
+    API_WORKERS: int = int(os.getenv("API_WORKERS", 1))
+    # API background tasks (pub/sub reader, timing frames) are restarted after
+    # a crash with exponential backoff, and cancelled on shutdown
+    TASK_RESTART_MAX_SECONDS: float = 30.0
+    TASK_STOP_TIMEOUT_SECONDS: float = 10.0
+    # Latest values cached per API process (devices' sensors, timing rows)
+    LATEST_CACHE_SIZE: int = int(os.getenv("LATEST_CACHE_SIZE", 10000))
+
+    # Approximate number of entries kept per history stream (XADD MAXLEN ~)
+    TIMING_HISTORY_MAXLEN: int = int(os.getenv("TIMING_HISTORY_MAXLEN", 2000))
+    SENSOR_HISTORY_MAXLEN: int = int(os.getenv("SENSOR_HISTORY_MAXLEN", 50000))
+    # Entries fetched per XRANGE call when a whole range has to be read
+    HISTORY_READ_CHUNK: int = 10000
+    # Cold storage. With COLD_STORAGE_DIR set, the compactor moves sensor
+    # history older than COLD_STORAGE_AGE_SECONDS out of Redis into segment
+    # files there, every COLD_STORAGE_INTERVAL_SECONDS; the history endpoint
+    # reads both. The API has to run on the same host (or share the volume).
+    COLD_STORAGE_DIR: str = os.getenv("COLD_STORAGE_DIR", "")
+    COLD_STORAGE_AGE_SECONDS: float = float(os.getenv("COLD_STORAGE_AGE_SECONDS", 3600))
+    COLD_STORAGE_INTERVAL_SECONDS: float = 300.0
+    # Samples per segment file (16 bytes each)
+    COLD_SEGMENT_MAX_POINTS: int = 1_000_000
     
+    # WebSocket fan-out settings
+    # Frames queued per client before WS_OVERFLOW_POLICY applies:
+    # drop_oldest, coalesce (latest per device/sensor) or disconnect
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+    WS_OVERFLOW_POLICY: str = os.getenv("WS_OVERFLOW_POLICY", "coalesce")
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", 5.0))
+
+    # Timing clients receive coalesced field-level deltas at this interval
+    TIMING_FRAME_INTERVAL_MS: int = int(os.getenv("TIMING_FRAME_INTERVAL_MS", 100))
+
+    # Rolling sensor statistics computed in the consumer
+    AGGREGATION_ENABLED: bool = True
+    AGGREGATION_WINDOWS_SECONDS: List[float] = [1, 10, 60]
+    AGGREGATION_PERCENTILES: List[float] = [50, 95]
+    # Samples kept per (device, sensor type); should cover the longest window
+    AGGREGATION_BUFFER_SIZE: int = int(os.getenv("AGGREGATION_BUFFER_SIZE", 4096))
+    AGGREGATION_FLUSH_INTERVAL_MS: int = int(
+        os.getenv("AGGREGATION_FLUSH_INTERVAL_MS", 1000)
+    )
+    SUMMARY_UPDATES_CHANNEL: str = "summary_updates"
+
+    # Sensor conflation in the consumer. A (device, sensor type) with an
+    # interval publishes and sets its latest value at most once per interval:
+    # the first reading right away, then the newest one when the interval is up.
+    # Types not listed use SENSOR_CONFLATION_DEFAULT_MS; 0 turns it off.
+    # SENSOR_CONFLATION_HISTORY decides which readings of conflated types still
+    # go to history: "full" (all), "downsample" (one per
+    # SENSOR_CONFLATION_HISTORY_MS of sample time) or "latest" (those published).
+    SENSOR_CONFLATION_INTERVALS_MS: Dict[str, int] = {}
+    SENSOR_CONFLATION_DEFAULT_MS: int = int(os.getenv("SENSOR_CONFLATION_DEFAULT_MS", 0))
+    SENSOR_CONFLATION_HISTORY: str = os.getenv("SENSOR_CONFLATION_HISTORY", "full")
+    SENSOR_CONFLATION_HISTORY_MS: int = int(os.getenv("SENSOR_CONFLATION_HISTORY_MS", 100))
+
+    # Race standings (running order, gaps, best sectors) updated with every lap
+    # stored; the rows a lap changes are published on STANDINGS_UPDATES_CHANNEL
+    STANDINGS_ENABLED: bool = True
+    STANDINGS_UPDATES_CHANNEL: str = "standings_updates"
+
     # RabbitMQ settings
     RABBITMQ_HOST: str = os.getenv("RABBITMQ_HOST", "localhost")
     RABBITMQ_PORT: int = int(os.getenv("RABBITMQ_PORT", 5672))
@@ -22,6 +119,76 @@ class Settings(BaseSettings):
     # Queue settings
     TIMING_QUEUE: str = "timing_data"
     SENSOR_QUEUE: str = "sensor_data"
+    # Messages failing decoding or schema validation, with the reason in the
+    # x-reject-reason header
+    DEAD_LETTER_QUEUE: str = "dead_letter"
+    # Messages that failed processing are retried after each delay in turn
+    # (the last one repeating) and quarantined after RETRY_MAX_ATTEMPTS.
+    # Expired or rejected messages are quarantined by the broker as well.
+    RETRY_DELAYS_MS: List[int] = [1000, 5000, 30000]
+    RETRY_MAX_ATTEMPTS: int = 5
+    QUARANTINE_QUEUE: str = "quarantine"
+
+    # Publishing. Batches are published on pooled channels with publisher
+    # confirms; up to PUBLISH_CONFIRM_WINDOW messages await their confirm at once.
+    PUBLISH_CHANNEL_POOL_SIZE: int = int(os.getenv("PUBLISH_CHANNEL_POOL_SIZE", 4))
+    PUBLISH_CONFIRM_WINDOW: int = int(os.getenv("PUBLISH_CONFIRM_WINDOW", 1000))
+    PUBLISH_TIMEOUT_SECONDS: float = 30.0
+
+    # Consumer settings
+    # Maximum number of unacknowledged messages in flight per queue
+    CONSUMER_PREFETCH_COUNT: int = int(os.getenv("CONSUMER_PREFETCH_COUNT", 200))
+    # Messages are written to Redis and acked in batches of up to BATCH_MAX_SIZE,
+    # or after BATCH_FLUSH_INTERVAL_MS, whichever comes first. Keep the prefetch
+    # count above the batch size so batches can actually fill up.
+    BATCH_MAX_SIZE: int = int(os.getenv("BATCH_MAX_SIZE", 100))
+    BATCH_FLUSH_INTERVAL_MS: int = int(os.getenv("BATCH_FLUSH_INTERVAL_MS", 20))
+
+    # Flow control (see processing/flow_control.py). Past FLOW_CONTROL_BACKLOG
+    # queued messages the prefetch count and batch size grow, up to
+    # FLOW_CONTROL_MAX_SCALE times the values above, while a batch's Redis
+    # write stays under FLOW_CONTROL_SLOW_STORE_MS. Past the degraded depth or
+    # receive-to-ack latency only the newest reading per device and sensor
+    # type of each batch is stored; laps are always stored. Keep the degraded
+    # depth well under the queues' x-max-length, where publishes get rejected.
+    FLOW_CONTROL_ENABLED: bool = True
+    FLOW_CONTROL_INTERVAL_MS: int = 1000
+    FLOW_CONTROL_BACKLOG: int = int(os.getenv("FLOW_CONTROL_BACKLOG", 1000))
+    FLOW_CONTROL_MAX_SCALE: int = 8
+    FLOW_CONTROL_SLOW_STORE_MS: float = 250.0
+    FLOW_CONTROL_DEGRADED_DEPTH: int = int(os.getenv("FLOW_CONTROL_DEGRADED_DEPTH", 5000))
+    FLOW_CONTROL_DEGRADED_LATENCY_MS: float = float(
+        os.getenv("FLOW_CONTROL_DEGRADED_LATENCY_MS", 2000)
+    )
+
+    # Work sharding. Each queue is split into CONSUMER_SHARDS shard queues fed
+    # by a consistent-hash exchange on the device_id header, so all messages of
+    # one device land on the same shard and stay in order. Sharding needs the
+    # rabbitmq_consistent_hash_exchange plugin, so the default of 0 keeps the
+    # single TIMING_QUEUE/SENSOR_QUEUE layout. The shard count is part of the
+    # broker topology; change the number of workers instead of the number of
+    # shards.
+    CONSUMER_SHARDS: int = int(os.getenv("CONSUMER_SHARDS", 0))
+    SHARD_HASH_HEADER: str = "device_id"
+    # Worker processes started by the supervisor on this host
+    CONSUMER_WORKERS: int = int(os.getenv("CONSUMER_WORKERS", os.cpu_count() or 1))
+    WORKER_STOP_TIMEOUT_SECONDS: float = 30.0
+    # How long a resize waits for new workers to consume before stopping old ones
+    WORKER_READY_TIMEOUT_SECONDS: float = 60.0
+    WORKER_RESTART_MAX_SECONDS: float = 30.0
+
+    # Prometheus metrics of the consumer process(es); the API serves its own at
+    # /metrics. 0 disables the consumer endpoint.
+    CONSUMER_METRICS_PORT: int = int(os.getenv("CONSUMER_METRICS_PORT", 9100))
+
+    # Session recording. When RECORDING_DIR is set every consumer process
+    # appends what it consumes to RECORDING_DIR/<session>/<host>-<pid>.ltr;
+    # the session defaults to the UTC start time of the consumer (supervisor).
+    RECORDING_DIR: str = os.getenv("RECORDING_DIR", "")
+    RECORDING_SESSION: str = os.getenv("RECORDING_SESSION", "")
+    # Records are buffered and written a chunk at a time, each chunk indexed
+    RECORDING_CHUNK_RECORDS: int = 2000
+    RECORDING_CHUNK_SECONDS: float = 1.0
     
     class Config:
         case_sensitive = True
@@ -1,99 +1,518 @@
-import json
 import logging
+import math
+import os
+import signal
+import socket
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from aio_pika.abc import AbstractIncomingMessage
 from services.redis_service import RedisService
-from services.rabbitmq_service import RabbitMQService
+from services.rabbitmq_service import (
+    AsyncRabbitMQService,
+    consumer_queues,
+    is_first_delivery,
+)
+from processing.batcher import MessageBatcher
+from processing.conflation import SensorConflator
+from processing.flow_control import FlowController, latest_per_sensor
+from processing.aggregation import SensorAggregator
+from recording.session import RECORDING_SUFFIX, SessionWriter
+from processing.validation import (
+    SENSOR_VALIDATOR,
+    TIMING_VALIDATOR,
+    BatchValidator,
+    Rejected,
+)
+from services.codec import CodecError, decode, encode
+from services.metrics import QueueMetrics, serve_worker_metrics
+from services.pubsub_reader import RedisSubscriber
+from services.structured_logging import (
+    apply_level_command,
+    configure_logging,
+    shutdown_logging,
+)
 from config import settings
 import asyncio
-from datetime import datetime
+import time
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The decoded payload, or the CodecError if the body could not be decoded
+BatchItem = Tuple[AbstractIncomingMessage, Any]
+
+_MISSING = object()
+
 
 class MessageConsumer:
-    def __init__(self):
-        self.redis = RedisService()
-        self.rabbitmq = RabbitMQService()
-        self.loop = asyncio.get_event_loop()
+    """Consume timing and sensor queues concurrently on a single event loop.
 
-    def process_timing_data(self, ch, method, properties, body):
-        """Process timing data messages"""
-        try:
-            message = json.loads(body)
-            logger.info(f"Processing timing data: {message}")
-
-            # Validate message format
-            required_fields = ["device_id", "lap_time"]
-            if not all(field in message for field in required_fields):
-                logger.error(f"Invalid message format: {message}")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-                return
+    ``shards`` limits the consumer to those shard queues (see
+    ``CONSUMER_SHARDS``); by default it consumes all of them.
+    """
 
-            # Store in Redis
-            self.loop.run_until_complete(
-                self.redis.store_timing_data(message["device_id"], message)
+    def __init__(
+        self,
+        shards: Optional[Sequence[int]] = None,
+        prefetch_count: Optional[int] = None,
+        redis: Optional[RedisService] = None,
+        rabbitmq: Optional[AsyncRabbitMQService] = None,
+    ):
+        self.shards = shards
+        self.redis = redis or RedisService()
+        self.rabbitmq = rabbitmq or AsyncRabbitMQService(prefetch_count)
+        self.timing_metrics = QueueMetrics(settings.TIMING_QUEUE)
+        self.sensor_metrics = QueueMetrics(settings.SENSOR_QUEUE)
+        # Prefetch and batch size follow the backlog; see FLOW_CONTROL_*
+        self.timing_flow = FlowController(
+            settings.TIMING_QUEUE, prefetch_count, degrade=False
+        )
+        self.sensor_flow = FlowController(settings.SENSOR_QUEUE, prefetch_count)
+        # Runtime log level changes from the admin API
+        self.control = RedisSubscriber(self.redis)
+        self.control.add_channel(
+            settings.LOG_LEVEL_CHANNEL, lambda _, data: apply_level_command(data)
+        )
+        self._stop_event: Optional[asyncio.Event] = None
+        self.timing_batcher: Optional[MessageBatcher[BatchItem]] = None
+        self.sensor_batcher: Optional[MessageBatcher[BatchItem]] = None
+        self.aggregator: Optional[SensorAggregator] = None
+        if settings.AGGREGATION_ENABLED:
+            self.aggregator = SensorAggregator(
+                settings.AGGREGATION_WINDOWS_SECONDS,
+                settings.AGGREGATION_PERCENTILES,
+                settings.AGGREGATION_BUFFER_SIZE,
             )
+        # Latest values of fast sensors published at most once per interval
+        conflator = SensorConflator()
+        self.conflator = conflator if conflator.enabled else None
+        self._conflation_lock: Optional[asyncio.Lock] = None
+        # Tee of everything consumed, for replaying the session later
+        self.recorder: Optional[SessionWriter] = None
+        if settings.RECORDING_DIR:
+            self.recorder = SessionWriter(recording_path())
 
-            # Acknowledge the message
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+    def _create_batchers(self):
+        """Batchers need a running loop, so they are built when consuming starts"""
+        # Keeps held readings from being written out of order with their batches
+        self._conflation_lock = asyncio.Lock()
+        self.timing_batcher = MessageBatcher(
+            self.flush_timing_batch,
+            self.timing_flow.batch_size,
+            settings.BATCH_FLUSH_INTERVAL_MS,
+        )
+        self.sensor_batcher = MessageBatcher(
+            self.flush_sensor_batch,
+            self.sensor_flow.batch_size,
+            settings.BATCH_FLUSH_INTERVAL_MS,
+        )
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding message: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-        except Exception as e:
-            logger.error(f"Error processing timing data: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+    async def flush_timing_batch(self, batch: List[BatchItem]):
+        """Validate a batch of timing messages, store it in one pipeline and ack it"""
+        await self._flush_batch(
+            batch,
+            TIMING_VALIDATOR,
+            self.timing_metrics,
+            self.timing_flow,
+            lambda data, raw: self.redis.store_batch(timing_data=data, timing_raw=raw),
+        )
 
-    def process_sensor_data(self, ch, method, properties, body):
-        """Process sensor data messages"""
-        try:
-            message = json.loads(body)
-            logger.info(f"Processing sensor data: {message}")
-
-            # Validate message format
-            required_fields = ["device_id", "sensor_type", "value", "unit"]
-            if not all(field in message for field in required_fields):
-                logger.error(f"Invalid message format: {message}")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+    async def flush_sensor_batch(self, batch: List[BatchItem]):
+        """Validate a batch of sensor messages, store it in one pipeline and ack it"""
+        stored = await self._flush_batch(
+            batch,
+            SENSOR_VALIDATOR,
+            self.sensor_metrics,
+            self.sensor_flow,
+            self._store_sensor_batch,
+        )
+        if stored and self.aggregator is not None:
+            self.aggregator.add_batch(
+                (
+                    data["device_id"],
+                    data["sensor_type"],
+                    data["timestamp"],
+                    data["value"],
+                )
+                for data in stored
+            )
+
+    async def _store_sensor_batch(self, data: List[Dict[str, Any]], raw: List[bytes]):
+        if self.sensor_flow.degraded:
+            kept, raw = latest_per_sensor(data, raw)
+            self.sensor_metrics.superseded.inc(len(data) - len(kept))
+            data = kept
+        if self.conflator is None:
+            await self.redis.store_batch(sensor_data=data, sensor_raw=raw)
+            return
+        async with self._conflation_lock:
+            now = time.monotonic()
+            snapshot = self.conflator.snapshot(data)
+            parts = [
+                self.conflator.add(reading, body, now)
+                for reading, body in zip(data, raw)
+            ]
+            try:
+                await self.redis.store_batch(
+                    sensor_data=data, sensor_raw=raw, sensor_parts=parts
+                )
+            except Exception:
+                # The batch goes to the retry queues: undo having seen it
+                self.conflator.rollback(snapshot)
+                raise
+
+    async def run_conflation(self):
+        """Write and publish held sensor readings as their intervals run out"""
+        while True:
+            await asyncio.sleep(self.conflator.tick)
+            await self.emit_conflated(time.monotonic())
+
+    async def emit_conflated(self, now: float):
+        async with self._conflation_lock:
+            due = self.conflator.due(now)
+            if not due:
                 return
+            try:
+                await self.redis.store_batch(
+                    sensor_data=[reading for reading, _ in due],
+                    sensor_raw=[body for _, body in due],
+                    sensor_parts=[self.conflator.emit_parts] * len(due),
+                )
+            except Exception as e:
+                logger.error(f"Error publishing {len(due)} conflated readings: {e}")
+                self.conflator.restore(due)
 
-            # Store in Redis
-            self.loop.run_until_complete(
-                self.redis.store_sensor_data(message["device_id"], message)
-            )
+    async def _flush_batch(
+        self,
+        batch: List[BatchItem],
+        validator: BatchValidator,
+        metrics: QueueMetrics,
+        flow: FlowController,
+        store: Callable[[List[Dict[str, Any]], List[bytes]], Awaitable[Any]],
+    ) -> List[Dict[str, Any]]:
+        """Returns the normalized payloads that were stored (or superseded)"""
+        metrics.batch_size.observe(len(batch))
+        start = time.perf_counter()
+        normalized, rejected = validator.validate([payload for _, payload in batch])
+        metrics.validate_seconds.observe(time.perf_counter() - start)
+        settled = set()
+        for rejection in rejected:
+            message = batch[rejection.index][0]
+            if not await self._dead_letter(message, rejection, metrics):
+                settled.add(rejection.index)
+        # Each queue (shard) has its own channel and batches are flushed in
+        # delivery order, so a cumulative ack on the last outstanding message
+        # of every channel covers exactly the rest of this batch, dead-lettered
+        # messages included.
+        last_messages = last_message_per_channel(
+            [item for i, item in enumerate(batch) if i not in settled]
+        )
+        valid = [
+            (message, payload)
+            for (message, _), payload in zip(batch, normalized)
+            if payload is not None
+        ]
+        try:
+            if valid:
+                start = time.perf_counter()
+                await store(
+                    [payload for _, payload in valid],
+                    [
+                        published_body(message, decoded, payload)
+                        for (message, decoded), payload in zip(batch, normalized)
+                        if payload is not None
+                    ],
+                )
+                elapsed = time.perf_counter() - start
+                metrics.store_seconds.observe(elapsed)
+                flow.observe_store(elapsed)
+        except Exception as e:
+            logger.error(f"Error storing batch of {len(batch)} messages: {e}")
+            await self._retry_batch(valid, last_messages, metrics, str(e))
+            return []
+        for message in last_messages:
+            await message.ack(multiple=True)
+        metrics.acked.inc(len(valid))
+        return [payload for _, payload in valid]
 
-            # Acknowledge the message
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+    async def _retry_batch(
+        self,
+        failed: List[BatchItem],
+        last_messages: List[AbstractIncomingMessage],
+        metrics: QueueMetrics,
+        detail: str,
+    ):
+        """Hand a failed batch to the delayed retry queues, then ack it.
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding message: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        Requeueing would redeliver it immediately, and during a Redis outage
+        every consumer would spin on the same messages. If the retries cannot
+        be published either, the batch is requeued after all.
+        """
+        try:
+            for message, _ in failed:
+                if await self.rabbitmq.retry(
+                    message, "store_error", detail, metrics.queue
+                ):
+                    metrics.quarantined("store_error")
+                else:
+                    metrics.retried.inc()
+            for message in last_messages:
+                await message.ack(multiple=True)
         except Exception as e:
-            logger.error(f"Error processing sensor data: {e}")
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            logger.error(f"Error scheduling retries, requeueing batch: {e}")
+            for message in last_messages:
+                await message.nack(multiple=True, requeue=True)
+            metrics.nacked("store_error", len(failed))
+
+    async def _dead_letter(
+        self,
+        message: AbstractIncomingMessage,
+        rejection: Rejected,
+        metrics: QueueMetrics,
+    ) -> bool:
+        """Copy an invalid message to DEAD_LETTER_QUEUE.
+
+        Returns False if that failed and the message was rejected instead,
+        which the queue's dead-letter exchange turns into quarantine; it must
+        then be left out of the batch's acks.
+        """
+        logger.warning(
+            "Dead-lettering %s message (%s): %s",
+            metrics.queue,
+            rejection.reason,
+            rejection.detail,
+            extra={
+                "device_id": (message.headers or {}).get(settings.SHARD_HASH_HEADER)
+            },
+        )
+        if await self.rabbitmq.dead_letter(
+            message, rejection.reason, rejection.detail, metrics.queue
+        ):
+            metrics.dead_lettered(rejection.reason)
+            return True
+        await message.reject(requeue=False)
+        metrics.nacked(rejection.reason)
+        return False
+
+    async def run_aggregation(self):
+        """Flush rolling sensor statistics every AGGREGATION_FLUSH_INTERVAL_MS"""
+        interval = settings.AGGREGATION_FLUSH_INTERVAL_MS / 1000
+        while True:
+            await asyncio.sleep(interval)
+            taken = self.aggregator.take()
+            if taken is None:
+                continue
+            # The percentiles sort every window: keep them off the event loop
+            summaries = await asyncio.to_thread(self.aggregator.summarize, taken)
+            if not summaries:
+                continue
+            try:
+                await self.redis.store_summaries(summaries)
+            except Exception as e:
+                logger.error(f"Error storing sensor summaries: {e}")
+
+    async def run_recording(self):
+        """Write the recorder's buffered records once they span a chunk"""
+        interval = self.recorder.chunk_ms / 2000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.recorder.flush_due()
+            except Exception as e:
+                logger.error(f"Error writing recorded messages: {e}")
+
+    async def run_flow_control(self):
+        """Resize prefetch and batches to the backlog every FLOW_CONTROL_INTERVAL_MS"""
+        interval = settings.FLOW_CONTROL_INTERVAL_MS / 1000
+        kinds = (
+            (settings.TIMING_QUEUE, self.timing_flow, self.timing_batcher),
+            (settings.SENSOR_QUEUE, self.sensor_flow, self.sensor_batcher),
+        )
+        while True:
+            await asyncio.sleep(interval)
+            for queue, flow, batcher in kinds:
+                queues = consumer_queues(queue, self.shards)
+                try:
+                    depth = 0
+                    for name in queues:
+                        depth += await self.rabbitmq.get_queue_message_count(name)
+                    if flow.update(depth, batcher.latency):
+                        await self.rabbitmq.set_prefetch(queues, flow.prefetch_count)
+                    batcher.max_size = flow.batch_size
+                except Exception as e:
+                    logger.error(f"Error adjusting flow control of {queue}: {e}")
+
+    async def process_timing_data(self, message: AbstractIncomingMessage):
+        """Process timing data messages"""
+        await self._receive(message, self.timing_batcher, self.timing_metrics)
+
+    async def process_sensor_data(self, message: AbstractIncomingMessage):
+        """Process sensor data messages"""
+        await self._receive(message, self.sensor_batcher, self.sensor_metrics)
 
-    def run(self):
-        """Start consuming messages from both queues"""
+    async def _receive(
+        self,
+        message: AbstractIncomingMessage,
+        batcher: MessageBatcher[BatchItem],
+        metrics: QueueMetrics,
+    ):
+        """Decode one message and hand it to its batcher.
+
+        Validation happens per batch at flush time. Undecodable messages go
+        through the batcher as well, so every message is settled in delivery
+        order.
+        """
+        metrics.consumed.inc()
         try:
-            # Setup consumers for both queues
-            self.rabbitmq.consume_messages(
-                settings.TIMING_QUEUE, self.process_timing_data
-            )
-            self.rabbitmq.consume_messages(
-                settings.SENSOR_QUEUE, self.process_sensor_data
+            # Redeliveries and retries were recorded when first delivered
+            if self.recorder is not None and is_first_delivery(message):
+                self.recorder.append(
+                    message.routing_key,
+                    message.content_type,
+                    message.headers,
+                    message.body,
+                )
+            start = time.perf_counter()
+            try:
+                payload = decode(message.body, message.content_type)
+            except CodecError as e:
+                payload = e
+            metrics.decode_seconds.observe(time.perf_counter() - start)
+            logger.debug(
+                "Processing %s message: %s",
+                metrics.queue,
+                payload,
+                extra={
+                    "device_id": (message.headers or {}).get(settings.SHARD_HASH_HEADER)
+                },
             )
+            batcher.add((message, payload))
 
-            logger.info("Started consuming messages from all queues")
-            self.rabbitmq.start_consuming()
+        except Exception as e:
+            logger.error(f"Error processing {metrics.queue} message: {e}")
+            # Quarantined by the queue's dead-letter exchange
+            await message.nack(requeue=False)
+            metrics.nacked("error")
+
+    def stop(self):
+        """Ask a running consumer to shut down"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def run(self, on_ready: Optional[Callable[[], Any]] = None):
+        """Start consuming messages from both queues until stopped.
+
+        ``on_ready`` is called once every queue has a consumer (active or
+        standby).
+        """
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. not on the main thread or unsupported platform
+
+        self._create_batchers()
+        aggregation_task = None
+        if self.aggregator is not None:
+            aggregation_task = asyncio.create_task(self.run_aggregation())
+        conflation_task = None
+        if self.conflator is not None:
+            conflation_task = asyncio.create_task(self.run_conflation())
+        flow_task = None
+        if settings.FLOW_CONTROL_ENABLED:
+            flow_task = asyncio.create_task(self.run_flow_control())
+        recording_task = None
+        if self.recorder is not None:
+            recording_task = asyncio.create_task(self.run_recording())
+        control_task = asyncio.create_task(self.control.run())
 
-        except KeyboardInterrupt:
+        try:
+            await self.redis.get_connection()
+            for queue in consumer_queues(settings.TIMING_QUEUE, self.shards):
+                await self.rabbitmq.consume_messages(queue, self.process_timing_data)
+            for queue in consumer_queues(settings.SENSOR_QUEUE, self.shards):
+                await self.rabbitmq.consume_messages(queue, self.process_sensor_data)
+
+            logger.info("Started consuming messages from all queues")
+            if on_ready is not None:
+                on_ready()
+            await self._stop_event.wait()
             logger.info("Stopping consumer...")
+
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
         finally:
-            self.rabbitmq.close()
+            if aggregation_task is not None:
+                aggregation_task.cancel()
+            if flow_task is not None:
+                flow_task.cancel()
+            if conflation_task is not None:
+                conflation_task.cancel()
+            if recording_task is not None:
+                recording_task.cancel()
+            self.control.stop()
+            control_task.cancel()
+            # Stop deliveries first so nothing arrives after the final flush;
+            # a standby consumer then takes over the shards from the next message
+            await self.rabbitmq.cancel_consumers()
+            await self.timing_batcher.flush()
+            await self.sensor_batcher.flush()
+            if self.conflator is not None:
+                await self.emit_conflated(math.inf)
+            await self.rabbitmq.close()
+            await self.redis.close()
+            if self.recorder is not None:
+                self.recorder.close()
+
+
+def recording_path() -> Path:
+    """This process' recording file in the current session directory"""
+    session = settings.RECORDING_SESSION or datetime.now(timezone.utc).strftime(
+        "%Y%m%dT%H%M%SZ"
+    )
+    name = f"{socket.gethostname()}-{os.getpid()}{RECORDING_SUFFIX}"
+    return Path(settings.RECORDING_DIR) / session / name
+
+
+def published_body(
+    message: AbstractIncomingMessage,
+    decoded: Dict[str, Any],
+    normalized: Dict[str, Any],
+) -> bytes:
+    """What to publish for a stored message.
+
+    The body as received, unless validation changed a field (e.g. stamped a
+    missing timestamp or converted its format); then the normalized fields
+    are re-encoded in the message's content type, so every subscriber sees
+    what Redis holds. Fields outside the model are kept.
+    """
+    if all(
+        decoded.get(field, _MISSING) == value for field, value in normalized.items()
+    ):
+        return message.body
+    return encode({**decoded, **normalized}, message.content_type)
+
+
+def last_message_per_channel(
+    batch: List[BatchItem],
+) -> List[AbstractIncomingMessage]:
+    """The last message of ``batch`` delivered to each consumer (one per channel)"""
+    last: Dict[Optional[str], AbstractIncomingMessage] = {}
+    for message, _ in batch:
+        last[message.consumer_tag] = message
+    return list(last.values())
 
 
 if __name__ == "__main__":
+    configure_logging()
+    if settings.CONSUMER_METRICS_PORT:
+        serve_worker_metrics(settings.CONSUMER_METRICS_PORT)
     consumer = MessageConsumer()
-    consumer.run()
+    try:
+        asyncio.run(consumer.run())
+    except KeyboardInterrupt:
+        logger.info("Stopping consumer...")
+    finally:
+        shutdown_logging()
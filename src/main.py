@@ -1,12 +1,45 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from redis.exceptions import ConnectionError as RedisConnectionError
+from api.routes.v1 import admin, websocket
 from api.routes.v1 import router as v1_router
 from config import settings
+from services.metrics import render_latest
+from services.redis_service import redis_pools
+from services.structured_logging import configure_logging, shutdown_logging
+from services.tasks import TaskSupervisor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the background tasks and connections of the API process.
+
+    Startup only starts tasks: Redis and the broker are connected on first
+    use, so the API comes up (and retries in the background) while they are
+    still unreachable. Logging is configured here rather than on import, so
+    importing the app (tests, tooling) leaves the process' logging alone.
+    """
+    configure_logging()
+    tasks = app.state.tasks = TaskSupervisor()
+    websocket.manager.start(tasks)
+    try:
+        yield
+    finally:
+        await tasks.stop()
+        await websocket.manager.shutdown()
+        await admin.close_broker()
+        await redis_pools.close()
+        shutdown_logging()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     debug=settings.DEBUG,
     openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -22,6 +55,23 @@ app.add_middleware(
 app.include_router(v1_router, prefix=settings.API_V1_PREFIX)
 
 
+@app.exception_handler(RedisConnectionError)
+async def redis_unavailable_handler(request: Request, exc: RedisConnectionError):
+    return JSONResponse(status_code=503, content={"detail": "Storage unavailable"})
+
+
 @app.get("/health")
-async def health_check():
-    return {"status": "healthy", "version": "1.0.0"}
+async def health_check(request: Request):
+    tasks = getattr(request.app.state, "tasks", None)
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "tasks": tasks.status() if tasks is not None else {},
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this API process"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
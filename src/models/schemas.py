@@ -1,23 +1,33 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Any
+from typing import Annotated, Optional, Any, Dict, List
 from datetime import datetime
+from enum import Enum
 
 
 class TimingData(BaseModel):
-    device_id: str = Field(..., description="Unique identifier for the timing device")
+    device_id: str = Field(
+        ..., min_length=1, description="Unique identifier for the timing device"
+    )
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-    lap_time: float = Field(..., description="Lap time in seconds")
+    lap_time: float = Field(
+        ..., gt=0, allow_inf_nan=False, description="Lap time in seconds"
+    )
     sector: Optional[int] = Field(None, description="Sector number")
     segment: Optional[str] = Field(None, description="Segment identifier")
+    sector_times: Optional[List[Annotated[float, Field(gt=0, allow_inf_nan=False)]]] = (
+        Field(None, description="Sector times of the lap in seconds, in order")
+    )
 
 
 class SensorData(BaseModel):
-    device_id: str = Field(..., description="Unique identifier for the sensor")
+    device_id: str = Field(
+        ..., min_length=1, description="Unique identifier for the sensor"
+    )
     sensor_type: str = Field(
-        ..., description="Type of sensor (e.g., temperature, speed)"
+        ..., min_length=1, description="Type of sensor (e.g., temperature, speed)"
     )
     timestamp: datetime = Field(default_factory=datetime.utcnow)
-    value: float = Field(..., description="Sensor reading value")
+    value: float = Field(..., allow_inf_nan=False, description="Sensor reading value")
     unit: str = Field(..., description="Unit of measurement")
 
 
@@ -28,9 +38,114 @@ class TimingResponse(BaseModel):
     last_update: datetime
 
 
+class TimingBoardRow(BaseModel):
+    latest_lap: Optional[float]
+    best_lap: Optional[float]
+    sector: Optional[int]
+    segment: Optional[str]
+    lap_count: int
+    last_update: int = Field(..., description="Epoch milliseconds")
+
+
+class TimingBoardResponse(BaseModel):
+    devices: Dict[str, TimingBoardRow]
+
+
+class StandingsRow(BaseModel):
+    device_id: str
+    position: int
+    laps: int
+    timestamp: int = Field(..., description="Epoch ms the last lap was completed")
+    gap: Optional[float] = Field(
+        ...,
+        description="Seconds behind the leader on the same lap, null when laps down",
+    )
+    interval: Optional[float] = Field(
+        ...,
+        description="Seconds behind the car ahead on the same lap, null when laps down",
+    )
+    laps_behind: int = Field(..., description="Laps down on the leader")
+    interval_laps: int = Field(..., description="Laps down on the car ahead")
+
+
+class RecordTime(BaseModel):
+    time: float
+    device_id: str
+
+
+class StandingsResponse(BaseModel):
+    standings: List[StandingsRow]
+    best_lap: Optional[RecordTime]
+    best_sectors: Optional[List[RecordTime]]
+
+
 class SensorResponse(BaseModel):
     device_id: str
     sensor_type: str
     latest_value: float
     unit: str
     last_update: datetime
+
+
+class DownsampleMethod(str, Enum):
+    AVG = "avg"
+    MIN = "min"
+    MAX = "max"
+    LTTB = "lttb"
+
+
+class SensorHistoryPoint(BaseModel):
+    timestamp: datetime
+    value: float
+    min: Optional[float] = Field(None, description="Bucket minimum when downsampled")
+    max: Optional[float] = Field(None, description="Bucket maximum when downsampled")
+
+
+class SensorHistoryResponse(BaseModel):
+    device_id: str
+    sensor_type: str
+    unit: Optional[str]
+    downsample: Optional[str] = Field(
+        None, description="Downsampling method applied, if any"
+    )
+    points: List[SensorHistoryPoint]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as `cursor` to fetch the next page"
+    )
+
+
+class LapRecord(BaseModel):
+    timestamp: datetime
+    lap_time: float
+    sector: Optional[int]
+    segment: Optional[str]
+
+
+class TimingHistoryResponse(BaseModel):
+    device_id: str
+    laps: List[LapRecord]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as `cursor` to fetch the next page"
+    )
+
+
+class LogLevelUpdate(BaseModel):
+    level: str = Field(..., description="DEBUG, INFO, WARNING, ERROR or CRITICAL")
+    logger: Optional[str] = Field(
+        None, description="Logger name, e.g. consumer (default: root logger)"
+    )
+
+
+class HeldMessage(BaseModel):
+    routing_key: str
+    reason: Optional[str] = Field(None, description="x-reject-reason header")
+    attempts: int = Field(0, description="Failed processing attempts")
+    headers: Dict[str, Any]
+    payload: Any = Field(None, description="Decoded body, if it could be decoded")
+    raw: Optional[str] = Field(None, description="Base64 body when it could not")
+
+
+class HeldQueueResponse(BaseModel):
+    queue: str
+    message_count: int
+    messages: List[HeldMessage]
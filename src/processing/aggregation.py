@@ -0,0 +1,172 @@
+# src/processing/aggregation.py
+import warnings
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SeriesKey = Tuple[str, str]
+# Series keys with their timestamps, values and newest timestamp, as copied
+Taken = Tuple[List[SeriesKey], np.ndarray, np.ndarray, np.ndarray]
+
+
+class SensorAggregator:
+    """Rolling-window statistics for every (device_id, sensor_type).
+
+    Samples live in one preallocated 2-D ring buffer (one row per series,
+    ``capacity`` columns), so appending a batch and computing statistics are
+    both vectorized across all series at once instead of running per message.
+    Windows are anchored at the newest sample of each series, which keeps the
+    results correct for replayed or delayed data.
+    """
+
+    def __init__(
+        self,
+        windows_seconds: Sequence[float],
+        percentiles: Sequence[float] = (50, 95),
+        capacity: int = 4096,
+        initial_series: int = 64,
+    ):
+        self.windows_ms = [int(w * 1000) for w in windows_seconds]
+        self.window_names = [_window_name(w) for w in windows_seconds]
+        self.percentiles = list(percentiles)
+        self.capacity = capacity
+        self._rows: Dict[SeriesKey, int] = {}
+        self._keys: List[SeriesKey] = []
+        self._allocate(initial_series)
+
+    def _allocate(self, rows: int) -> None:
+        # Timestamp 0 marks an empty slot; it is never inside a window
+        timestamps = np.zeros((rows, self.capacity), dtype=np.int64)
+        values = np.zeros((rows, self.capacity), dtype=np.float64)
+        heads = np.zeros(rows, dtype=np.int64)
+        latest = np.zeros(rows, dtype=np.int64)
+        dirty = np.zeros(rows, dtype=bool)
+        if hasattr(self, "timestamps"):
+            n = len(self._keys)
+            timestamps[:n] = self.timestamps[:n]
+            values[:n] = self.values[:n]
+            heads[:n] = self.heads[:n]
+            latest[:n] = self.latest[:n]
+            dirty[:n] = self.dirty[:n]
+        self.timestamps, self.values = timestamps, values
+        self.heads, self.latest, self.dirty = heads, latest, dirty
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _row(self, key: SeriesKey) -> int:
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            if row == len(self.heads):
+                self._allocate(row * 2)
+            self._rows[key] = row
+            self._keys.append(key)
+        return row
+
+    def add_batch(self, samples: Iterable[Tuple[str, str, int, float]]) -> None:
+        """Append ``(device_id, sensor_type, timestamp_ms, value)`` samples"""
+        samples = list(samples)
+        if not samples:
+            return
+        rows = np.fromiter(
+            (self._row((d, t)) for d, t, _, _ in samples), np.int64, len(samples)
+        )
+        ts = np.fromiter((s[2] for s in samples), np.int64, len(samples))
+        vals = np.fromiter((s[3] for s in samples), np.float64, len(samples))
+
+        # Rank each sample within its series so a batch is written in one go
+        order = np.argsort(rows, kind="stable")
+        rows, ts, vals = rows[order], ts[order], vals[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        counts = np.diff(np.r_[starts, len(rows)])
+        rank = np.arange(len(rows)) - np.repeat(starts, counts)
+        positions = (self.heads[rows] + rank) % self.capacity
+
+        self.timestamps[rows, positions] = ts
+        self.values[rows, positions] = vals
+        series = rows[starts]
+        self.heads[series] = (self.heads[series] + counts) % self.capacity
+        np.maximum.at(self.latest, rows, ts)
+        self.dirty[series] = True
+
+    def compute(self, only_dirty: bool = True) -> Dict[SeriesKey, Dict[str, Any]]:
+        """Windowed statistics per series, keyed by window name ("1s", "10s", ...).
+
+        With ``only_dirty`` only series that received samples since the last
+        call are reported. Windows without samples are omitted.
+        """
+        taken = self.take(only_dirty)
+        return self.summarize(taken) if taken is not None else {}
+
+    def take(self, only_dirty: bool = True) -> Optional[Taken]:
+        """Copy the series to report and clear their dirty flags.
+
+        The copy is all :meth:`summarize` reads, so the percentiles can be
+        computed in another thread while batches keep being added.
+        """
+        n = len(self._keys)
+        rows = np.flatnonzero(self.dirty[:n]) if only_dirty else np.arange(n)
+        self.dirty[:n] = False
+        if len(rows) == 0:
+            return None
+        return (
+            [self._keys[row] for row in rows],
+            self.timestamps[rows],
+            self.values[rows],
+            self.latest[rows][:, None],
+        )
+
+    def summarize(self, taken: Taken) -> Dict[SeriesKey, Dict[str, Any]]:
+        """Windowed statistics for series copied by :meth:`take`"""
+        keys, timestamps, values, latest = taken
+        results: Dict[SeriesKey, Dict[str, Any]] = {key: {} for key in keys}
+
+        with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for name, window_ms in zip(self.window_names, self.windows_ms):
+                mask = (timestamps > latest - window_ms) & (timestamps > 0)
+                count = mask.sum(axis=1)
+                masked = np.where(mask, values, np.nan)
+                stats = {
+                    "count": count,
+                    "mean": np.nanmean(masked, axis=1),
+                    "min": np.nanmin(masked, axis=1),
+                    "max": np.nanmax(masked, axis=1),
+                    "std": np.nanstd(masked, axis=1),
+                    "rate": _rate_per_second(timestamps, values, mask),
+                }
+                if self.percentiles:
+                    pct = np.nanpercentile(masked, self.percentiles, axis=1)
+                    for p, column in zip(self.percentiles, pct):
+                        stats[f"p{p:g}"] = column
+
+                for i, key in enumerate(keys):
+                    if count[i]:
+                        results[key][name] = {
+                            stat: _clean(column[i]) for stat, column in stats.items()
+                        }
+        return results
+
+
+def _rate_per_second(
+    timestamps: np.ndarray, values: np.ndarray, mask: np.ndarray
+) -> np.ndarray:
+    """Change per second between the oldest and newest sample in each window"""
+    index = np.arange(len(timestamps))
+    first = np.argmin(np.where(mask, timestamps, np.iinfo(np.int64).max), axis=1)
+    last = np.argmax(np.where(mask, timestamps, -1), axis=1)
+    dt = (timestamps[index, last] - timestamps[index, first]) / 1000
+    dv = values[index, last] - values[index, first]
+    return np.where(dt > 0, dv / dt, 0.0)
+
+
+def _clean(value: Any) -> Any:
+    if isinstance(value, np.integer):
+        return int(value)
+    value = float(value)
+    return None if np.isnan(value) else round(value, 6)
+
+
+def _window_name(seconds: float) -> str:
+    return f"{seconds:g}s"
@@ -0,0 +1,80 @@
+# src/processing/batcher.py
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Generic, List, Optional, Set, TypeVar
+
+from processing.flow_control import ewma
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class MessageBatcher(Generic[T]):
+    """Group items into batches of up to ``max_size`` or ``flush_interval_ms``.
+
+    Flushes are serialized: a batch is only handed to ``flush`` once the
+    previous one has completed. This keeps cumulative AMQP acknowledgements
+    (``ack(multiple=True)``) safe, since a later batch can never be acked
+    before an earlier one has been written.
+
+    ``max_size`` may be changed at any time. ``latency`` is a moving average
+    of the time from a batch's first item being added to its flush completing.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[T]], Awaitable[None]],
+        max_size: int,
+        flush_interval_ms: float,
+    ):
+        self._flush = flush
+        self.max_size = max(1, max_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self._pending: List[T] = []
+        self._started = 0.0
+        self.latency = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, item: T) -> None:
+        """Queue an item, flushing when the batch is full or the interval elapses"""
+        if not self._pending:
+            self._started = time.perf_counter()
+        self._pending.append(item)
+        if len(self._pending) >= self.max_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.flush_interval, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._run_flush(batch, self._started))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_flush(self, batch: List[T], started: float) -> None:
+        async with self._lock:
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logger.error(f"Error flushing batch of {len(batch)} items: {e}")
+        elapsed = time.perf_counter() - started
+        self.latency = ewma(self.latency, elapsed)
+
+    async def flush(self) -> None:
+        """Flush pending items and wait for all in-progress flushes"""
+        self._schedule_flush()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -0,0 +1,177 @@
+# src/processing/conflation.py
+"""Per-(device, sensor type) conflation of sensor readings in the consumer.
+
+Fast sensors report far more often than any screen redraws. For types with an
+interval (SENSOR_CONFLATION_INTERVALS_MS), the latest value is written and
+published at most once per interval. The first reading after a quiet
+interval goes out right away. Later readings are held, each replacing the
+previous one, and the newest is emitted when the interval is up. The
+latest state is therefore never more than an interval behind, and nothing
+newer is lost. Pub/sub and WebSocket traffic drop by the ratio of the sensor
+rate to the interval.
+
+Summaries count every reading. What goes to history depends on
+``HistoryPolicy``.
+"""
+
+import math
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from services.metrics import SENSOR_READINGS_CONFLATED
+from services.redis_service import (
+    SENSOR_ALL,
+    SENSOR_HISTORY,
+    SENSOR_LATEST,
+    SENSOR_SUMMARY,
+    to_epoch_ms,
+)
+
+Key = Tuple[str, str]
+Reading = Tuple[Dict[str, Any], bytes]
+# Per key: last emit time, held reading and last history sample time
+Snapshot = Dict[Key, Tuple[Optional[float], Optional[Reading], Optional[int]]]
+
+
+class HistoryPolicy(str, Enum):
+    FULL = "full"
+    # One reading per SENSOR_CONFLATION_HISTORY_MS of sample time
+    DOWNSAMPLE = "downsample"
+    # Only the readings that are published
+    LATEST = "latest"
+
+
+class SensorConflator:
+    """Decide which parts of each reading to write (``SENSOR_*`` flags).
+
+    ``add`` is called for every reading as its batch is stored. ``due``
+    returns the held readings whose interval is up, to be written with
+    ``emit_parts``. Times are ``time.monotonic()`` seconds.
+    """
+
+    def __init__(
+        self,
+        intervals_ms: Optional[Dict[str, int]] = None,
+        default_ms: Optional[int] = None,
+        history: Optional[str] = None,
+        history_ms: Optional[int] = None,
+    ):
+        if intervals_ms is None:
+            intervals_ms = settings.SENSOR_CONFLATION_INTERVALS_MS
+        self.intervals = {t: ms / 1000 for t, ms in intervals_ms.items()}
+        if default_ms is None:
+            default_ms = settings.SENSOR_CONFLATION_DEFAULT_MS
+        self.default = default_ms / 1000
+        self.history = HistoryPolicy(history or settings.SENSOR_CONFLATION_HISTORY)
+        self.history_ms = history_ms or settings.SENSOR_CONFLATION_HISTORY_MS
+        self.emit_parts = SENSOR_LATEST
+        if self.history is HistoryPolicy.LATEST:
+            self.emit_parts |= SENSOR_HISTORY
+        self._emitted: Dict[Key, float] = {}
+        self._pending: Dict[Key, Reading] = {}
+        # Sample time of the last reading kept in history (downsample)
+        self._history_ts: Dict[Key, int] = {}
+        self._conflated: Dict[str, Any] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.default > 0 or any(self.intervals.values())
+
+    @property
+    def tick(self) -> float:
+        """How often ``due`` should be polled: half the shortest interval"""
+        intervals = [i for i in (self.default, *self.intervals.values()) if i > 0]
+        return max(min(intervals, default=1.0) / 2, 0.005)
+
+    def interval(self, sensor_type: str) -> float:
+        return self.intervals.get(sensor_type, self.default)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, data: Dict[str, Any], raw: bytes, now: float) -> int:
+        """Parts of the reading to write now; it may be held for ``due``"""
+        sensor_type = data["sensor_type"]
+        interval = self.interval(sensor_type)
+        if interval <= 0:
+            return SENSOR_ALL
+        key = (data["device_id"], sensor_type)
+        parts = SENSOR_SUMMARY
+        if self.history is HistoryPolicy.FULL:
+            parts |= SENSOR_HISTORY
+        elif self.history is HistoryPolicy.DOWNSAMPLE:
+            ts = to_epoch_ms(data.get("timestamp"))
+            last = self._history_ts.get(key)
+            if last is None or ts >= last + self.history_ms or ts < last:
+                self._history_ts[key] = ts
+                parts |= SENSOR_HISTORY
+
+        held = key in self._pending
+        if now - self._emitted.get(key, -math.inf) >= interval:
+            self._emitted[key] = now
+            if held:
+                del self._pending[key]
+                self._count_conflated(sensor_type)
+            return parts | self.emit_parts
+        if held:
+            self._count_conflated(sensor_type)
+        self._pending[key] = (data, raw)
+        return parts
+
+    def due(self, now: float) -> List[Reading]:
+        """Held readings whose interval is up (all of them for ``math.inf``)"""
+        emitted = []
+        for key, reading in list(self._pending.items()):
+            if now - self._emitted[key] >= self.interval(key[1]):
+                del self._pending[key]
+                self._emitted[key] = now
+                emitted.append(reading)
+        return emitted
+
+    def restore(self, readings: List[Reading]) -> None:
+        """Hold readings from ``due`` again after writing them failed.
+
+        They are due on the next poll, unless a newer reading of the same
+        sensor is held by then.
+        """
+        for data, raw in readings:
+            key = (data["device_id"], data["sensor_type"])
+            if key not in self._pending:
+                self._pending[key] = (data, raw)
+                self._emitted[key] = -math.inf
+
+    def snapshot(self, readings: List[Dict[str, Any]]) -> Snapshot:
+        """State of the sensors of ``readings``, to roll back to with ``rollback``"""
+        keys = {(data["device_id"], data["sensor_type"]) for data in readings}
+        return {
+            key: (
+                self._emitted.get(key),
+                self._pending.get(key),
+                self._history_ts.get(key),
+            )
+            for key in keys
+        }
+
+    def rollback(self, snapshot: Snapshot) -> None:
+        """Forget the readings ``add``-ed since ``snapshot`` after writing them failed.
+
+        Readings they superseded are held again, and the readings themselves
+        are treated as new when they are delivered again.
+        """
+        for key, values in snapshot.items():
+            for state, value in zip(
+                (self._emitted, self._pending, self._history_ts), values
+            ):
+                if value is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+
+    def _count_conflated(self, sensor_type: str) -> None:
+        counter = self._conflated.get(sensor_type)
+        if counter is None:
+            counter = self._conflated[sensor_type] = SENSOR_READINGS_CONFLATED.labels(
+                sensor_type
+            )
+        counter.inc()
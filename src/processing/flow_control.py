@@ -0,0 +1,117 @@
+# src/processing/flow_control.py
+"""Adaptive prefetch, batch size and degraded mode for one kind of queue.
+
+Every FLOW_CONTROL_INTERVAL_MS the consumer hands each controller the number
+of messages waiting in its queues and how long messages spend between being
+received and acked. The controller answers with a scale for the configured
+prefetch count and batch size and whether the consumer is degraded.
+
+* A backlog above FLOW_CONTROL_BACKLOG doubles the scale (up to
+  FLOW_CONTROL_MAX_SCALE) as long as Redis writes stay under
+  FLOW_CONTROL_SLOW_STORE_MS: bigger pipelines drain faster for the same
+  number of round trips. Below half the backlog it halves again.
+* A backlog of FLOW_CONTROL_DEGRADED_DEPTH or a receive-to-ack latency of
+  FLOW_CONTROL_DEGRADED_LATENCY_MS switches to degraded mode, in which sensor
+  batches only keep the newest reading of each (device, sensor type). It
+  ends once both are below half their threshold. Laps are never dropped.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+from services.metrics import FLOW_BATCH_SIZE, FLOW_DEGRADED, FLOW_PREFETCH
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the latency moving averages
+EWMA_ALPHA = 0.2
+
+
+def ewma(average: float, sample: float) -> float:
+    return sample if not average else average + EWMA_ALPHA * (sample - average)
+
+
+class FlowController:
+    """Flow control of one kind of queue; ``degrade=False`` never degrades"""
+
+    def __init__(
+        self,
+        queue: str,
+        prefetch_count: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        degrade: bool = True,
+    ):
+        self.queue = queue
+        self.degrade = degrade
+        self.base_prefetch = prefetch_count or settings.CONSUMER_PREFETCH_COUNT
+        self.base_batch = batch_size or settings.BATCH_MAX_SIZE
+        self.scale = 1
+        self.degraded = False
+        # Moving average of a batch's Redis write
+        self.store_seconds = 0.0
+        self._prefetch = FLOW_PREFETCH.labels(queue)
+        self._batch_size = FLOW_BATCH_SIZE.labels(queue)
+        self._degraded = FLOW_DEGRADED.labels(queue)
+        self._publish()
+
+    @property
+    def prefetch_count(self) -> int:
+        # Above the batch size, or batches could never fill up
+        return max(self.base_prefetch * self.scale, self.batch_size + 1)
+
+    @property
+    def batch_size(self) -> int:
+        return self.base_batch * self.scale
+
+    def observe_store(self, seconds: float) -> None:
+        self.store_seconds = ewma(self.store_seconds, seconds)
+
+    def update(self, depth: int, latency: float) -> bool:
+        """Adjust to ``depth`` queued messages; True if the prefetch changed"""
+        prefetch = self.prefetch_count
+        slow_store = self.store_seconds * 1000 >= settings.FLOW_CONTROL_SLOW_STORE_MS
+        if depth > settings.FLOW_CONTROL_BACKLOG and not slow_store:
+            self.scale = min(self.scale * 2, settings.FLOW_CONTROL_MAX_SCALE)
+        elif depth < settings.FLOW_CONTROL_BACKLOG / 2:
+            self.scale = max(self.scale // 2, 1)
+
+        latency_ms = latency * 1000
+        if (
+            self.degrade
+            and not self.degraded
+            and (
+                depth >= settings.FLOW_CONTROL_DEGRADED_DEPTH
+                or latency_ms >= settings.FLOW_CONTROL_DEGRADED_LATENCY_MS
+            )
+        ):
+            self.degraded = True
+            logger.warning(
+                f"{self.queue} is falling behind ({depth} queued, "
+                f"{latency_ms:.0f}ms to ack); keeping only the latest values"
+            )
+        elif (
+            self.degraded
+            and depth < settings.FLOW_CONTROL_DEGRADED_DEPTH / 2
+            and latency_ms < settings.FLOW_CONTROL_DEGRADED_LATENCY_MS / 2
+        ):
+            self.degraded = False
+            logger.info(f"{self.queue} caught up ({depth} queued); storing everything")
+        self._publish()
+        return self.prefetch_count != prefetch
+
+    def _publish(self) -> None:
+        self._prefetch.set(self.prefetch_count)
+        self._batch_size.set(self.batch_size)
+        self._degraded.set(self.degraded)
+
+
+def latest_per_sensor(
+    data: Sequence[Dict[str, Any]], raw: Sequence[bytes]
+) -> Tuple[List[Dict[str, Any]], List[bytes]]:
+    """The last reading of each (device_id, sensor_type), in delivery order"""
+    last: Dict[Tuple[str, str], int] = {}
+    for i, reading in enumerate(data):
+        last[(reading["device_id"], reading["sensor_type"])] = i
+    kept = sorted(last.values())
+    return [data[i] for i in kept], [raw[i] for i in kept]
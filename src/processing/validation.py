@@ -0,0 +1,100 @@
+# src/processing/validation.py
+"""Schema validation of consumed messages.
+
+Batches are validated against the ``TimingData``/``SensorData`` models with a
+precompiled ``TypeAdapter(List[Model])``, so a whole batch is checked in one
+call into pydantic-core. Only when that fails are the offending entries
+picked out of the errors; the rest of the batch is still stored.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from models.schemas import SensorData, TimingData
+from services.codec import CodecError
+
+# Reason codes of dead-lettered messages
+DECODE_ERROR = "decode_error"
+NOT_AN_OBJECT = "not_an_object"
+MISSING_FIELD = "missing_field"
+INVALID_TIMESTAMP = "invalid_timestamp"
+INVALID_VALUE = "invalid_value"
+
+
+class Rejected(NamedTuple):
+    index: int
+    reason: str
+    detail: str
+
+
+class BatchValidator:
+    """Validate and normalize a batch of decoded payloads against ``model``.
+
+    Valid payloads come back as plain dicts with the model's fields and the
+    timestamp as integer epoch milliseconds (payloads without one are
+    stamped with the time of validation). A ``CodecError`` in place of a
+    payload stands for a message that could not be decoded.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._adapter = TypeAdapter(List[model])
+
+    def validate(
+        self, payloads: Sequence[Any]
+    ) -> Tuple[List[Optional[Dict[str, Any]]], List[Rejected]]:
+        """Return ``(normalized, rejected)``; ``normalized[i]`` is None if rejected"""
+        normalized: List[Optional[Dict[str, Any]]] = [None] * len(payloads)
+        rejected: Dict[int, Rejected] = {}
+        for i, payload in enumerate(payloads):
+            if isinstance(payload, CodecError):
+                rejected[i] = Rejected(i, DECODE_ERROR, str(payload))
+
+        candidates = [i for i in range(len(payloads)) if i not in rejected]
+        while candidates:
+            try:
+                models = self._adapter.validate_python(
+                    [payloads[i] for i in candidates]
+                )
+            except ValidationError as e:
+                for error in e.errors(include_url=False):
+                    i = candidates[error["loc"][0]]
+                    if i not in rejected:
+                        rejected[i] = Rejected(i, _reason(error), _detail(error))
+                # Validate what is left again; errors always point at an entry
+                candidates = [i for i in candidates if i not in rejected]
+                continue
+            for i, model in zip(candidates, models):
+                normalized[i] = _normalize(model)
+            break
+        return normalized, sorted(rejected.values())
+
+
+TIMING_VALIDATOR = BatchValidator(TimingData)
+SENSOR_VALIDATOR = BatchValidator(SensorData)
+
+
+def _normalize(model: BaseModel) -> Dict[str, Any]:
+    data = dict(model.__dict__)
+    timestamp: datetime = data["timestamp"]
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    data["timestamp"] = int(timestamp.timestamp() * 1000)
+    return data
+
+
+def _reason(error: Dict[str, Any]) -> str:
+    if len(error["loc"]) < 2:
+        return NOT_AN_OBJECT
+    if error["type"] == "missing":
+        return MISSING_FIELD
+    if error["loc"][1] == "timestamp":
+        return INVALID_TIMESTAMP
+    return INVALID_VALUE
+
+
+def _detail(error: Dict[str, Any]) -> str:
+    field = ".".join(str(part) for part in error["loc"][1:]) or "message"
+    return f"{field}: {error['msg']}"
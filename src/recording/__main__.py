@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timezone
+
+from recording.replay import Session, replay
+from services.rabbitmq_service import AsyncRabbitMQService
+from services.redis_service import to_epoch_ms
+from services.structured_logging import configure_logging
+
+
+def _speed(value: str) -> float:
+    if value == "max":
+        return 0.0
+    speed = float(value)
+    if speed < 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def _timestamp(value: str) -> int:
+    try:
+        return to_epoch_ms(float(value))
+    except ValueError:
+        return to_epoch_ms(value)
+
+
+def _iso(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).isoformat(
+        timespec="milliseconds"
+    )
+
+
+def info(session: Session) -> int:
+    if not len(session):
+        print("empty recording")
+        return 0
+    first, last = session.first_ts, session.last_ts
+    print(f"files      {len(session.readers)}")
+    print(f"records    {len(session)}")
+    print(f"from       {_iso(first)}")
+    print(f"to         {_iso(last)} ({(last - first) / 1000:.1f}s)")
+    for device_id, laps in sorted(session.laps.items()):
+        print(f"laps       {device_id}: {laps}")
+    return 0
+
+
+async def replay_session(session: Session, args: argparse.Namespace) -> int:
+    if not len(session):
+        print("empty recording", file=sys.stderr)
+        return 1
+    start_ts = None
+    if args.start is not None:
+        start_ts = args.start
+    elif args.offset is not None:
+        start_ts = session.first_ts + int(args.offset * 1000)
+    elif args.lap is not None:
+        start_ts = session.lap_start(args.lap, args.device)
+        if start_ts is None:
+            print(f"lap {args.lap} was not reached", file=sys.stderr)
+            return 1
+
+    rabbitmq = AsyncRabbitMQService()
+    try:
+        report = await replay(
+            session.records(start_ts),
+            rabbitmq.publish_raw_batch,
+            speed=args.speed,
+            batch_size=args.batch_size,
+            retime=args.retime,
+        )
+    finally:
+        await rabbitmq.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(
+            f"published  {report['published']} messages in {report['seconds']}s "
+            f"({report['rate']}/s), {report['failed']} failed"
+        )
+    return 1 if report["failed"] else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.recording",
+        description="Inspect recorded sessions and replay them into the exchange",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    info_parser = commands.add_parser("info", help="summarize a recording")
+    info_parser.add_argument("path", help="session directory or .ltr file")
+
+    replay_parser = commands.add_parser("replay", help="republish a recording")
+    replay_parser.add_argument("path", help="session directory or .ltr file")
+    replay_parser.add_argument(
+        "--speed",
+        type=_speed,
+        default=1.0,
+        help="multiple of real time, or 'max' to publish as fast as confirmed",
+    )
+    seek = replay_parser.add_mutually_exclusive_group()
+    seek.add_argument(
+        "--from",
+        dest="start",
+        type=_timestamp,
+        help="start at this time (ISO-8601 or epoch s/ms)",
+    )
+    seek.add_argument(
+        "--offset", type=float, help="start this many seconds into the session"
+    )
+    seek.add_argument("--lap", type=int, help="start at the beginning of this lap")
+    replay_parser.add_argument(
+        "--device", help="with --lap, the device whose lap to seek (default: leader)"
+    )
+    replay_parser.add_argument(
+        "--retime",
+        action="store_true",
+        help="shift payload timestamps so the session happens now",
+    )
+    replay_parser.add_argument("--batch-size", type=int, default=500)
+    replay_parser.add_argument("--json", action="store_true", help="print raw report")
+    args = parser.parse_args()
+
+    configure_logging(level="WARNING", json_format=False)
+    session = Session(args.path)
+    try:
+        if args.command == "info":
+            return info(session)
+        return asyncio.run(replay_session(session, args))
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# src/recording/replay.py
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+
+from recording.session import Record, SessionReader, recording_files
+from services.codec import CodecError, decode, encode
+from services.rabbitmq_service import PublishResult, without_failure_headers
+from services.redis_service import to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+PublishRaw = Callable[[List[tuple]], Awaitable[PublishResult]]
+
+
+class Session:
+    """Every recording file of a session, merged in timestamp order"""
+
+    def __init__(self, path: Any):
+        files = recording_files(path)
+        if not files:
+            raise FileNotFoundError(f"No recordings in {path}")
+        self.readers = [SessionReader(file) for file in files]
+
+    def __len__(self) -> int:
+        return sum(len(reader) for reader in self.readers)
+
+    @property
+    def first_ts(self) -> Optional[int]:
+        return min((r.first_ts for r in self.readers if r.index), default=None)
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return max((r.last_ts for r in self.readers if r.index), default=None)
+
+    @property
+    def laps(self) -> Dict[str, int]:
+        laps: Dict[str, int] = {}
+        for reader in self.readers:
+            for device_id, count in reader.laps.items():
+                laps[device_id] = laps.get(device_id, 0) + count
+        return laps
+
+    def lap_start(self, lap: int, device_id: Optional[str] = None) -> Optional[int]:
+        """Start of lap ``lap`` for a device, or for the leader (see ``SessionReader``).
+
+        Laps are counted per recording file, so a device whose shard moved to
+        another worker during the session is counted in each file separately.
+        """
+        starts = [reader.lap_start(lap, device_id) for reader in self.readers]
+        return min((ts for ts in starts if ts is not None), default=None)
+
+    def records(self, start_ts: Optional[int] = None) -> Iterator[Record]:
+        return heapq.merge(
+            *(reader.records(start_ts) for reader in self.readers),
+            key=lambda record: record.ts_ms,
+        )
+
+    def close(self) -> None:
+        for reader in self.readers:
+            reader.close()
+
+
+def retimed(record: Record, offset_ms: int) -> Record:
+    """``record`` with its payload timestamp moved forward by ``offset_ms``"""
+    try:
+        payload = decode(record.body, record.content_type)
+    except CodecError:
+        return record
+    if not isinstance(payload, dict):
+        return record
+    try:
+        payload["timestamp"] = to_epoch_ms(payload.get("timestamp")) + offset_ms
+    except (TypeError, ValueError):
+        return record
+    return record._replace(body=encode(payload, record.content_type))
+
+
+async def replay(
+    records: Iterable[Record],
+    publish: PublishRaw,
+    speed: float = 1.0,
+    batch_size: int = 500,
+    retime: bool = False,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+) -> Dict[str, Any]:
+    """Publish ``records`` again, keeping their original spacing divided by ``speed``.
+
+    ``speed`` 0 publishes as fast as the broker confirms. Records due at the
+    same time are published together in batches of up to ``batch_size``.
+    With ``retime`` payload timestamps are shifted so the session happens
+    now: they follow the replay clock, or keep their original spacing from
+    the start of the replay when publishing as fast as possible.
+    """
+    published = failed = 0
+    pending: List[tuple] = []
+    first_ts: Optional[int] = None
+    started = clock()
+    wall_offset_ms = 0
+
+    async def flush():
+        nonlocal published, failed
+        if pending:
+            result = await publish(list(pending))
+            published += result.confirmed
+            failed += len(result.failed)
+            pending.clear()
+
+    for record in records:
+        if first_ts is None:
+            first_ts = record.ts_ms
+            wall_offset_ms = int(time.time() * 1000) - first_ts
+        if speed > 0:
+            delay = started + (record.ts_ms - first_ts) / 1000 / speed - clock()
+            if delay > 0:
+                await flush()
+                await sleep(delay)
+        if retime:
+            offset = wall_offset_ms
+            if speed > 0:
+                offset += int((record.ts_ms - first_ts) * (1 / speed - 1))
+            record = retimed(record, offset)
+        pending.append(
+            (
+                record.routing_key,
+                record.body,
+                record.content_type,
+                without_failure_headers(record.headers),
+            )
+        )
+        if len(pending) >= batch_size:
+            await flush()
+    await flush()
+
+    elapsed = clock() - started
+    return {
+        "published": published,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "rate": round(published / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,289 @@
+# src/recording/session.py
+"""Append-only recordings of consumed messages.
+
+A session is a directory with one ``.ltr`` file per consumer process, each
+with a ``.idx`` time index next to it.
+
+``.ltr`` starts with ``MAGIC`` followed by chunks. A chunk is a 4-byte
+big-endian length and a msgpack array of records
+``[ts_ms, routing_key, content_type, headers, body]`` in arrival order.
+
+``.idx`` holds one length-prefixed msgpack entry per chunk,
+``[offset, first_ts, last_ts, count, laps]``, where ``laps`` maps each
+device to the number of timing messages recorded up to the end of the
+chunk. An entry is only appended once its chunk has been written, so a torn
+tail after a crash is simply ignored, and a missing index is rebuilt by
+scanning the chunks.
+"""
+
+import bisect
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Union
+
+from config import settings
+from services.codec import MSGPACK, CodecError, decode, encode
+
+MAGIC = b"LTREC1\n"
+RECORDING_SUFFIX = ".ltr"
+INDEX_SUFFIX = ".idx"
+_LENGTH = struct.Struct(">I")
+
+
+class Record(NamedTuple):
+    ts_ms: int
+    routing_key: str
+    content_type: str
+    headers: Dict[str, Any]
+    body: bytes
+
+
+class IndexEntry(NamedTuple):
+    offset: int
+    first_ts: int
+    last_ts: int
+    count: int
+    laps: Dict[str, int]
+
+
+def lap_device(routing_key: str, headers: Dict[str, Any]) -> Optional[str]:
+    """Device that completed a lap, if the record is a timing message"""
+    if not routing_key.startswith("timing."):
+        return None
+    device_id = headers.get(settings.SHARD_HASH_HEADER)
+    if device_id is None:
+        device_id = routing_key.split(".", 2)[1]
+    return device_id.decode() if isinstance(device_id, bytes) else str(device_id)
+
+
+def _write_frame(file: BinaryIO, payload: bytes) -> None:
+    file.write(_LENGTH.pack(len(payload)))
+    file.write(payload)
+
+
+def _read_frames(file: BinaryIO) -> Iterator[tuple]:
+    """``(offset, payload)`` for every complete frame from the current position"""
+    while True:
+        offset = file.tell()
+        prefix = file.read(_LENGTH.size)
+        if len(prefix) < _LENGTH.size:
+            return
+        (length,) = _LENGTH.unpack(prefix)
+        payload = file.read(length)
+        if len(payload) < length:
+            return
+        yield offset, payload
+
+
+class SessionWriter:
+    """Buffer records in memory and append them to ``path`` a chunk at a time.
+
+    A chunk is written once it holds ``chunk_records`` records or spans
+    ``chunk_seconds``, so the per-message cost is a list append. ``append``
+    can only check the span when a record arrives; call ``flush_due``
+    periodically so the last records before a quiet spell are written too.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        chunk_records: Optional[int] = None,
+        chunk_seconds: Optional[float] = None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.chunk_records = chunk_records or settings.RECORDING_CHUNK_RECORDS
+        chunk_seconds = chunk_seconds or settings.RECORDING_CHUNK_SECONDS
+        self.chunk_ms = int(chunk_seconds * 1000)
+        self._data = open(self.path, "xb")
+        self._index = open(self.path.with_suffix(INDEX_SUFFIX), "xb")
+        self._data.write(MAGIC)
+        self._records: List[list] = []
+        self._laps: Dict[str, int] = {}
+        self._last_ts = 0
+        self.records = 0
+
+    def append(
+        self,
+        routing_key: str,
+        content_type: Optional[str],
+        headers: Optional[Dict[str, Any]],
+        body: bytes,
+        ts_ms: Optional[int] = None,
+    ) -> None:
+        # Timestamps never go backwards within a file, so the index stays sorted
+        ts_ms = max(self._last_ts, ts_ms or int(time.time() * 1000))
+        self._last_ts = ts_ms
+        headers = headers or {}
+        self._records.append(
+            [ts_ms, routing_key or "", content_type or "", headers, body]
+        )
+        device_id = lap_device(routing_key or "", headers)
+        if device_id is not None:
+            self._laps[device_id] = self._laps.get(device_id, 0) + 1
+        if (
+            len(self._records) >= self.chunk_records
+            or ts_ms - self._records[0][0] >= self.chunk_ms
+        ):
+            self.flush()
+
+    def flush_due(self, now_ms: Optional[int] = None) -> None:
+        """Write the buffered records if the oldest is ``chunk_seconds`` old"""
+        now_ms = now_ms or int(time.time() * 1000)
+        if self._records and now_ms - self._records[0][0] >= self.chunk_ms:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records as one chunk"""
+        if not self._records:
+            return
+        offset = self._data.tell()
+        _write_frame(self._data, encode(self._records, MSGPACK))
+        self._data.flush()
+        entry = [
+            offset,
+            self._records[0][0],
+            self._records[-1][0],
+            len(self._records),
+            dict(self._laps),
+        ]
+        _write_frame(self._index, encode(entry, MSGPACK))
+        self._index.flush()
+        self.records += len(self._records)
+        self._records = []
+
+    def close(self) -> None:
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+
+class SessionReader:
+    """Random access to one recording file through its time index"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{self.path} is not a session recording")
+        self.index = self._load_index()
+
+    def _load_index(self) -> List[IndexEntry]:
+        size = os.path.getsize(self.path)
+        index_path = self.path.with_suffix(INDEX_SUFFIX)
+        entries: List[IndexEntry] = []
+        if index_path.exists():
+            with open(index_path, "rb") as file:
+                for _, payload in _read_frames(file):
+                    try:
+                        entry = IndexEntry(*decode(payload, MSGPACK))
+                    except (CodecError, TypeError):
+                        break
+                    if entry.offset >= size:
+                        break
+                    entries.append(entry)
+        if entries and self._chunk_end(entries[-1].offset) == size:
+            return entries
+        return self._rebuild_index()
+
+    def _chunk_end(self, offset: int) -> int:
+        self._file.seek(offset)
+        prefix = self._file.read(_LENGTH.size)
+        return offset + _LENGTH.size + _LENGTH.unpack(prefix)[0]
+
+    def _rebuild_index(self) -> List[IndexEntry]:
+        """Scan every complete chunk; used when the index is missing or stale"""
+        entries = []
+        laps: Dict[str, int] = {}
+        self._file.seek(len(MAGIC))
+        for offset, payload in _read_frames(self._file):
+            try:
+                records = decode(payload, MSGPACK)
+            except CodecError:
+                break
+            for ts_ms, routing_key, _, headers, _ in records:
+                device_id = lap_device(routing_key, headers)
+                if device_id is not None:
+                    laps[device_id] = laps.get(device_id, 0) + 1
+            entries.append(
+                IndexEntry(
+                    offset, records[0][0], records[-1][0], len(records), dict(laps)
+                )
+            )
+        return entries
+
+    def __len__(self) -> int:
+        return sum(entry.count for entry in self.index)
+
+    @property
+    def first_ts(self) -> Optional[int]:
+        return self.index[0].first_ts if self.index else None
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return self.index[-1].last_ts if self.index else None
+
+    @property
+    def laps(self) -> Dict[str, int]:
+        """Timing messages recorded per device"""
+        return dict(self.index[-1].laps) if self.index else {}
+
+    def _chunk(self, position: int) -> List[Record]:
+        self._file.seek(self.index[position].offset)
+        _, payload = next(_read_frames(self._file))
+        return [Record(*record) for record in decode(payload, MSGPACK)]
+
+    def records(self, start_ts: Optional[int] = None) -> Iterator[Record]:
+        """Records in arrival order, from the first one at or after ``start_ts``"""
+        position = 0
+        if start_ts is not None:
+            position = bisect.bisect_left(
+                self.index, start_ts, key=lambda entry: entry.last_ts
+            )
+        for position in range(position, len(self.index)):
+            for record in self._chunk(position):
+                if start_ts is None or record.ts_ms >= start_ts:
+                    yield record
+
+    def lap_start(self, lap: int, device_id: Optional[str] = None) -> Optional[int]:
+        """When lap ``lap`` began: the (lap - 1)th timing message of the device.
+
+        Without a device it is the leader's, i.e. the first device to get
+        there. Lap 1 starts with the recording. None if never reached.
+        """
+        if lap <= 1:
+            return self.first_ts
+        target = lap - 1
+
+        def reached(laps: Dict[str, int]) -> int:
+            if device_id is not None:
+                return laps.get(device_id, 0)
+            return max(laps.values(), default=0)
+
+        position = bisect.bisect_left(
+            self.index, target, key=lambda entry: reached(entry.laps)
+        )
+        if position == len(self.index):
+            return None
+        laps = dict(self.index[position - 1].laps) if position else {}
+        for record in self._chunk(position):
+            device = lap_device(record.routing_key, record.headers)
+            if device is None or (device_id is not None and device != device_id):
+                continue
+            laps[device] = laps.get(device, 0) + 1
+            if laps[device] == target:
+                return record.ts_ms
+        return None
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def recording_files(path: Union[str, Path]) -> List[Path]:
+    """The recording files of a session directory, or ``path`` itself"""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.glob(f"*{RECORDING_SUFFIX}"))
+    return [path]
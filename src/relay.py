@@ -0,0 +1,32 @@
+import asyncio
+import signal
+
+from config import settings
+from services.pubsub_relay import PubSubRelay
+from services.structured_logging import configure_logging, shutdown_logging
+
+
+async def serve(path: str):
+    relay = PubSubRelay(path)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, relay.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+    await relay.run()
+
+
+def run_relay(path: str):
+    """Entry point of the relay process"""
+    configure_logging()
+    try:
+        asyncio.run(serve(path))
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    if not settings.PUBSUB_RELAY_SOCKET:
+        raise SystemExit("PUBSUB_RELAY_SOCKET is not set")
+    run_relay(settings.PUBSUB_RELAY_SOCKET)
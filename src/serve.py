@@ -0,0 +1,114 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from multiprocessing.process import BaseProcess
+from typing import Optional
+
+import uvicorn
+
+from config import settings
+from relay import run_relay
+from services.structured_logging import configure_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+
+class RelayProcess:
+    """Keep a pub/sub relay process running next to the API workers.
+
+    A relay that exits is restarted with the same backoff as consumer
+    workers; the API workers reconnect to it on their own.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._context = multiprocessing.get_context("spawn")
+        self._process: Optional[BaseProcess] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._watch, name="relay-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def _watch(self):
+        restarts = 0
+        while not self._stopping.is_set():
+            started_at = time.monotonic()
+            self._process = self._context.Process(
+                target=run_relay, args=(self.path,), name="pubsub-relay"
+            )
+            self._process.start()
+            logger.info(f"Started pub/sub relay (pid {self._process.pid})")
+            self._process.join()
+            if self._stopping.is_set():
+                break
+            # The backoff resets once the relay has stayed up for a minute
+            restarts = restarts + 1 if time.monotonic() - started_at < 60 else 0
+            delay = min(settings.WORKER_RESTART_MAX_SECONDS, 0.5 * 2**restarts)
+            logger.warning(
+                f"Pub/sub relay exited with code {self._process.exitcode}, "
+                f"restarting in {delay:.1f}s"
+            )
+            self._stopping.wait(delay)
+
+    def wait_ready(self, timeout: float = 10.0) -> bool:
+        """Wait for the relay socket so workers do not start with a backoff"""
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(self.path):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self):
+        self._stopping.set()
+        process = self._process
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(settings.WORKER_STOP_TIMEOUT_SECONDS)
+            if process.is_alive():
+                process.kill()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the API with several workers sharing one pub/sub relay"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.API_WORKERS)
+    args = parser.parse_args()
+    configure_logging()
+
+    relay = None
+    if args.workers > 1:
+        path = settings.PUBSUB_RELAY_SOCKET or os.path.join(
+            tempfile.gettempdir(), f"livetiming-relay-{os.getpid()}.sock"
+        )
+        # Read by the workers' settings when they import the app
+        os.environ["PUBSUB_RELAY_SOCKET"] = path
+        relay = RelayProcess(path)
+        relay.start()
+        if not relay.wait_ready():
+            logger.warning(f"Pub/sub relay not listening on {path} yet")
+    try:
+        uvicorn.run(
+            "src.main:app", host=args.host, port=args.port, workers=args.workers
+        )
+    finally:
+        if relay is not None:
+            relay.stop()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# src/services/broadcaster.py
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Union
+
+from fastapi import WebSocket
+
+from services.codec import JSON, Payload
+from services.metrics import (
+    WS_FRAMES_COALESCED,
+    WS_FRAMES_DROPPED,
+    WS_FRAMES_SENT,
+    WS_SEND_LAG_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes, Payload]
+
+
+class OverflowPolicy(str, Enum):
+    """What to do when a client's outbound queue is full"""
+
+    DROP_OLDEST = "drop_oldest"  # discard the oldest queued frame
+    COALESCE = "coalesce"  # keep only the newest frame per key, then drop oldest
+    DISCONNECT = "disconnect"  # close the slow client
+
+
+class ClientSession:
+    """Bounded outbound queue and dedicated writer task for one WebSocket.
+
+    ``enqueue`` never awaits, so a slow client can only ever fill its own
+    queue; the overflow policy decides what gets sacrificed when it does.
+    """
+
+    _unique_keys = itertools.count()
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        client_type: str,
+        max_queue: int,
+        policy: OverflowPolicy,
+        send_timeout: float,
+        on_close: Callable[["ClientSession"], None],
+        content_type: str = JSON,
+    ):
+        self.websocket = websocket
+        self.client_type = client_type
+        self.content_type = content_type
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self._on_close = on_close
+        # key -> (frame, enqueued_at); insertion order is delivery order
+        self._queue: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._writer())
+
+        self.sent = 0
+        self._sent_metric = WS_FRAMES_SENT.labels(client_type)
+        self._lag_metric = WS_SEND_LAG_SECONDS.labels(client_type)
+        self._dropped_metric = WS_FRAMES_DROPPED.labels(client_type)
+        self._coalesced_metric = WS_FRAMES_COALESCED.labels(client_type)
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, frame: Frame, key: Optional[Hashable] = None) -> bool:
+        """Queue a frame for delivery; returns False if it was not accepted"""
+        if self._closing:
+            return False
+        if isinstance(frame, Payload):
+            frame = frame.frame(self.content_type)
+        now = time.monotonic()
+        if self.policy is OverflowPolicy.COALESCE and key is not None:
+            if key in self._queue:
+                # Replace in place: keeps the original slot, delivers the newest value
+                enqueued_at = self._queue[key][1]
+                self._queue[key] = (frame, enqueued_at)
+                self.coalesced += 1
+                self._coalesced_metric.inc()
+                return True
+        else:
+            key = next(self._unique_keys)
+
+        if len(self._queue) >= self.max_queue:
+            if self.policy is OverflowPolicy.DISCONNECT:
+                logger.warning(
+                    f"Disconnecting slow {self.client_type} client: "
+                    f"{len(self._queue)} frames queued"
+                )
+                self._closing = True
+                self._ready.set()
+                return False
+            self._queue.popitem(last=False)
+            self.dropped += 1
+            self._dropped_metric.inc()
+
+        self._queue[key] = (frame, now)
+        self._ready.set()
+        return True
+
+    async def _writer(self):
+        try:
+            while True:
+                await self._ready.wait()
+                if self._closing:
+                    await self.websocket.close(code=1013)  # try again later
+                    break
+                if not self._queue:
+                    self._ready.clear()
+                    continue
+                _, (frame, enqueued_at) = self._queue.popitem(last=False)
+                if isinstance(frame, bytes):
+                    send = self.websocket.send_bytes(frame)
+                else:
+                    send = self.websocket.send_text(frame)
+                await asyncio.wait_for(send, self.send_timeout)
+                self._record_lag(time.monotonic() - enqueued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"{self.client_type} client writer stopped: {e!r}")
+            try:
+                await self.websocket.close(code=1011)
+            except Exception:
+                pass
+        self._closing = True
+        self._on_close(self)
+
+    def _record_lag(self, lag: float):
+        self.sent += 1
+        self._sent_metric.inc()
+        self._lag_metric.observe(lag)
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        # Exponentially weighted so recent behaviour dominates
+        self.avg_lag += (lag - self.avg_lag) * 0.05
+
+    def stats(self) -> Dict[str, Any]:
+        client = getattr(self.websocket, "client", None)
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            "client_type": self.client_type,
+            "content_type": self.content_type,
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "avg_lag_ms": round(self.avg_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+        }
+
+    def cancel(self):
+        """Stop the writer without waiting for it"""
+        self._closing = True
+        self._task.cancel()
+
+    async def close(self):
+        self.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+class Broadcaster:
+    """Fan frames out to many WebSockets without letting one stall the others"""
+
+    def __init__(
+        self,
+        max_queue: int,
+        policy: OverflowPolicy,
+        send_timeout: float,
+        on_client_closed: Optional[Callable[[WebSocket, str], None]] = None,
+    ):
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self._on_client_closed = on_client_closed
+        self.sessions: Dict[WebSocket, ClientSession] = {}
+
+    def register(
+        self, websocket: WebSocket, client_type: str, content_type: str = JSON
+    ) -> ClientSession:
+        session = ClientSession(
+            websocket,
+            client_type,
+            self.max_queue,
+            self.policy,
+            self.send_timeout,
+            self._session_closed,
+            content_type,
+        )
+        self.sessions[websocket] = session
+        return session
+
+    def _session_closed(self, session: ClientSession):
+        if self.sessions.get(session.websocket) is session:
+            del self.sessions[session.websocket]
+            if self._on_client_closed is not None:
+                self._on_client_closed(session.websocket, session.client_type)
+
+    def unregister(self, websocket: WebSocket):
+        session = self.sessions.pop(websocket, None)
+        if session is not None:
+            session.cancel()
+
+    def publish(
+        self,
+        frame: Frame,
+        recipients: Iterable[WebSocket],
+        key: Optional[Hashable] = None,
+    ) -> int:
+        """Queue ``frame`` for every recipient; returns how many accepted it.
+
+        A ``Payload`` is encoded once per wire format in use, not per client.
+        """
+        accepted = 0
+        for websocket in recipients:
+            session = self.sessions.get(websocket)
+            if session is not None and session.enqueue(frame, key):
+                accepted += 1
+        return accepted
+
+    def queued(self, client_type: Optional[str] = None) -> int:
+        """Frames waiting across all sessions, optionally of one client type"""
+        return sum(
+            session.queued
+            for session in self.sessions.values()
+            if client_type is None or session.client_type == client_type
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = list(self.sessions.values())
+        return {
+            "clients": len(sessions),
+            "policy": self.policy.value,
+            "max_queue": self.max_queue,
+            "queued": sum(s.queued for s in sessions),
+            "dropped": sum(s.dropped for s in sessions),
+            "max_lag_ms": round(max((s.max_lag for s in sessions), default=0) * 1000, 3),
+            "sessions": [s.stats() for s in sessions],
+        }
+
+    async def close(self):
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
@@ -0,0 +1,117 @@
+# src/services/codec.py
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+import msgpack
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Wire formats a WebSocket client can ask for, mapped to content types
+WIRE_FORMATS = {"json": JSON, "msgpack": MSGPACK}
+
+_CONTENT_TYPE_ALIASES = {
+    "application/json": JSON,
+    "text/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+class CodecError(ValueError):
+    """Raised when a body cannot be decoded with its content type"""
+
+
+def normalize_content_type(content_type: Optional[str]) -> str:
+    """Map a content type (with optional parameters) to JSON or MSGPACK.
+
+    Missing content types default to JSON, which is what producers have
+    always sent.
+    """
+    if not content_type:
+        return JSON
+    base = content_type.split(";", 1)[0].strip().lower()
+    try:
+        return _CONTENT_TYPE_ALIASES[base]
+    except KeyError:
+        raise CodecError(f"Unsupported content type: {content_type}")
+
+
+def sniff_content_type(body: Union[bytes, str]) -> str:
+    """Guess the encoding of a pub/sub payload, which carries no headers.
+
+    Messages are always maps: a JSON object starts with ``{`` (after optional
+    whitespace), while a msgpack map starts with 0x80-0x8f, 0xde or 0xdf.
+    """
+    if isinstance(body, str) or not body:
+        return JSON
+    first = body[0]
+    if 0x80 <= first <= 0x8F or first in (0xDE, 0xDF):
+        return MSGPACK
+    return JSON
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def decode(body: Union[bytes, str], content_type: Optional[str] = None) -> Any:
+    """Decode a body; ``content_type`` of None means sniff it"""
+    content_type = (
+        sniff_content_type(body)
+        if content_type is None
+        else normalize_content_type(content_type)
+    )
+    try:
+        if content_type == MSGPACK:
+            return msgpack.unpackb(body, raw=False)
+        return json.loads(body)
+    except (ValueError, msgpack.UnpackException) as e:
+        raise CodecError(f"Error decoding {content_type} body: {e}") from e
+
+
+def encode(obj: Any, content_type: str = JSON) -> bytes:
+    if normalize_content_type(content_type) == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True, default=_default)
+    return json.dumps(obj, default=_default).encode()
+
+
+class Payload:
+    """One message, encoded lazily and at most once per wire format.
+
+    Built either from an already-encoded body (e.g. a pub/sub message, which
+    is passed through untouched to clients using the same format) or from a
+    Python object. Text frames are used for JSON and binary frames for msgpack.
+    """
+
+    __slots__ = ("_obj", "_frames")
+
+    def __init__(self, obj: Any = None, raw: Optional[Union[bytes, str]] = None):
+        self._obj = obj
+        self._frames: Dict[str, Union[str, bytes]] = {}
+        if raw is not None:
+            if sniff_content_type(raw) == MSGPACK:
+                self._frames[MSGPACK] = raw
+            else:
+                self._frames[JSON] = raw.decode() if isinstance(raw, bytes) else raw
+
+    @property
+    def obj(self) -> Any:
+        if self._obj is None:
+            content_type, frame = next(iter(self._frames.items()))
+            self._obj = decode(frame, content_type)
+        return self._obj
+
+    def frame(self, content_type: str = JSON) -> Union[str, bytes]:
+        frame = self._frames.get(content_type)
+        if frame is None:
+            if content_type == MSGPACK:
+                frame = encode(self.obj, MSGPACK)
+            else:
+                frame = json.dumps(self.obj, default=_default)
+            self._frames[content_type] = frame
+        return frame
@@ -0,0 +1,360 @@
+# src/services/cold_storage.py
+"""Sensor history older than COLD_STORAGE_AGE_SECONDS, on local disk.
+
+Every (device, sensor type) series gets a directory of segment files under
+``COLD_STORAGE_DIR/sensor/{device}/{type}/``, named after their first sample
+time. A segment is a 64-byte header followed by two fixed-width columns: all
+timestamps (int64 epoch ms), then all values (float64). Segments are mapped
+with ``mmap`` and the columns are NumPy views of the mapping, so a range query
+is a binary search and a slice, without reading or parsing the file.
+
+Segments are only ever replaced atomically (``os.replace``), so a reader
+never sees a partial file and keeps its mapping of the previous version.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+import numpy as np
+
+from config import settings
+from services.redis_service import RedisService, sensor_key, stream_id_ms
+
+SEGMENT_SUFFIX = ".seg"
+# magic, count, first_ts, last_ts, last stream ID (ms, seq), padding
+_HEADER = struct.Struct("<8sqqqqq16x")
+_MAGIC = b"LTSEG1\0\0"
+
+StreamId = Tuple[int, int]
+Series = Tuple[np.ndarray, np.ndarray]
+
+
+def parse_stream_id(entry_id: str) -> StreamId:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def format_stream_id(stream_id: StreamId) -> str:
+    return f"{stream_id[0]}-{stream_id[1]}"
+
+
+def _path_part(name: str) -> str:
+    # Device ids and sensor types are arbitrary strings
+    part = quote(name, safe="")
+    return "%2E" + part[1:] if part.startswith(".") else part
+
+
+class Segment(NamedTuple):
+    timestamps: np.ndarray
+    values: np.ndarray
+    # Stream ID of the last sample, where archiving resumes
+    last_id: StreamId
+
+    @property
+    def first_ts(self) -> int:
+        return int(self.timestamps[0])
+
+    @property
+    def last_ts(self) -> int:
+        return int(self.timestamps[-1])
+
+
+def open_segment(path: Union[str, Path]) -> Segment:
+    """Map a segment read-only; the arrays are views of the mapping"""
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, count, _, _, last_ms, last_seq = _HEADER.unpack_from(mapping)
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a history segment")
+    timestamps = np.frombuffer(mapping, np.int64, count, _HEADER.size)
+    values = np.frombuffer(mapping, np.float64, count, _HEADER.size + 8 * count)
+    return Segment(timestamps, values, (last_ms, last_seq))
+
+
+def write_segment(
+    path: Path, timestamps: np.ndarray, values: np.ndarray, last_id: StreamId
+) -> None:
+    """Write a segment next to ``path`` and move it into place"""
+    header = _HEADER.pack(
+        _MAGIC,
+        len(timestamps),
+        int(timestamps[0]),
+        int(timestamps[-1]),
+        last_id[0],
+        last_id[1],
+    )
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            file.write(np.ascontiguousarray(timestamps, np.int64).tobytes())
+            file.write(np.ascontiguousarray(values, np.float64).tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class ColdStore:
+    """Segment files of every sensor series under ``root``.
+
+    Mapped segments are cached by inode, so a segment replaced by the
+    compactor is mapped again on its next use.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self._segments: Dict[Path, Tuple[int, Segment]] = {}
+
+    def series_dir(self, device_id: str, sensor_type: str) -> Path:
+        return self.root / "sensor" / _path_part(device_id) / _path_part(sensor_type)
+
+    def segments(self, device_id: str, sensor_type: str) -> List[Segment]:
+        """Segments of a series, oldest first"""
+        try:
+            entries = sorted(
+                os.scandir(self.series_dir(device_id, sensor_type)),
+                key=lambda entry: entry.name,
+            )
+        except FileNotFoundError:
+            return []
+        segments = []
+        for entry in entries:
+            if not entry.name.endswith(SEGMENT_SUFFIX):
+                continue
+            path = Path(entry.path)
+            cached = self._segments.get(path)
+            if cached is None or cached[0] != entry.inode():
+                try:
+                    cached = self._segments[path] = (entry.inode(), open_segment(path))
+                except FileNotFoundError:
+                    continue  # replaced while listing; the new file is next
+            segments.append(cached[1])
+        return segments
+
+    def last_id(self, device_id: str, sensor_type: str) -> Optional[StreamId]:
+        segments = self.segments(device_id, sensor_type)
+        return segments[-1].last_id if segments else None
+
+    def read(
+        self,
+        device_id: str,
+        sensor_type: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> Series:
+        """Samples between two times (inclusive), as ``(timestamps, values)``.
+
+        A range within one segment is returned as views of the mapping.
+        """
+        parts = []
+        for segment in self.segments(device_id, sensor_type):
+            if start_ms is not None and segment.last_ts < start_ms:
+                continue
+            if end_ms is not None and segment.first_ts > end_ms:
+                break
+            lo = 0
+            hi = len(segment.timestamps)
+            if start_ms is not None:
+                lo = int(np.searchsorted(segment.timestamps, start_ms, "left"))
+            if end_ms is not None:
+                hi = int(np.searchsorted(segment.timestamps, end_ms, "right"))
+            parts.append((segment.timestamps[lo:hi], segment.values[lo:hi]))
+        if not parts:
+            return np.empty(0, np.int64), np.empty(0, np.float64)
+        if len(parts) == 1:
+            return parts[0]
+        return (
+            np.concatenate([timestamps for timestamps, _ in parts]),
+            np.concatenate([values for _, values in parts]),
+        )
+
+    def append(
+        self,
+        device_id: str,
+        sensor_type: str,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        ids: Sequence[str],
+    ) -> None:
+        """Archive samples newer than everything stored for the series.
+
+        ``ids`` are the stream IDs of the samples. They are merged into the
+        last segment until it holds COLD_SEGMENT_MAX_POINTS samples, so
+        segments do not multiply with every compaction run. Segments are
+        written oldest first, each with the ID of its own last sample, so an
+        interrupted append resumes where it stopped.
+        """
+        directory = self.series_dir(device_id, sensor_type)
+        directory.mkdir(parents=True, exist_ok=True)
+        segments = self.segments(device_id, sensor_type)
+        limit = settings.COLD_SEGMENT_MAX_POINTS
+        merged = 0
+        if segments and len(segments[-1].timestamps) < limit:
+            last = segments[-1]
+            merged = len(last.timestamps)
+            timestamps = np.concatenate([last.timestamps, timestamps])
+            values = np.concatenate([last.values, values])
+        for start in range(0, len(timestamps), limit):
+            end = min(start + limit, len(timestamps))
+            write_segment(
+                directory / f"{int(timestamps[start]):013d}{SEGMENT_SUFFIX}",
+                timestamps[start:end],
+                values[start:end],
+                parse_stream_id(ids[end - 1 - merged]),
+            )
+
+
+class Compactor:
+    """Move sensor history older than ``age_seconds`` from Redis to a ``ColdStore``.
+
+    A series is read from Redis up to the cutoff, starting after the last
+    entry already archived, written to disk and only then trimmed in Redis
+    (``XTRIM MINID``) up to the last archived entry. A crash in between
+    leaves entries in both places; the next run skips them and trims.
+    """
+
+    def __init__(
+        self,
+        redis: RedisService,
+        store: ColdStore,
+        age_seconds: Optional[float] = None,
+    ):
+        self.redis = redis
+        self.store = store
+        self.age_ms = int((age_seconds or settings.COLD_STORAGE_AGE_SECONDS) * 1000)
+
+    async def compact(self, now_ms: int) -> int:
+        """One pass over every series; returns the number of samples archived"""
+        cutoff = now_ms - self.age_ms
+        archived = 0
+        for device_id, sensor_type in await self.redis.get_sensor_series():
+            archived += await self.compact_series(device_id, sensor_type, cutoff)
+        return archived
+
+    async def compact_series(
+        self, device_id: str, sensor_type: str, cutoff_ms: int
+    ) -> int:
+        key = sensor_key(device_id, "history", sensor_type)
+        last_id = self.store.last_id(device_id, sensor_type)
+        entries, _ = await self.redis.get_history(
+            key,
+            end_ms=cutoff_ms,
+            cursor=None if last_id is None else format_stream_id(last_id),
+        )
+        if entries:
+            last_id = parse_stream_id(entries[-1][0])
+            self.store.append(
+                device_id,
+                sensor_type,
+                np.fromiter(
+                    (stream_id_ms(entry_id) for entry_id, _ in entries),
+                    dtype=np.int64,
+                    count=len(entries),
+                ),
+                np.fromiter(
+                    (float(fields["value"]) for _, fields in entries),
+                    dtype=np.float64,
+                    count=len(entries),
+                ),
+                [entry_id for entry_id, _ in entries],
+            )
+        if last_id is not None:
+            # MINID keeps entries >= the given ID: everything after the archive
+            await self.redis.trim_history(
+                key, format_stream_id((last_id[0], last_id[1] + 1))
+            )
+        return len(entries)
+
+
+async def read_sensor_history(
+    redis: RedisService,
+    store: Optional[ColdStore],
+    device_id: str,
+    sensor_type: str,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    count: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[np.ndarray, np.ndarray, Optional[str]]:
+    """Sensor history from the cold store followed by the Redis stream.
+
+    Same contract as ``RedisService.get_history`` with the samples as
+    ``(timestamps, values, next_cursor)`` arrays. Cursors are stream IDs;
+    archived samples keep the ID they had in Redis as far as it is implied by
+    their time (the n-th sample of a millisecond is ``{ms}-{n}``).
+    """
+    key = sensor_key(device_id, "history", sensor_type)
+    archived = store.last_id(device_id, sensor_type) if store is not None else None
+    after = parse_stream_id(cursor) if cursor else None
+
+    cold_t = np.empty(0, np.int64)
+    cold_v = np.empty(0, np.float64)
+    if archived is not None and (after is None or after < archived):
+        # Whole milliseconds are read, so ranks within them are known
+        all_t, all_v = store.read(
+            device_id,
+            sensor_type,
+            start_ms if after is None else max(after[0], start_ms or 0),
+            end_ms,
+        )
+        first = 0
+        if after is not None:
+            # Skip the samples of the cursor's millisecond up to its sequence
+            first = min(after[1] + 1, int(np.searchsorted(all_t, after[0], "right")))
+        cold_t, cold_v = all_t[first:], all_v[first:]
+        if count is not None and len(cold_t) >= count:
+            last = first + count - 1
+            next_cursor = None
+            if last + 1 < len(all_t) or await _has_more(
+                redis, key, archived, start_ms, end_ms
+            ):
+                rank = last - int(np.searchsorted(all_t, all_t[last], "left"))
+                next_cursor = format_stream_id((int(all_t[last]), rank))
+            return cold_t[:count], cold_v[:count], next_cursor
+
+    # Redis holds everything after the archive
+    hot_after = max(filter(None, (after, archived)), default=None)
+    hot_cursor = None
+    if hot_after is not None and (start_ms is None or hot_after[0] >= start_ms):
+        hot_cursor = format_stream_id(hot_after)
+    entries, next_cursor = await redis.get_history(
+        key,
+        start_ms,
+        end_ms,
+        count=None if count is None else count - len(cold_t),
+        cursor=hot_cursor,
+    )
+    hot_t = np.fromiter(
+        (stream_id_ms(entry_id) for entry_id, _ in entries),
+        dtype=np.int64,
+        count=len(entries),
+    )
+    hot_v = np.fromiter(
+        (float(fields["value"]) for _, fields in entries),
+        dtype=np.float64,
+        count=len(entries),
+    )
+    if not len(cold_t):
+        return hot_t, hot_v, next_cursor
+    return np.concatenate([cold_t, hot_t]), np.concatenate([cold_v, hot_v]), next_cursor
+
+
+async def _has_more(
+    redis: RedisService,
+    key: str,
+    archived: StreamId,
+    start_ms: Optional[int],
+    end_ms: Optional[int],
+) -> bool:
+    entries, _ = await redis.get_history(
+        key, start_ms, end_ms, count=1, cursor=format_stream_id(archived)
+    )
+    return bool(entries)
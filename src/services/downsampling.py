@@ -0,0 +1,94 @@
+# src/services/downsampling.py
+from typing import Optional, Tuple
+
+import numpy as np
+
+from models.schemas import DownsampleMethod
+
+Series = Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]
+
+
+def downsample(
+    timestamps: np.ndarray, values: np.ndarray, points: int, method: DownsampleMethod
+) -> Series:
+    """Reduce a series to at most ``points`` points.
+
+    Returns ``(timestamps, values, mins, maxs)``. ``mins``/``maxs`` give the
+    envelope of each bucket for the aggregating methods and are None for LTTB,
+    which returns a subset of the original samples. Series already within the
+    target are returned unchanged.
+    """
+    n = len(values)
+    if n <= points:
+        return timestamps, values, None, None
+    if method is DownsampleMethod.LTTB:
+        index = lttb_indices(timestamps, values, points)
+        return timestamps[index], values[index], None, None
+    return bucket_aggregate(timestamps, values, points, method)
+
+
+def _bucket_starts(n: int, buckets: int) -> np.ndarray:
+    # Strictly increasing because n > buckets, so every bucket is non-empty
+    return (np.arange(buckets) * n) // buckets
+
+
+def bucket_aggregate(
+    timestamps: np.ndarray, values: np.ndarray, points: int, method: DownsampleMethod
+) -> Series:
+    """Equal-count buckets reduced with ``np.ufunc.reduceat``"""
+    starts = _bucket_starts(len(values), points)
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+    counts = np.diff(np.append(starts, len(values)))
+
+    if method is DownsampleMethod.AVG:
+        out_values = np.add.reduceat(values, starts) / counts
+        out_times = (np.add.reduceat(timestamps, starts) // counts).astype(np.int64)
+    else:
+        # Report the extreme sample at the time it actually happened
+        offsets = np.empty(len(starts), dtype=np.int64)
+        pick = np.argmin if method is DownsampleMethod.MIN else np.argmax
+        for i, (start, count) in enumerate(zip(starts, counts)):
+            offsets[i] = start + pick(values[start : start + count])
+        out_values = values[offsets]
+        out_times = timestamps[offsets]
+    return out_times, out_values, mins, maxs
+
+
+def lttb_indices(timestamps: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the samples to keep.
+
+    Keeps the first and last sample and, for every bucket in between, the
+    sample forming the largest triangle with the previously kept sample and
+    the average of the next bucket. Preserves the visual shape of the series
+    far better than plain averaging.
+    """
+    n = len(values)
+    if points >= n or points < 3:
+        return np.arange(n) if points >= n else np.array([0, n - 1])
+
+    x = timestamps.astype(np.float64)
+    y = values.astype(np.float64)
+    # n - 2 inner samples split into points - 2 buckets
+    edges = 1 + (np.arange(points - 1) * (n - 2)) // (points - 2)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        ax, ay = x[previous], y[previous]
+        area = np.abs(
+            (ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay)
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
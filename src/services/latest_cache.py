@@ -0,0 +1,272 @@
+# src/services/latest_cache.py
+"""In-process cache of latest values for the REST API.
+
+The API process already receives every update on the ``timing_updates`` and
+``sensor_updates`` channels for its WebSocket clients. Entries loaded from
+Redis on a miss are kept current by those same messages, so repeated polls
+are answered from memory. Entries are least-recently-read evicted beyond
+``max_entries``.
+
+Cached values are only trusted while the pub/sub connection is up: the cache
+is emptied whenever it connects or drops (messages published in between are
+lost), and every lookup goes to Redis until it is subscribed again.
+
+Sensor updates are stored as the raw pub/sub payload and only decoded when
+read, so keeping the cache current costs a dict lookup per message.
+"""
+
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+from config import settings
+from services.codec import CodecError, decode
+from services.metrics import LATEST_CACHE_REQUESTS
+from services.redis_service import to_epoch_ms
+from services.timing_board import TIMING_FIELDS, lap_changes
+
+Loader = Callable[[], Awaitable[Any]]
+
+_BOARD_KEY = ("timing_board",)
+
+
+class Cached(NamedTuple):
+    value: Any
+    etag: str
+
+
+def make_etag(value: Any) -> str:
+    """Strong ETag of a JSON-serializable value, the same in every process"""
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.blake2b(body.encode(), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches ``etag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class _Entry:
+    __slots__ = ("value", "etags")
+
+    def __init__(self, value: Any):
+        self.value = value
+        # None: ETag of the whole value; sensor type: of one reading
+        self.etags: Dict[Any, str] = {}
+
+
+class _Flight:
+    """A Redis load in progress, shared by every request for the same key"""
+
+    __slots__ = ("task", "epoch", "stale", "updates")
+
+    def __init__(self, epoch: int):
+        self.task: Optional[asyncio.Future] = None
+        self.epoch = epoch
+        # A timing update arrived meanwhile, the loaded row may be behind it
+        self.stale = False
+        # Sensor updates that arrived meanwhile win over the loaded readings
+        self.updates: Dict[str, bytes] = {}
+
+
+class LatestValueCache:
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.LATEST_CACHE_SIZE
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._live = False
+        self._epoch = 0
+        self._hits = {
+            kind: LATEST_CACHE_REQUESTS.labels(kind, "hit")
+            for kind in ("sensor", "timing", "timing_board")
+        }
+        self._misses = {
+            kind: LATEST_CACHE_REQUESTS.labels(kind, "miss")
+            for kind in ("sensor", "timing", "timing_board")
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def live(self) -> bool:
+        return self._live
+
+    def set_live(self, live: bool) -> None:
+        """Pub/sub state handler: drop everything on connect and disconnect"""
+        self._live = live
+        self._epoch += 1
+        self._entries.clear()
+
+    async def sensor_readings(self, device_id: str, load: Loader) -> Optional[Cached]:
+        """Latest reading of every sensor type of a device, sorted by type.
+
+        ``load`` returns the readings from Redis (``get_sensor_latest``).
+        None if the device never reported.
+        """
+        entry = await self._sensor_device(device_id, load)
+        if entry is None:
+            return None
+        value = [entry.value[sensor_type] for sensor_type in sorted(entry.value)]
+        return Cached(value, self._etag(entry, None, value))
+
+    async def sensor_reading(
+        self, device_id: str, sensor_type: str, load: Loader
+    ) -> Optional[Cached]:
+        """Latest reading of one sensor type; ``load`` is the device loader"""
+        entry = await self._sensor_device(device_id, load)
+        if entry is None or sensor_type not in entry.value:
+            return None
+        reading = entry.value[sensor_type]
+        return Cached(reading, self._etag(entry, sensor_type, reading))
+
+    async def _sensor_device(self, device_id: str, load: Loader) -> Optional[_Entry]:
+        """The device's entry with every pending pub/sub payload decoded"""
+        key = ("sensor", device_id)
+        entry = await self._get(key, load, self._sensor_entry)
+        if entry is None:
+            return None
+        try:
+            for sensor_type, reading in entry.value.items():
+                if isinstance(reading, bytes):
+                    entry.value[sensor_type] = _sensor_reading(
+                        device_id, sensor_type, reading
+                    )
+        except (CodecError, KeyError, TypeError, ValueError):
+            # Not a payload the consumer published; Redis has the reading
+            self._entries.pop(key, None)
+            return await self._get(key, load, self._sensor_entry_from_redis)
+        return entry
+
+    async def timing_row(self, device_id: str, load: Loader) -> Optional[Cached]:
+        """Latest lap and summary of a device (``get_timing_latest``)"""
+        entry = await self._get(("timing", device_id), load, self._value_entry)
+        if entry is None:
+            return None
+        return Cached(entry.value, self._etag(entry, None, entry.value))
+
+    async def timing_board(self, load: Loader) -> Cached:
+        """Every device's timing row (``get_timing_board``)"""
+        entry = await self._get(_BOARD_KEY, load, lambda board, _: _Entry(board))
+        return Cached(entry.value, self._etag(entry, None, entry.value))
+
+    def on_sensor_update(self, device_id: str, sensor_type: str, raw: bytes) -> None:
+        """Pub/sub feed for ``sensor_updates:{device_id}:{sensor_type}``"""
+        key = ("sensor", device_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.value[sensor_type] = raw
+            entry.etags.clear()
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.updates[sensor_type] = raw
+
+    def on_timing_update(self, update: Dict[str, Any]) -> None:
+        """Pub/sub feed for ``timing_updates:{device_id}`` (decoded)"""
+        device_id = str(update["device_id"])
+        entry = self._entries.get(("timing", device_id))
+        if entry is not None:
+            entry.value.update(lap_changes(entry.value, update))
+            entry.etags.clear()
+        board = self._entries.get(_BOARD_KEY)
+        if board is not None:
+            row = board.value.get(device_id)
+            if row is None:
+                row = board.value[device_id] = dict.fromkeys(TIMING_FIELDS)
+            row.update(lap_changes(row, update))
+            board.etags.clear()
+        for key in (("timing", device_id), _BOARD_KEY):
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.stale = True
+
+    async def _get(
+        self,
+        key: Hashable,
+        load: Loader,
+        build: Callable[[Any, _Flight], Optional[_Entry]],
+    ) -> Optional[_Entry]:
+        kind = key[0]
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._hits[kind].inc()
+            return entry
+        self._misses[kind].inc()
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(self._epoch)
+            flight.task = asyncio.ensure_future(self._fill(key, flight, load, build))
+        # One caller going away must not cancel the load for the others
+        return await asyncio.shield(flight.task)
+
+    async def _fill(
+        self,
+        key: Hashable,
+        flight: _Flight,
+        load: Loader,
+        build: Callable[[Any, _Flight], Optional[_Entry]],
+    ) -> Optional[_Entry]:
+        try:
+            value = await load()
+        finally:
+            del self._flights[key]
+        entry = build(value, flight)
+        if (
+            entry is not None
+            and self._live
+            and flight.epoch == self._epoch
+            and not flight.stale
+        ):
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _sensor_entry(readings: Any, flight: _Flight) -> Optional[_Entry]:
+        if not readings:
+            return None
+        value = {reading["sensor_type"]: reading for reading in readings}
+        value.update(flight.updates)
+        return _Entry(value)
+
+    @staticmethod
+    def _sensor_entry_from_redis(readings: Any, flight: _Flight) -> Optional[_Entry]:
+        return _Entry({r["sensor_type"]: r for r in readings}) if readings else None
+
+    @staticmethod
+    def _value_entry(value: Any, flight: _Flight) -> Optional[_Entry]:
+        return None if value is None else _Entry(value)
+
+    @staticmethod
+    def _etag(entry: _Entry, part: Any, value: Any) -> str:
+        etag = entry.etags.get(part)
+        if etag is None:
+            etag = entry.etags[part] = make_etag(value)
+        return etag
+
+
+def _sensor_reading(device_id: str, sensor_type: str, raw: bytes) -> Dict[str, Any]:
+    """A ``get_sensor_latest`` reading from a ``sensor_updates`` payload"""
+    data = decode(raw)
+    return {
+        "device_id": device_id,
+        "sensor_type": sensor_type,
+        "value": float(data["value"]),
+        "unit": data.get("unit", ""),
+        "last_update": to_epoch_ms(data.get("timestamp")),
+    }
+
+
+# Shared by the WebSocket manager, which feeds it, and the REST routes
+latest_values = LatestValueCache()
@@ -0,0 +1,253 @@
+# src/services/metrics.py
+"""Prometheus metrics for the consumer, Redis, pub/sub and WebSocket fan-out.
+
+Metrics are module-level so any component can record into them; recording is
+a lock-protected counter or bucket update (about a microsecond), cheap enough
+to leave on in production. The API serves them at ``/metrics``. Consumer
+workers run in separate processes and expose theirs on
+``CONSUMER_METRICS_PORT`` (aggregated across workers by the supervisor).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+# Buckets from 50µs to 2.5s; per-message stages sit at the low end, Redis
+# round trips and fan-out lag in the middle.
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Consumer
+MESSAGES_CONSUMED = Counter(
+    "livetiming_messages_consumed_total",
+    "Messages delivered to the consumer",
+    ["queue"],
+)
+MESSAGES_ACKED = Counter(
+    "livetiming_messages_acked_total", "Messages acknowledged after storing", ["queue"]
+)
+MESSAGES_NACKED = Counter(
+    "livetiming_messages_nacked_total",
+    "Messages rejected or returned to the queue",
+    ["queue", "reason"],
+)
+MESSAGES_DEAD_LETTERED = Counter(
+    "livetiming_messages_dead_lettered_total",
+    "Messages moved to the dead-letter queue",
+    ["queue", "reason"],
+)
+MESSAGES_RETRIED = Counter(
+    "livetiming_messages_retried_total",
+    "Messages sent to a delayed retry queue after failing",
+    ["queue"],
+)
+MESSAGES_QUARANTINED = Counter(
+    "livetiming_messages_quarantined_total",
+    "Messages quarantined after using up their retries",
+    ["queue", "reason"],
+)
+CONSUMER_STAGE_SECONDS = Histogram(
+    "livetiming_consumer_stage_seconds",
+    "Time spent per consumer stage (decode per message, validate/store per batch)",
+    ["queue", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+CONSUMER_BATCH_SIZE = Histogram(
+    "livetiming_consumer_batch_size",
+    "Messages written and acked per batch",
+    ["queue"],
+    buckets=SIZE_BUCKETS,
+)
+MESSAGES_SUPERSEDED = Counter(
+    "livetiming_messages_superseded_total",
+    "Readings acked without storing in degraded mode, a newer one being in the batch",
+    ["queue"],
+)
+SENSOR_READINGS_CONFLATED = Counter(
+    "livetiming_sensor_readings_conflated_total",
+    "Readings never published because a newer one of the same sensor replaced them",
+    ["sensor_type"],
+)
+# Flow control, per worker process
+FLOW_PREFETCH = Gauge(
+    "livetiming_flow_prefetch_count",
+    "Current prefetch count per consumed queue",
+    ["queue"],
+    multiprocess_mode="livemax",
+)
+FLOW_BATCH_SIZE = Gauge(
+    "livetiming_flow_batch_size",
+    "Current maximum batch size",
+    ["queue"],
+    multiprocess_mode="livemax",
+)
+FLOW_DEGRADED = Gauge(
+    "livetiming_flow_degraded",
+    "1 while only the latest value per device and sensor type is stored",
+    ["queue"],
+    multiprocess_mode="livemax",
+)
+
+# Redis
+REDIS_COMMAND_SECONDS = Histogram(
+    "livetiming_redis_command_seconds",
+    "Round trip of a Redis command or pipeline, by operation",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_PIPELINE_COMMANDS = Histogram(
+    "livetiming_redis_pipeline_commands",
+    "Commands sent per pipeline, by operation",
+    ["operation"],
+    buckets=SIZE_BUCKETS,
+)
+REDIS_ERRORS = Counter(
+    "livetiming_redis_errors_total", "Failed Redis operations", ["operation"]
+)
+
+# Pub/sub
+PUBSUB_MESSAGES = Counter(
+    "livetiming_pubsub_messages_total", "Pub/sub messages dispatched", ["pattern"]
+)
+PUBSUB_LAG_SECONDS = Histogram(
+    "livetiming_pubsub_lag_seconds",
+    "Sample timestamp to pub/sub delivery (sensor updates are sampled)",
+    ["channel"],
+    buckets=LATENCY_BUCKETS,
+)
+PUBSUB_RECONNECTS = Counter(
+    "livetiming_pubsub_reconnects_total", "Pub/sub reconnects after a failure"
+)
+LATEST_CACHE_REQUESTS = Counter(
+    "livetiming_latest_cache_requests_total",
+    "REST latest-value lookups answered from memory (hit) or Redis (miss)",
+    ["kind", "result"],
+)
+
+# Background tasks
+BACKGROUND_TASK_RESTARTS = Counter(
+    "livetiming_background_task_restarts_total",
+    "Background tasks restarted after a crash",
+    ["task"],
+)
+
+# WebSocket fan-out
+WS_CLIENTS = Gauge(
+    "livetiming_websocket_clients", "Connected WebSocket clients", ["channel"]
+)
+WS_QUEUE_DEPTH = Gauge(
+    "livetiming_websocket_send_queue_depth",
+    "Frames waiting in client send queues",
+    ["channel"],
+)
+WS_FRAMES_SENT = Counter(
+    "livetiming_websocket_frames_sent_total", "Frames written to clients", ["channel"]
+)
+WS_FRAMES_DROPPED = Counter(
+    "livetiming_websocket_frames_dropped_total",
+    "Frames discarded because a client's send queue was full",
+    ["channel"],
+)
+WS_FRAMES_COALESCED = Counter(
+    "livetiming_websocket_frames_coalesced_total",
+    "Queued frames replaced by a newer value for the same key",
+    ["channel"],
+)
+WS_SEND_LAG_SECONDS = Histogram(
+    "livetiming_websocket_send_lag_seconds",
+    "Time a frame waited in a client queue before it was written",
+    ["channel"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def redis_operation(operation: str, commands: int = 0) -> Iterator[None]:
+    """Time a Redis call; ``commands`` > 0 also records the pipeline size"""
+    if commands:
+        REDIS_PIPELINE_COMMANDS.labels(operation).observe(commands)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REDIS_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        REDIS_COMMAND_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with their content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def serve_worker_metrics(port: int) -> None:
+    """Expose this process' metrics over HTTP (single consumer process)"""
+    start_http_server(port)
+
+
+def serve_multiprocess_metrics(port: int) -> None:
+    """Expose the metrics of every worker sharing ``PROMETHEUS_MULTIPROC_DIR``"""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+
+
+def mark_worker_dead(pid: int) -> None:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+class QueueMetrics:
+    """Pre-bound metric children for one consumed queue.
+
+    Resolving labels once keeps per-message recording to a plain increment.
+    """
+
+    def __init__(self, queue: str):
+        self.queue = queue
+        self.consumed = MESSAGES_CONSUMED.labels(queue)
+        self.acked = MESSAGES_ACKED.labels(queue)
+        self.retried = MESSAGES_RETRIED.labels(queue)
+        self.superseded = MESSAGES_SUPERSEDED.labels(queue)
+        self.decode_seconds = CONSUMER_STAGE_SECONDS.labels(queue, "decode")
+        self.validate_seconds = CONSUMER_STAGE_SECONDS.labels(queue, "validate")
+        self.store_seconds = CONSUMER_STAGE_SECONDS.labels(queue, "store")
+        self.batch_size = CONSUMER_BATCH_SIZE.labels(queue)
+
+    def nacked(self, reason: str, count: int = 1) -> None:
+        MESSAGES_NACKED.labels(self.queue, reason).inc(count)
+
+    def dead_lettered(self, reason: str) -> None:
+        MESSAGES_DEAD_LETTERED.labels(self.queue, reason).inc()
+
+    def quarantined(self, reason: str) -> None:
+        MESSAGES_QUARANTINED.labels(self.queue, reason).inc()
@@ -0,0 +1,179 @@
+# src/services/pubsub_reader.py
+import asyncio
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from config import settings
+from services.metrics import PUBSUB_MESSAGES, PUBSUB_RECONNECTS
+from services.redis_service import RedisService
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str, Any], Union[None, Awaitable[None]]]
+StateHandler = Callable[[bool], None]
+
+
+class Subscriber:
+    """Dispatch pub/sub messages to handlers registered by channel or pattern"""
+
+    def __init__(self):
+        # name -> (handler, message counter)
+        self._channels: Dict[str, Tuple[Handler, Any]] = {}
+        self._patterns: Dict[str, Tuple[Handler, Any]] = {}
+        self._state_handlers: List[StateHandler] = []
+        self._running = False
+        self._connected = False
+        self.reconnects = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    def add_channel(self, channel: str, handler: Handler) -> None:
+        """Call ``handler(channel, data)`` for each message on ``channel``"""
+        self._channels[channel] = (handler, PUBSUB_MESSAGES.labels(channel))
+
+    def add_pattern(self, pattern: str, handler: Handler) -> None:
+        """Call ``handler(channel, data)`` for each message matching ``pattern``"""
+        self._patterns[pattern] = (handler, PUBSUB_MESSAGES.labels(pattern))
+
+    def add_state_handler(self, handler: StateHandler) -> None:
+        """Call ``handler(True)`` once subscribed and ``handler(False)`` when the
+        subscription is lost; anything published in between is missed"""
+        self._state_handlers.append(handler)
+
+    def _set_connected(self, connected: bool) -> None:
+        if connected == self._connected:
+            return
+        self._connected = connected
+        for handler in self._state_handlers:
+            try:
+                handler(connected)
+            except Exception as e:
+                logger.error(f"Error in pub/sub state handler: {e}")
+
+    async def _deliver(
+        self, entry: Optional[Tuple[Handler, Any]], channel: str, data: Any
+    ) -> None:
+        if entry is None:
+            return
+        handler, counter = entry
+        counter.inc()
+        try:
+            result = handler(channel, data)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.error(f"Error handling message from {channel}: {e}")
+
+    def stop(self) -> None:
+        self._running = False
+
+
+class RedisSubscriber(Subscriber):
+    """Single pub/sub connection multiplexing every channel the process needs.
+
+    Reads block on the socket (``get_message(timeout=...)``), so an idle track
+    costs no CPU while a published message wakes the reader immediately. The
+    timeout only bounds how long shutdown takes to be noticed. On connection
+    loss the reader resubscribes everything with exponential backoff.
+    """
+
+    def __init__(self, redis_service: RedisService, read_timeout: float = 1.0):
+        super().__init__()
+        self.redis = redis_service
+        self.read_timeout = read_timeout
+        self._pubsub = None
+        # What the current connection is subscribed to
+        self._subscribed: Set[str] = set()
+        self._psubscribed: Set[str] = set()
+
+    async def sync(self) -> None:
+        """Subscribe the live connection to channels and patterns added since
+        it subscribed; without one they are subscribed on (re)connect"""
+        if not self._connected or self._pubsub is None:
+            return
+        channels = [c for c in self._channels if c not in self._subscribed]
+        patterns = [p for p in self._patterns if p not in self._psubscribed]
+        try:
+            if channels:
+                await self._pubsub.subscribe(*channels)
+                self._subscribed.update(channels)
+            if patterns:
+                await self._pubsub.psubscribe(*patterns)
+                self._psubscribed.update(patterns)
+        except Exception as e:
+            # The reader notices the broken connection and resubscribes all
+            logger.warning(f"Could not subscribe to {channels + patterns}: {e}")
+
+    async def run(self) -> None:
+        """Read and dispatch messages until ``stop`` is called"""
+        self._running = True
+        backoff = settings.PUBSUB_RECONNECT_MIN_SECONDS
+        while self._running:
+            try:
+                self._pubsub = await self.redis.get_pubsub()
+                self._subscribed = set(self._channels)
+                self._psubscribed = set(self._patterns)
+                if self._subscribed:
+                    await self._pubsub.subscribe(*self._subscribed)
+                if self._psubscribed:
+                    await self._pubsub.psubscribe(*self._psubscribed)
+                logger.info(
+                    f"Subscribed to Redis channels {list(self._channels)} "
+                    f"and patterns {list(self._patterns)}"
+                )
+                backoff = settings.PUBSUB_RECONNECT_MIN_SECONDS
+                self._set_connected(True)
+                # Anything added while subscribing
+                await self.sync()
+
+                while self._running:
+                    message = await self._pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=self.read_timeout
+                    )
+                    if message is not None:
+                        await self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._running:
+                    break
+                self.reconnects += 1
+                PUBSUB_RECONNECTS.inc()
+                logger.error(
+                    f"Redis subscription failed ({e}); reconnecting in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, settings.PUBSUB_RECONNECT_MAX_SECONDS)
+            finally:
+                self._set_connected(False)
+                await self._close_pubsub()
+
+    async def _dispatch(self, message: Dict[str, Any]) -> None:
+        channel = _as_str(message["channel"])
+        if message["type"] == "pmessage":
+            entry = self._patterns.get(_as_str(message["pattern"]))
+        elif message["type"] == "message":
+            entry = self._channels.get(channel)
+        else:
+            return
+        await self._deliver(entry, channel, message["data"])
+
+    async def _close_pubsub(self) -> None:
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is None:
+            return
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
+
+
+def _as_str(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
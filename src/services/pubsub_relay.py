@@ -0,0 +1,280 @@
+# src/services/pubsub_relay.py
+"""Per-host pub/sub relay for API processes running several workers.
+
+Each API worker would otherwise hold its own Redis subscription and receive
+every update separately. Instead, ``PubSubRelay`` subscribes once per host and
+hands each message to the workers over a Unix socket (PUBSUB_RELAY_SOCKET).
+The message is encoded into a frame once and the same bytes are written to
+every worker. Workers use ``RelaySubscriber`` in place of ``RedisSubscriber``.
+Their handlers are called with the same ``(channel, data)`` as before.
+
+A worker opens with a HELLO frame listing its channels and patterns. The relay
+subscribes to whatever it is not subscribed to yet. It sends STATE frames when
+its own Redis subscription comes up or drops, so worker state handlers fire as
+they would with a direct subscription.
+
+Relay writes never wait on a worker. A worker that falls more than
+PUBSUB_RELAY_MAX_BUFFER_BYTES behind is disconnected. It then reconnects as it
+would after losing Redis.
+
+A frame is a ``>BHHI`` header (kind, name, channel and data lengths) followed
+by the name (the matched pattern), the channel and the data.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from functools import partial
+from typing import Optional, Set, Tuple
+
+from config import settings
+from services.metrics import PUBSUB_RECONNECTS
+from services.pubsub_reader import RedisSubscriber, Subscriber
+from services.redis_service import RedisService
+
+logger = logging.getLogger(__name__)
+
+# Frame kinds
+HELLO = 0
+STATE = 1
+MESSAGE = 2
+PMESSAGE = 3
+
+_HEADER = struct.Struct(">BHHI")
+
+
+def encode_frame(
+    kind: int, name: str = "", channel: str = "", data: bytes = b""
+) -> bytes:
+    name_bytes, channel_bytes = name.encode(), channel.encode()
+    if isinstance(data, str):
+        data = data.encode()
+    header = _HEADER.pack(kind, len(name_bytes), len(channel_bytes), len(data))
+    return b"".join((header, name_bytes, channel_bytes, data))
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, str, str, bytes]:
+    """Next ``(kind, name, channel, data)``; IncompleteReadError at EOF"""
+    kind, name_len, channel_len, data_len = _HEADER.unpack(
+        await reader.readexactly(_HEADER.size)
+    )
+    body = await reader.readexactly(name_len + channel_len + data_len)
+    channel_end = name_len + channel_len
+    return (
+        kind,
+        body[:name_len].decode(),
+        body[name_len:channel_end].decode(),
+        body[channel_end:],
+    )
+
+
+_UP = encode_frame(STATE, data=b"\x01")
+_DOWN = encode_frame(STATE, data=b"\x00")
+
+
+class _Worker:
+    __slots__ = ("writer", "channels", "patterns")
+
+    def __init__(
+        self, writer: asyncio.StreamWriter, channels: Set[str], patterns: Set[str]
+    ):
+        self.writer = writer
+        self.channels = channels
+        self.patterns = patterns
+
+
+class PubSubRelay:
+    """Share one Redis subscription with every API worker on the host"""
+
+    def __init__(
+        self,
+        path: str,
+        redis: Optional[RedisService] = None,
+        max_buffer: Optional[int] = None,
+    ):
+        self.path = path
+        self.redis = redis or RedisService()
+        self.max_buffer = max_buffer or settings.PUBSUB_RELAY_MAX_BUFFER_BYTES
+        self.subscriber = RedisSubscriber(self.redis)
+        self.subscriber.add_state_handler(self._on_state)
+        self._channels: Set[str] = set()
+        self._patterns: Set[str] = set()
+        self._workers: Set[_Worker] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Started by the first worker: there is nothing to subscribe to before
+        self._reader: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    async def start(self) -> None:
+        """Listen on the socket; a leftover socket file is replaced"""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        logger.info(f"Pub/sub relay listening on {self.path}")
+
+    async def run(self) -> None:
+        """Relay messages until ``stop`` is called"""
+        self._stop_event = asyncio.Event()
+        await self.start()
+        try:
+            await self._stop_event.wait()
+        finally:
+            self.subscriber.stop()
+            if self._reader is not None:
+                await self._reader
+            await self.close()
+
+    def stop(self) -> None:
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def close(self) -> None:
+        for worker in list(self._workers):
+            worker.writer.close()
+        self._workers.clear()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        await self.redis.close()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        worker = None
+        try:
+            kind, _, _, data = await read_frame(reader)
+            if kind != HELLO:
+                return
+            hello = json.loads(data)
+            worker = _Worker(writer, set(hello["channels"]), set(hello["patterns"]))
+            for channel in worker.channels - self._channels:
+                self.subscriber.add_channel(channel, self._relay_message)
+                self._channels.add(channel)
+            for pattern in worker.patterns - self._patterns:
+                self.subscriber.add_pattern(
+                    pattern, partial(self._relay_pmessage, pattern)
+                )
+                self._patterns.add(pattern)
+            if self._reader is None:
+                self._reader = asyncio.ensure_future(self.subscriber.run())
+            else:
+                await self.subscriber.sync()
+            self._workers.add(worker)
+            logger.info(f"API worker connected ({len(self._workers)} in total)")
+            if self.subscriber.connected:
+                self._send(worker, _UP)
+            # Workers send nothing after the hello; wait for them to go away
+            while await reader.read(4096):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.debug(f"API worker connection lost: {e!r}")
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Invalid hello from API worker: {e}")
+        finally:
+            if worker in self._workers:
+                self._workers.discard(worker)
+                logger.info(f"API worker disconnected ({len(self._workers)} left)")
+            writer.close()
+
+    def _on_state(self, connected: bool) -> None:
+        frame = _UP if connected else _DOWN
+        for worker in list(self._workers):
+            self._send(worker, frame)
+
+    def _relay_message(self, channel: str, data: bytes) -> None:
+        frame = None
+        for worker in list(self._workers):
+            if channel in worker.channels:
+                frame = frame or encode_frame(MESSAGE, "", channel, data)
+                self._send(worker, frame)
+
+    def _relay_pmessage(self, pattern: str, channel: str, data: bytes) -> None:
+        frame = None
+        for worker in list(self._workers):
+            if pattern in worker.patterns:
+                frame = frame or encode_frame(PMESSAGE, pattern, channel, data)
+                self._send(worker, frame)
+
+    def _send(self, worker: _Worker, frame: bytes) -> None:
+        transport = worker.writer.transport
+        if transport.is_closing():
+            return
+        worker.writer.write(frame)
+        if transport.get_write_buffer_size() > self.max_buffer:
+            logger.warning("API worker fell behind the pub/sub relay, disconnecting it")
+            self._workers.discard(worker)
+            transport.abort()
+
+
+class RelaySubscriber(Subscriber):
+    """``RedisSubscriber`` stand-in reading from the host's ``PubSubRelay``.
+
+    Channels and patterns have to be added before ``run``; they are sent to
+    the relay on every (re)connect.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def run(self) -> None:
+        """Read and dispatch relayed messages until ``stop`` is called"""
+        self._running = True
+        backoff = settings.PUBSUB_RECONNECT_MIN_SECONDS
+        while self._running:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                hello = {
+                    "channels": list(self._channels),
+                    "patterns": list(self._patterns),
+                }
+                self._writer.write(encode_frame(HELLO, data=json.dumps(hello).encode()))
+                await self._writer.drain()
+                logger.info(f"Connected to pub/sub relay at {self.path}")
+                backoff = settings.PUBSUB_RECONNECT_MIN_SECONDS
+
+                while self._running:
+                    kind, name, channel, data = await read_frame(reader)
+                    if kind == PMESSAGE:
+                        await self._deliver(self._patterns.get(name), channel, data)
+                    elif kind == MESSAGE:
+                        await self._deliver(self._channels.get(channel), channel, data)
+                    elif kind == STATE:
+                        self._set_connected(data == b"\x01")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._running:
+                    break
+                self.reconnects += 1
+                PUBSUB_RECONNECTS.inc()
+                logger.error(
+                    f"Pub/sub relay connection failed ({e!r}); "
+                    f"reconnecting in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, settings.PUBSUB_RECONNECT_MAX_SECONDS)
+            finally:
+                self._set_connected(False)
+                self._close()
+
+    def stop(self) -> None:
+        super().stop()
+        # Wakes the reader blocked on the socket
+        self._close()
+
+    def _close(self) -> None:
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
@@ -1,12 +1,207 @@
 import pika
-import json
+import aio_pika
+import asyncio
 import logging
-from typing import Callable, Any, Dict
+import threading
+import time
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractExchange,
+    AbstractIncomingMessage,
+    AbstractQueue,
+    AbstractRobustConnection,
+)
+from aio_pika.pool import Pool
+from typing import (
+    Awaitable,
+    Callable,
+    Any,
+    Coroutine,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 from config import settings
 from contextlib import contextmanager
+from services.codec import JSON, encode, normalize_content_type
 
 logger = logging.getLogger(__name__)
 
+QUARANTINE_EXCHANGE = "livetiming.quarantine"
+# Failed processing attempts so far, carried through retries
+ATTEMPTS_HEADER = "x-attempts"
+
+QUEUE_ARGUMENTS = {
+    "x-message-ttl": 86400000,  # 24 hours
+    "x-max-length": 10000,
+    "x-overflow": "reject-publish",
+}
+# Expired messages and rejections without requeue end up in quarantine. The
+# dead-letter exchange is set by a broker policy (rabbitmq/entrypoint.sh), not
+# a queue argument: RabbitMQ refuses to redeclare an existing queue with
+# different arguments.
+
+QUEUE_BINDINGS = {
+    settings.TIMING_QUEUE: "timing.#",
+    settings.SENSOR_QUEUE: "sensor.#",
+}
+
+# Only one consumer per shard queue is active at a time; others wait as hot
+# standbys and take over (in order) when the active one goes away.
+SHARD_QUEUE_ARGUMENTS = {**QUEUE_ARGUMENTS, "x-single-active-consumer": True}
+HASH_EXCHANGE_ARGUMENTS = {"hash-header": settings.SHARD_HASH_HEADER}
+
+# Kept for a week for inspection; the oldest are dropped rather than ever
+# refusing a dead letter.
+DEAD_LETTER_QUEUE_ARGUMENTS = {
+    "x-message-ttl": 7 * 86400000,
+    "x-max-length": 100000,
+}
+# Kept until replayed or purged through the admin API
+QUARANTINE_QUEUE_ARGUMENTS = {"x-max-length": 100000}
+
+# Set when a message is dead-lettered, retried or quarantined; dropped on replay
+_FAILURE_HEADERS = (
+    "x-reject-reason",
+    "x-reject-detail",
+    "x-original-queue",
+    "x-original-routing-key",
+    ATTEMPTS_HEADER,
+    "x-death",
+    "x-first-death-exchange",
+    "x-first-death-queue",
+    "x-first-death-reason",
+    "x-last-death-exchange",
+    "x-last-death-queue",
+    "x-last-death-reason",
+)
+
+
+def hash_exchange(queue: str) -> str:
+    """Consistent-hash exchange that spreads ``queue``'s traffic over its shards"""
+    return f"livetiming.{queue}"
+
+
+def shard_queue(queue: str, shard: int) -> str:
+    return f"{queue}.shard.{shard}"
+
+
+def retry_exchange(delay_ms: int) -> str:
+    return f"livetiming.retry.{delay_ms}"
+
+
+def retry_queue(delay_ms: int) -> str:
+    return f"retry.{delay_ms}"
+
+
+def retry_queue_arguments(delay_ms: int) -> Dict[str, Any]:
+    """Hold messages for ``delay_ms``, then route them again by their routing key"""
+    return {"x-message-ttl": delay_ms, "x-dead-letter-exchange": "livetiming"}
+
+
+def consumer_queues(queue: str, shards: Optional[Iterable[int]] = None) -> List[str]:
+    """Queues to consume for one kind of data, all shards unless given"""
+    if not settings.CONSUMER_SHARDS:
+        return [queue]
+    if shards is None:
+        shards = range(settings.CONSUMER_SHARDS)
+    return [shard_queue(queue, shard) for shard in shards]
+
+
+def assign_shards(worker: int, workers: int, shards: Optional[int] = None) -> List[int]:
+    """Shards owned by worker ``worker`` of ``workers`` (round robin)"""
+    if shards is None:
+        shards = settings.CONSUMER_SHARDS
+    return list(range(worker, shards, workers))
+
+
+class PublishResult(NamedTuple):
+    """Outcome of ``publish_batch``: confirmed count and indexes that were not"""
+
+    confirmed: int
+    failed: List[int]
+
+
+def message_headers(message: Dict[str, Any]) -> Dict[str, str]:
+    """AMQP headers the hash exchanges shard on"""
+    if "device_id" not in message:
+        return {}
+    return {settings.SHARD_HASH_HEADER: str(message["device_id"])}
+
+
+def dead_letter_headers(
+    headers: Optional[Dict[str, Any]],
+    reason: str,
+    detail: str,
+    queue: str,
+    routing_key: Optional[str],
+) -> Dict[str, Any]:
+    """Original headers plus why and where a message was dead-lettered"""
+    return {
+        **(headers or {}),
+        "x-reject-reason": reason,
+        "x-reject-detail": detail[:512],
+        "x-original-queue": queue,
+        "x-original-routing-key": routing_key or "",
+    }
+
+
+def retry_destination(
+    headers: Optional[Dict[str, Any]],
+    reason: str,
+    detail: str,
+    queue: str,
+    routing_key: Optional[str],
+) -> Tuple[str, Dict[str, Any]]:
+    """Exchange to republish a failed message to, and its new headers.
+
+    The n-th failure sends the message to the n-th retry tier (the last tier
+    repeats); retry queues hold it for their delay and then dead-letter it
+    back to the topic exchange under its original routing key. Once it has
+    failed RETRY_MAX_ATTEMPTS times it goes to quarantine instead.
+    """
+    attempts = int((headers or {}).get(ATTEMPTS_HEADER, 0)) + 1
+    headers = {
+        **dead_letter_headers(headers, reason, detail, queue, routing_key),
+        ATTEMPTS_HEADER: attempts,
+    }
+    delays = settings.RETRY_DELAYS_MS
+    if attempts >= settings.RETRY_MAX_ATTEMPTS or not delays:
+        return QUARANTINE_EXCHANGE, headers
+    return retry_exchange(delays[min(attempts, len(delays)) - 1]), headers
+
+
+def replay_target(
+    headers: Optional[Dict[str, Any]], routing_key: Optional[str]
+) -> Tuple[str, Dict[str, Any]]:
+    """Original routing key and headers of a dead-lettered or quarantined message"""
+    headers = headers or {}
+    original = headers.get("x-original-routing-key") or routing_key or ""
+    if isinstance(original, bytes):
+        original = original.decode()
+    return original, without_failure_headers(headers)
+
+
+def without_failure_headers(headers: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """``headers`` without the ones set when the message failed"""
+    return {
+        name: value
+        for name, value in (headers or {}).items()
+        if name not in _FAILURE_HEADERS
+    }
+
+
+def is_first_delivery(message: AbstractIncomingMessage) -> bool:
+    """Whether ``message`` is neither redelivered nor back from a retry queue"""
+    headers = message.headers or {}
+    return not (
+        message.redelivered or ATTEMPTS_HEADER in headers or "x-death" in headers
+    )
+
 
 class RabbitMQService:
     def __init__(self):
@@ -15,6 +210,9 @@ class RabbitMQService:
         )
         self.connection = None
         self.channel = None
+        self._consumers: Dict[str, Callable] = {}
+        self._publisher: Optional[_PublisherThread] = None
+        self._publisher_lock = threading.Lock()
         self.connect()
 
     def connect(self):
@@ -47,33 +245,62 @@ class RabbitMQService:
 
     def _declare_queues(self):
         """Declare all necessary queues and their bindings"""
-        # Timing data queue
         self.channel.queue_declare(
-            queue=settings.TIMING_QUEUE,
+            queue=settings.DEAD_LETTER_QUEUE,
             durable=True,
-            arguments={
-                "x-message-ttl": 86400000,  # 24 hours
-                "x-max-length": 10000,
-                "x-overflow": "reject-publish",
-            },
+            arguments=DEAD_LETTER_QUEUE_ARGUMENTS,
         )
-        self.channel.queue_bind(
-            exchange="livetiming", queue=settings.TIMING_QUEUE, routing_key="timing.#"
+        self.channel.exchange_declare(
+            exchange=QUARANTINE_EXCHANGE, exchange_type="fanout", durable=True
         )
-
-        # Sensor data queue
         self.channel.queue_declare(
-            queue=settings.SENSOR_QUEUE,
+            queue=settings.QUARANTINE_QUEUE,
             durable=True,
-            arguments={
-                "x-message-ttl": 86400000,  # 24 hours
-                "x-max-length": 10000,
-                "x-overflow": "reject-publish",
-            },
+            arguments=QUARANTINE_QUEUE_ARGUMENTS,
         )
         self.channel.queue_bind(
-            exchange="livetiming", queue=settings.SENSOR_QUEUE, routing_key="sensor.#"
+            exchange=QUARANTINE_EXCHANGE, queue=settings.QUARANTINE_QUEUE
         )
+        for delay in settings.RETRY_DELAYS_MS:
+            self.channel.exchange_declare(
+                exchange=retry_exchange(delay), exchange_type="fanout", durable=True
+            )
+            self.channel.queue_declare(
+                queue=retry_queue(delay),
+                durable=True,
+                arguments=retry_queue_arguments(delay),
+            )
+            self.channel.queue_bind(
+                exchange=retry_exchange(delay), queue=retry_queue(delay)
+            )
+        for queue, routing_key in QUEUE_BINDINGS.items():
+            if not settings.CONSUMER_SHARDS:
+                self.channel.queue_declare(
+                    queue=queue, durable=True, arguments=QUEUE_ARGUMENTS
+                )
+                self.channel.queue_bind(
+                    exchange="livetiming", queue=queue, routing_key=routing_key
+                )
+                continue
+
+            exchange = hash_exchange(queue)
+            self.channel.exchange_declare(
+                exchange=exchange,
+                exchange_type="x-consistent-hash",
+                durable=True,
+                arguments=HASH_EXCHANGE_ARGUMENTS,
+            )
+            self.channel.exchange_bind(
+                destination=exchange, source="livetiming", routing_key=routing_key
+            )
+            for shard_name in consumer_queues(queue):
+                self.channel.queue_declare(
+                    queue=shard_name, durable=True, arguments=SHARD_QUEUE_ARGUMENTS
+                )
+                # With a consistent-hash exchange the binding key is the weight
+                self.channel.queue_bind(
+                    exchange=exchange, queue=shard_name, routing_key="1"
+                )
 
     @contextmanager
     def channel_context(self):
@@ -90,61 +317,121 @@ class RabbitMQService:
             logger.error(f"Channel operation error: {e}")
             raise
 
-    def publish_message(self, routing_key: str, message: Dict[str, Any]) -> bool:
+    def publish_message(
+        self, routing_key: str, message: Dict[str, Any], content_type: str = JSON
+    ) -> bool:
         """
-        Publish message using the topic exchange
+        Publish message using the topic exchange and wait for its confirm
 
         Args:
             routing_key: Format should be either 'timing.{device_id}' or 'sensor.{device_id}.{sensor_type}'
             message: Dictionary containing the message data
+            content_type: application/json (default) or application/msgpack
+        """
+        return self.publish_batch([(routing_key, message)], content_type).confirmed == 1
+
+    def publish_batch(
+        self,
+        messages: Iterable[Tuple[str, Dict[str, Any]]],
+        content_type: str = JSON,
+    ) -> PublishResult:
+        """Publish ``(routing_key, message)`` pairs with pipelined publisher confirms.
+
+        Safe to call from any number of threads. Publishing runs on a
+        background event loop owned by this service (see
+        ``AsyncRabbitMQService.publish_batch``), so all threads share one
+        connection and its channel pool instead of each needing their own
+        blocking connection.
         """
+        messages = list(messages)
+        publisher = self._publisher_thread()
         try:
-            with self.channel_context() as channel:
-                channel.basic_publish(
-                    exchange="livetiming",
-                    routing_key=routing_key,
-                    body=json.dumps(message),
-                    properties=pika.BasicProperties(
-                        delivery_mode=2,  # make message persistent
-                        content_type="application/json",
-                        timestamp=int(time.time()),
-                    ),
-                )
-            return True
+            return publisher.run(
+                publisher.service.publish_batch(messages, content_type),
+                settings.PUBLISH_TIMEOUT_SECONDS,
+            )
         except Exception as e:
-            logger.error(f"Error publishing message: {e}")
-            return False
+            logger.error(f"Error publishing batch of {len(messages)} messages: {e}")
+            return PublishResult(0, list(range(len(messages))))
+
+    def _publisher_thread(self) -> "_PublisherThread":
+        with self._publisher_lock:
+            if self._publisher is None:
+                self._publisher = _PublisherThread()
+            return self._publisher
 
     def consume_messages(self, queue: str, callback: Callable):
-        """Set up consumer for specified queue with automatic reconnection"""
+        """Register a consumer for the specified queue.
+
+        Returns immediately so several queues can be registered before
+        ``start_consuming`` is called.
+        """
+        self._consumers[queue] = callback
+        with self.channel_context() as channel:
+            channel.basic_qos(prefetch_count=settings.CONSUMER_PREFETCH_COUNT)
+            channel.basic_consume(
+                queue=queue, on_message_callback=self._wrap_callback(queue, callback)
+            )
+            logger.info(f"Started consuming from queue: {queue}")
+
+    def start_consuming(self):
+        """Block and dispatch messages for all registered consumers, reconnecting on failure"""
         while True:
             try:
-                with self.channel_context() as channel:
-                    channel.basic_qos(prefetch_count=1)
-                    channel.basic_consume(
-                        queue=queue, on_message_callback=self._wrap_callback(callback)
-                    )
-                    logger.info(f"Started consuming from queue: {queue}")
-                    channel.start_consuming()
+                self.channel.start_consuming()
+                return
             except pika.exceptions.AMQPConnectionError:
                 logger.error("Lost connection to RabbitMQ, reconnecting...")
                 time.sleep(5)
+                self._restore_consumers()
             except Exception as e:
                 logger.error(f"Consumer error: {e}")
                 time.sleep(5)
+                self._restore_consumers()
+
+    def _restore_consumers(self):
+        """Re-register every known consumer after a reconnect"""
+        self.connect()
+        for queue, callback in self._consumers.items():
+            self.channel.basic_qos(prefetch_count=settings.CONSUMER_PREFETCH_COUNT)
+            self.channel.basic_consume(
+                queue=queue, on_message_callback=self._wrap_callback(queue, callback)
+            )
 
-    def _wrap_callback(self, callback: Callable) -> Callable:
-        """Wrap the callback to handle errors and reconnection"""
+    def _wrap_callback(self, queue: str, callback: Callable) -> Callable:
+        """Wrap the callback to retry failed messages with backoff"""
 
         def wrapped_callback(ch, method, properties, body):
             try:
                 callback(ch, method, properties, body)
             except Exception as e:
                 logger.error(f"Error in callback: {e}")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                self._retry(ch, method, properties, body, queue, e)
 
         return wrapped_callback
 
+    def _retry(self, ch, method, properties, body, queue: str, error: Exception):
+        """Send a failed message to its retry tier (or quarantine) and ack it"""
+        try:
+            exchange, headers = retry_destination(
+                properties.headers, "error", str(error), queue, method.routing_key
+            )
+            ch.basic_publish(
+                exchange=exchange,
+                routing_key=method.routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,
+                    content_type=properties.content_type,
+                    headers=headers,
+                ),
+            )
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+        except Exception as e:
+            logger.error(f"Error scheduling retry: {e}")
+            # The queue's dead-letter exchange quarantines it
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
     def create_queue_binding(self, queue: str, routing_key: str):
         """Create a new queue binding"""
         with self.channel_context() as channel:
@@ -172,9 +459,437 @@ class RabbitMQService:
 
     def close(self):
         """Close RabbitMQ connection"""
+        with self._publisher_lock:
+            publisher, self._publisher = self._publisher, None
+        if publisher is not None:
+            publisher.close()
         try:
             if self.connection and not self.connection.is_closed:
                 self.connection.close()
                 logger.info("RabbitMQ connection closed")
         except Exception as e:
             logger.error(f"Error closing RabbitMQ connection: {e}")
+
+
+class AsyncRabbitMQService:
+    """asyncio counterpart of ``RabbitMQService`` built on aio-pika.
+
+    Every consumed queue gets its own channel, so prefetch limits and
+    acknowledgements on one queue never interfere with another and all
+    queues are served concurrently from a single event loop.
+    """
+
+    def __init__(self, prefetch_count: Optional[int] = None):
+        self.prefetch_count = prefetch_count or settings.CONSUMER_PREFETCH_COUNT
+        self.connection: Optional[AbstractRobustConnection] = None
+        self.channel: Optional[AbstractChannel] = None
+        self.exchange: Optional[AbstractExchange] = None
+        self._consumer_channels: Dict[str, AbstractChannel] = {}
+        self._consumers: Dict[str, Tuple[AbstractQueue, str]] = {}
+        # Retry tier and quarantine exchanges by name
+        self._exchanges: Dict[str, AbstractExchange] = {}
+        # Publisher-confirm channels for publish_batch
+        self._channel_pool: Optional[Pool[AbstractChannel]] = None
+
+    async def connect(self):
+        """Establish a robust (auto-reconnecting) connection to RabbitMQ"""
+        if self.connection and not self.connection.is_closed:
+            return
+        try:
+            self.connection = await aio_pika.connect_robust(
+                host=settings.RABBITMQ_HOST,
+                port=settings.RABBITMQ_PORT,
+                login=settings.RABBITMQ_USER,
+                password=settings.RABBITMQ_PASS,
+                heartbeat=600,
+            )
+            self.channel = await self.connection.channel()
+            self.exchange = await self.channel.declare_exchange(
+                "livetiming", aio_pika.ExchangeType.TOPIC, durable=True
+            )
+            await self._declare_queues()
+            logger.info("Successfully connected to RabbitMQ (asyncio)")
+        except Exception as e:
+            logger.error(f"Failed to connect to RabbitMQ: {e}")
+            raise
+
+    async def _declare_queues(self):
+        """Declare all necessary queues and their bindings"""
+        await self.channel.declare_queue(
+            settings.DEAD_LETTER_QUEUE,
+            durable=True,
+            arguments=DEAD_LETTER_QUEUE_ARGUMENTS,
+        )
+        exchange = await self.channel.declare_exchange(
+            QUARANTINE_EXCHANGE, aio_pika.ExchangeType.FANOUT, durable=True
+        )
+        queue = await self.channel.declare_queue(
+            settings.QUARANTINE_QUEUE,
+            durable=True,
+            arguments=QUARANTINE_QUEUE_ARGUMENTS,
+        )
+        await queue.bind(exchange)
+        self._exchanges[QUARANTINE_EXCHANGE] = exchange
+        for delay in settings.RETRY_DELAYS_MS:
+            exchange = await self.channel.declare_exchange(
+                retry_exchange(delay), aio_pika.ExchangeType.FANOUT, durable=True
+            )
+            queue = await self.channel.declare_queue(
+                retry_queue(delay),
+                durable=True,
+                arguments=retry_queue_arguments(delay),
+            )
+            await queue.bind(exchange)
+            self._exchanges[exchange.name] = exchange
+        for queue_name, routing_key in QUEUE_BINDINGS.items():
+            if not settings.CONSUMER_SHARDS:
+                queue = await self.channel.declare_queue(
+                    queue_name, durable=True, arguments=QUEUE_ARGUMENTS
+                )
+                await queue.bind(self.exchange, routing_key=routing_key)
+                continue
+
+            exchange = await self.channel.declare_exchange(
+                hash_exchange(queue_name),
+                aio_pika.ExchangeType.X_CONSISTENT_HASH,
+                durable=True,
+                arguments=HASH_EXCHANGE_ARGUMENTS,
+            )
+            await exchange.bind(self.exchange, routing_key=routing_key)
+            for shard_name in consumer_queues(queue_name):
+                queue = await self.channel.declare_queue(
+                    shard_name, durable=True, arguments=SHARD_QUEUE_ARGUMENTS
+                )
+                # With a consistent-hash exchange the binding key is the weight
+                await queue.bind(exchange, routing_key="1")
+
+    async def consume_messages(
+        self,
+        queue: str,
+        callback: Callable[[AbstractIncomingMessage], Awaitable[Any]],
+    ) -> str:
+        """Start consuming from ``queue`` on a dedicated channel.
+
+        Returns the consumer tag; up to ``prefetch_count`` messages are in
+        flight on the channel at any time.
+        """
+        await self.connect()
+        channel = await self.connection.channel()
+        await channel.set_qos(prefetch_count=self.prefetch_count)
+        amqp_queue = await channel.get_queue(queue)
+        consumer_tag = await amqp_queue.consume(callback)
+        self._consumer_channels[queue] = channel
+        self._consumers[queue] = (amqp_queue, consumer_tag)
+        logger.info(
+            f"Started consuming from queue: {queue} (prefetch={self.prefetch_count})"
+        )
+        return consumer_tag
+
+    async def set_prefetch(self, queues: Iterable[str], prefetch_count: int):
+        """Change the prefetch count of consumed queues (kept across reconnects)"""
+        for queue in queues:
+            channel = self._consumer_channels.get(queue)
+            if channel is not None and not channel.is_closed:
+                await channel.set_qos(prefetch_count=prefetch_count)
+
+    async def publish_message(
+        self, routing_key: str, message: Dict[str, Any], content_type: str = JSON
+    ) -> bool:
+        """Publish message using the topic exchange and wait for its confirm"""
+        try:
+            content_type = normalize_content_type(content_type)
+            await self.connect()
+            await self.exchange.publish(
+                _outgoing(message, content_type), routing_key=routing_key
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error publishing message: {e}")
+            return False
+
+    async def _open_publish_channel(self) -> AbstractChannel:
+        return await self.connection.channel(publisher_confirms=True)
+
+    async def publish_batch(
+        self,
+        messages: Iterable[Tuple[str, Dict[str, Any]]],
+        content_type: str = JSON,
+    ) -> PublishResult:
+        """Publish ``(routing_key, message)`` pairs with pipelined publisher confirms.
+
+        Messages are sent on a pooled channel without waiting for each
+        confirm; up to PUBLISH_CONFIRM_WINDOW are outstanding at a time.
+        Concurrent callers use different channels from the pool. Failed
+        (nacked or unconfirmed) messages are reported by index so the caller
+        can publish them again.
+        """
+        content_type = normalize_content_type(content_type)
+        outgoing: List[Tuple[int, str, aio_pika.Message]] = []
+        unencodable: List[int] = []
+        for index, (routing_key, message) in enumerate(messages):
+            try:
+                outgoing.append((index, routing_key, _outgoing(message, content_type)))
+            except Exception as e:
+                logger.error(f"Cannot encode message for {routing_key}: {e}")
+                unencodable.append(index)
+        return await self._publish_confirmed(outgoing, unencodable)
+
+    async def publish_raw_batch(
+        self, messages: Iterable[Tuple[str, bytes, str, Dict[str, Any]]]
+    ) -> PublishResult:
+        """``publish_batch`` for already encoded messages.
+
+        Takes ``(routing_key, body, content_type, headers)`` tuples, e.g.
+        recorded messages being replayed, and publishes the bodies as-is.
+        """
+        return await self._publish_confirmed(
+            [
+                (
+                    index,
+                    routing_key,
+                    aio_pika.Message(
+                        body=body,
+                        content_type=content_type,
+                        headers=headers,
+                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    ),
+                )
+                for index, (routing_key, body, content_type, headers) in enumerate(
+                    messages
+                )
+            ]
+        )
+
+    async def _publish_confirmed(
+        self,
+        messages: Sequence[Tuple[int, str, aio_pika.Message]],
+        failed: Optional[List[int]] = None,
+    ) -> PublishResult:
+        """Publish ``(index, routing_key, message)`` with pipelined confirms.
+
+        ``failed`` holds indexes that already failed (e.g. could not be
+        encoded); those of nacked or unconfirmed messages are added to it.
+        """
+        failed = list(failed or [])
+        await self.connect()
+        if self._channel_pool is None:
+            self._channel_pool = Pool(
+                self._open_publish_channel,
+                max_size=settings.PUBLISH_CHANNEL_POOL_SIZE,
+            )
+        window = max(1, settings.PUBLISH_CONFIRM_WINDOW)
+        confirmed = 0
+        async with self._channel_pool.acquire() as channel:
+            exchange = await channel.get_exchange("livetiming", ensure=False)
+            pending: List[Tuple[int, Awaitable[Any]]] = []
+
+            async def settle():
+                nonlocal confirmed
+                results = await asyncio.gather(
+                    *(publish for _, publish in pending), return_exceptions=True
+                )
+                for (index, _), result in zip(pending, results):
+                    if isinstance(result, BaseException):
+                        failed.append(index)
+                    else:
+                        confirmed += 1
+                pending.clear()
+
+            try:
+                for index, routing_key, message in messages:
+                    pending.append(
+                        (index, exchange.publish(message, routing_key=routing_key))
+                    )
+                    if len(pending) >= window:
+                        await settle()
+            finally:
+                # Publishes already sent must be awaited whatever happens
+                if pending:
+                    await settle()
+        if failed:
+            logger.error(f"{len(failed)} of {confirmed + len(failed)} publishes failed")
+        return PublishResult(confirmed, sorted(failed))
+
+    async def dead_letter(
+        self,
+        message: AbstractIncomingMessage,
+        reason: str,
+        detail: str,
+        queue: str,
+    ) -> bool:
+        """Copy a rejected message to DEAD_LETTER_QUEUE with its reason code.
+
+        The caller still has to settle the original delivery.
+        """
+        try:
+            await self.connect()
+            await self.channel.default_exchange.publish(
+                _copy(
+                    message,
+                    dead_letter_headers(
+                        message.headers, reason, detail, queue, message.routing_key
+                    ),
+                ),
+                routing_key=settings.DEAD_LETTER_QUEUE,
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error dead-lettering message: {e}")
+            return False
+
+    async def retry(
+        self,
+        message: AbstractIncomingMessage,
+        reason: str,
+        detail: str,
+        queue: str,
+    ) -> bool:
+        """Republish a failed message to its next retry tier, or to quarantine.
+
+        Returns True if it was quarantined. Raises if it could not be
+        published; the caller still has to settle the original delivery.
+        """
+        await self.connect()
+        exchange, headers = retry_destination(
+            message.headers, reason, detail, queue, message.routing_key
+        )
+        await self._exchanges[exchange].publish(
+            _copy(message, headers), routing_key=message.routing_key or ""
+        )
+        return exchange == QUARANTINE_EXCHANGE
+
+    async def peek_messages(
+        self, queue: str, limit: int
+    ) -> Tuple[int, List[AbstractIncomingMessage]]:
+        """Queue length and up to ``limit`` messages from its head, left in place"""
+        await self.connect()
+        channel = await self.connection.channel()
+        try:
+            amqp_queue = await channel.declare_queue(queue, passive=True)
+            messages = []
+            while len(messages) < limit:
+                message = await amqp_queue.get(no_ack=False, fail=False)
+                if message is None:
+                    break
+                messages.append(message)
+            return amqp_queue.declaration_result.message_count, messages
+        finally:
+            # Unacknowledged messages return to the queue when the channel closes
+            await channel.close()
+
+    async def replay_messages(self, queue: str, limit: int) -> int:
+        """Move up to ``limit`` messages from ``queue`` back to the topic exchange.
+
+        Messages are republished under their original routing key with the
+        failure headers removed, so they start again with a full set of
+        retries.
+        """
+        await self.connect()
+        channel = await self.connection.channel()
+        replayed = 0
+        try:
+            amqp_queue = await channel.declare_queue(queue, passive=True)
+            while replayed < limit:
+                message = await amqp_queue.get(no_ack=False, fail=False)
+                if message is None:
+                    break
+                routing_key, headers = replay_target(
+                    message.headers, message.routing_key
+                )
+                await self.exchange.publish(
+                    _copy(message, headers), routing_key=routing_key
+                )
+                await message.ack()
+                replayed += 1
+        finally:
+            await channel.close()
+        logger.info(f"Replayed {replayed} messages from {queue}")
+        return replayed
+
+    async def purge_queue(self, queue: str) -> int:
+        """Delete every message in ``queue``; returns how many were deleted"""
+        await self.connect()
+        amqp_queue = await self.channel.declare_queue(queue, passive=True)
+        result = await amqp_queue.purge()
+        return result.message_count
+
+    async def get_queue_message_count(self, queue: str) -> int:
+        """Get the number of messages in a queue"""
+        await self.connect()
+        response = await self.channel.declare_queue(queue, passive=True)
+        return response.declaration_result.message_count
+
+    async def cancel_consumers(self):
+        """Stop deliveries on every consumed queue.
+
+        Messages already delivered can still be acked afterwards, so a worker
+        can drain its batches before closing and hand its shards over cleanly.
+        """
+        for queue, (amqp_queue, consumer_tag) in self._consumers.items():
+            try:
+                if not self._consumer_channels[queue].is_closed:
+                    await amqp_queue.cancel(consumer_tag)
+            except Exception as e:
+                logger.error(f"Error cancelling consumer on {queue}: {e}")
+        self._consumers.clear()
+
+    async def close(self):
+        """Close consumer channels and the RabbitMQ connection"""
+        try:
+            if self._channel_pool is not None:
+                await self._channel_pool.close()
+                self._channel_pool = None
+            for channel in self._consumer_channels.values():
+                if not channel.is_closed:
+                    await channel.close()
+            self._consumer_channels.clear()
+            if self.connection and not self.connection.is_closed:
+                await self.connection.close()
+                logger.info("RabbitMQ connection closed")
+        except Exception as e:
+            logger.error(f"Error closing RabbitMQ connection: {e}")
+
+
+def _copy(
+    message: AbstractIncomingMessage, headers: Dict[str, Any]
+) -> aio_pika.Message:
+    """Persistent copy of a delivered message with new headers"""
+    return aio_pika.Message(
+        body=message.body,
+        content_type=message.content_type,
+        headers=headers,
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+    )
+
+
+def _outgoing(message: Dict[str, Any], content_type: str) -> aio_pika.Message:
+    return aio_pika.Message(
+        body=encode(message, content_type),
+        content_type=content_type,
+        headers=message_headers(message),
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+    )
+
+
+class _PublisherThread:
+    """Event loop thread running an ``AsyncRabbitMQService`` for blocking callers"""
+
+    def __init__(self, service: Optional[AsyncRabbitMQService] = None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="rabbitmq-publisher", daemon=True
+        )
+        self._thread.start()
+        self.service = service or AsyncRabbitMQService()
+
+    def run(self, coroutine: Coroutine[Any, Any, Any], timeout: float) -> Any:
+        """Run ``coroutine`` on the publisher loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    def close(self) -> None:
+        try:
+            self.run(self.service.close(), settings.PUBLISH_TIMEOUT_SECONDS)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
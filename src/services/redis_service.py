@@ -1,31 +1,258 @@
 # src/services/redis_service.py
 import redis.asyncio as redis
+from redis.utils import HIREDIS_AVAILABLE
 import logging
 import json
-from typing import Optional
+import time
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 from config import settings
+from services.metrics import redis_operation
+from services.standings import (
+    CROSSINGS_KEY,
+    RECORDS_KEY,
+    SECTOR_BESTS_KEY,
+    STANDINGS_KEY,
+    STANDINGS_MEMBERS_KEY,
+    STANDINGS_SNAPSHOT_SCRIPT,
+    UPDATE_STANDINGS_SCRIPT,
+    sector_times_arg,
+    standings_snapshot,
+)
 
 logger = logging.getLogger(__name__)
 
+# Key layout
+#   timing:devices                      set of devices that reported a lap
+#   timing:{device}:latest              hash  lap_time, sector, segment, ts, hist_ms
+#   timing:{device}:history             stream capped at TIMING_HISTORY_MAXLEN
+#   timing:{device}:summary             hash  lap_count, lap_sum, best_lap, worst_lap, last_lap
+#   timing:standings, ...               race standings, see services/standings.py
+#   sensor:devices                      set of devices that reported a reading
+#   sensor:{device}:types               set of sensor types seen for the device
+#   sensor:{device}:{type}:latest       hash  value, unit, ts, hist_ms
+#   sensor:{device}:{type}:history      stream capped at SENSOR_HISTORY_MAXLEN
+#   sensor:{device}:summary             hash  {type}:count/sum/min/max/unit
+#
+# History stream IDs are the sample time in epoch milliseconds (clamped so they
+# never go backwards), which makes XRANGE a native time-range query. Streams are
+# trimmed with "MAXLEN ~" so memory per device stays bounded for any session length.
+
+TIMING_DEVICES_KEY = "timing:devices"
+SENSOR_DEVICES_KEY = "sensor:devices"
+
+
+def timing_key(device_id: str, suffix: str) -> str:
+    return f"timing:{device_id}:{suffix}"
+
+
+def sensor_key(device_id: str, suffix: str, sensor_type: Optional[str] = None) -> str:
+    if sensor_type is None:
+        return f"sensor:{device_id}:{suffix}"
+    return f"sensor:{device_id}:{sensor_type}:{suffix}"
+
+
+def timing_channel(device_id: str) -> str:
+    """Per-device pub/sub channel for lap updates"""
+    return f"{settings.TIMING_UPDATES_CHANNEL}:{device_id}"
+
+
+def sensor_channel(device_id: str, sensor_type: str) -> str:
+    """Per-device, per-type pub/sub channel for sensor updates"""
+    return f"{settings.SENSOR_UPDATES_CHANNEL}:{device_id}:{sensor_type}"
+
+
+def parse_sensor_channel(channel: str) -> Tuple[str, str]:
+    """Return (device_id, sensor_type) from a channel built by ``sensor_channel``"""
+    suffix = channel[len(settings.SENSOR_UPDATES_CHANNEL) + 1 :]
+    device_id, _, sensor_type = suffix.rpartition(":")
+    return device_id, sensor_type
+
+
+def stream_id_ms(entry_id: str) -> int:
+    """Sample time in epoch ms encoded in a history stream entry ID"""
+    return int(entry_id.split("-", 1)[0])
+
+
+def _timing_row(latest: Dict[str, str], summary: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "latest_lap": float(latest["lap_time"]),
+        "best_lap": float(summary["best_lap"]) if summary.get("best_lap") else None,
+        "sector": int(latest["sector"]) if latest.get("sector") else None,
+        "segment": latest.get("segment") or None,
+        "lap_count": int(summary.get("lap_count", 0)),
+        "last_update": int(latest["ts"]),
+    }
+
+
+def to_epoch_ms(timestamp: Union[str, int, float, datetime, None]) -> int:
+    """Convert an ISO-8601 string, datetime or epoch (s or ms) value to epoch ms"""
+    if timestamp is None or timestamp == "":
+        return int(time.time() * 1000)
+    if isinstance(timestamp, (int, float)):
+        # Anything past ~2001 expressed in ms is > 1e12; smaller values are seconds
+        return int(timestamp if timestamp > 1e12 else timestamp * 1000)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+
+# KEYS: latest, history, summary, devices
+# ARGV: device_id, lap_time, sector, segment, ts_ms, maxlen
+STORE_TIMING_SCRIPT = """
+local ts = tonumber(ARGV[5])
+local hist_ms = math.max(ts, tonumber(redis.call('HGET', KEYS[1], 'hist_ms') or '0'))
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[6], string.format('%d-*', hist_ms),
+    'lap_time', ARGV[2], 'sector', ARGV[3], 'segment', ARGV[4])
+redis.call('HSET', KEYS[1], 'lap_time', ARGV[2], 'sector', ARGV[3],
+    'segment', ARGV[4], 'ts', ARGV[5], 'hist_ms', hist_ms)
+
+local lap = tonumber(ARGV[2])
+redis.call('HINCRBY', KEYS[3], 'lap_count', 1)
+redis.call('HINCRBYFLOAT', KEYS[3], 'lap_sum', ARGV[2])
+redis.call('HSET', KEYS[3], 'last_lap', ARGV[2])
+local best = tonumber(redis.call('HGET', KEYS[3], 'best_lap'))
+if not best or lap < best then redis.call('HSET', KEYS[3], 'best_lap', ARGV[2]) end
+local worst = tonumber(redis.call('HGET', KEYS[3], 'worst_lap'))
+if not worst or lap > worst then redis.call('HSET', KEYS[3], 'worst_lap', ARGV[2]) end
+
+redis.call('SADD', KEYS[4], ARGV[1])
+return hist_ms
+"""
+
+# Parts of a sensor reading written by STORE_SENSOR_SCRIPT (bit flags). Conflated
+# readings skip the latest value and publish, and possibly history; see
+# processing/conflation.py.
+SENSOR_HISTORY = 1
+SENSOR_LATEST = 2
+SENSOR_SUMMARY = 4
+SENSOR_ALL = SENSOR_HISTORY | SENSOR_LATEST | SENSOR_SUMMARY
+
+# KEYS: latest, history, summary, types, devices
+# ARGV: device_id, sensor_type, value, unit, ts_ms, maxlen, parts
+STORE_SENSOR_SCRIPT = """
+local ts = tonumber(ARGV[5])
+local parts = tonumber(ARGV[7])
+if parts % 2 == 1 then
+    local hist_ms = math.max(ts, tonumber(redis.call('HGET', KEYS[1], 'hist_ms') or '0'))
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[6], string.format('%d-*', hist_ms), 'value', ARGV[3])
+    redis.call('HSET', KEYS[1], 'hist_ms', hist_ms)
+end
+if parts % 4 >= 2 then
+    redis.call('HSET', KEYS[1], 'value', ARGV[3], 'unit', ARGV[4], 'ts', ARGV[5])
+end
+if parts < 4 then return end
+
+local prefix = ARGV[2] .. ':'
+local value = tonumber(ARGV[3])
+redis.call('HINCRBY', KEYS[3], prefix .. 'count', 1)
+redis.call('HINCRBYFLOAT', KEYS[3], prefix .. 'sum', ARGV[3])
+local lo = tonumber(redis.call('HGET', KEYS[3], prefix .. 'min'))
+if not lo or value < lo then redis.call('HSET', KEYS[3], prefix .. 'min', ARGV[3]) end
+local hi = tonumber(redis.call('HGET', KEYS[3], prefix .. 'max'))
+if not hi or value > hi then redis.call('HSET', KEYS[3], prefix .. 'max', ARGV[3]) end
+redis.call('HSET', KEYS[3], prefix .. 'unit', ARGV[4])
+
+redis.call('SADD', KEYS[4], ARGV[2])
+redis.call('SADD', KEYS[5], ARGV[1])
+"""
+
+
+class RedisPools:
+    """Connection pools shared by every ``RedisService`` of a process.
+
+    One pool per ``decode_responses`` setting, each capped at
+    REDIS_MAX_CONNECTIONS. When a pool is exhausted, callers wait for a
+    connection instead of opening more, so a burst of requests after a
+    restart cannot flood Redis with connects. Connections use TCP keepalive
+    and are health-checked after REDIS_HEALTH_CHECK_SECONDS idle. Replies are
+    parsed by hiredis when it is installed.
+    """
 
-class RedisService:
     def __init__(self):
+        self._pools: Dict[bool, redis.BlockingConnectionPool] = {}
+
+    def client(self, decode_responses: bool) -> redis.Redis:
+        pool = self._pools.get(decode_responses)
+        if pool is None:
+            pool = self._pools[decode_responses] = redis.BlockingConnectionPool(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                decode_responses=decode_responses,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+                socket_keepalive=True,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_SECONDS,
+            )
+            logger.debug(
+                f"Created Redis pool (decode_responses={decode_responses}, "
+                f"hiredis={HIREDIS_AVAILABLE})"
+            )
+        # Closing the client leaves the shared pool open
+        return redis.Redis(connection_pool=pool)
+
+    async def close(self) -> None:
+        """Disconnect every pooled connection; pools are recreated on next use"""
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            await pool.disconnect()
+
+
+redis_pools = RedisPools()
+
+
+class RedisService:
+    def __init__(self, client_factory: Optional[Callable[..., redis.Redis]] = None):
         self.redis_url = (
             f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
         )
+        # Builds clients as client_factory(decode_responses=...); defaults to
+        # the configured server. Lets tools swap in another (e.g. in-memory) Redis.
+        self.client_factory = client_factory or self._default_client
         self.redis: Optional[redis.Redis] = None
+        # Pub/sub payloads are passed through as bytes (JSON or msgpack)
+        self.pubsub_redis: Optional[redis.Redis] = None
+        self._store_timing_script = None
+        self._store_sensor_script = None
+        self._standings_script = None
+        self._standings_snapshot_script = None
+
+    @staticmethod
+    def _default_client(decode_responses: bool) -> redis.Redis:
+        return redis_pools.client(decode_responses)
 
     async def get_connection(self) -> redis.Redis:
         """Get or create Redis connection"""
         if self.redis is None:
             try:
-                self.redis = redis.Redis(
-                    host=settings.REDIS_HOST,
-                    port=settings.REDIS_PORT,
-                    db=settings.REDIS_DB,
-                    decode_responses=True,
-                )
+                self.redis = self.client_factory(decode_responses=True)
                 await self.redis.ping()
+                self._store_timing_script = self.redis.register_script(
+                    STORE_TIMING_SCRIPT
+                )
+                self._store_sensor_script = self.redis.register_script(
+                    STORE_SENSOR_SCRIPT
+                )
+                self._standings_script = self.redis.register_script(
+                    UPDATE_STANDINGS_SCRIPT
+                )
+                self._standings_snapshot_script = self.redis.register_script(
+                    STANDINGS_SNAPSHOT_SCRIPT
+                )
                 logger.info("Successfully connected to Redis")
             except Exception as e:
                 logger.error(f"Failed to connect to Redis: {e}")
@@ -33,24 +260,340 @@ class RedisService:
         return self.redis
 
     async def get_pubsub(self) -> redis.client.PubSub:
-        """Get Redis Pub/Sub client"""
-        redis_client = await self.get_connection()
-        return redis_client.pubsub()
+        """Get a Redis Pub/Sub client that yields raw ``bytes`` payloads"""
+        if self.pubsub_redis is None:
+            self.pubsub_redis = self.client_factory(decode_responses=False)
+        return self.pubsub_redis.pubsub()
 
     async def publish(self, channel: str, message: dict) -> None:
         """Publish message to a channel"""
         try:
             redis_client = await self.get_connection()
-            await redis_client.publish(channel, json.dumps(message))
+            with redis_operation("publish"):
+                await redis_client.publish(channel, json.dumps(message))
             logger.debug(f"Published message to {channel}: {message}")
         except Exception as e:
             logger.error(f"Error publishing to {channel}: {e}")
             raise
 
+    async def _stage_timing(
+        self, pipe, device_id: str, data: Dict[str, Any], raw: Optional[bytes] = None
+    ) -> None:
+        """Queue the latest value, history append, summary update and publish for a lap,
+        and the standings update when STANDINGS_ENABLED.
+
+        ``raw`` is the message as received from the producer; when given it is
+        published as-is instead of being re-encoded.
+        """
+        timestamp = to_epoch_ms(data.get("timestamp"))
+        await self._store_timing_script(
+            keys=[
+                timing_key(device_id, "latest"),
+                timing_key(device_id, "history"),
+                timing_key(device_id, "summary"),
+                TIMING_DEVICES_KEY,
+            ],
+            args=[
+                device_id,
+                data["lap_time"],
+                "" if data.get("sector") is None else data["sector"],
+                data.get("segment") or "",
+                timestamp,
+                settings.TIMING_HISTORY_MAXLEN,
+            ],
+            client=pipe,
+        )
+        pipe.publish(
+            timing_channel(device_id),
+            raw if raw is not None else json.dumps({**data, "device_id": device_id}),
+        )
+        if settings.STANDINGS_ENABLED:
+            await self._standings_script(
+                keys=[
+                    STANDINGS_KEY,
+                    STANDINGS_MEMBERS_KEY,
+                    CROSSINGS_KEY,
+                    SECTOR_BESTS_KEY,
+                    RECORDS_KEY,
+                    timing_key(device_id, "summary"),
+                ],
+                args=[
+                    device_id,
+                    data["lap_time"],
+                    sector_times_arg(data.get("sector_times")),
+                    timestamp,
+                    settings.STANDINGS_UPDATES_CHANNEL,
+                ],
+                client=pipe,
+            )
+
+    async def _stage_sensor(
+        self,
+        pipe,
+        device_id: str,
+        data: Dict[str, Any],
+        raw: Optional[bytes] = None,
+        parts: int = SENSOR_ALL,
+    ) -> None:
+        """Queue the latest value, history append, summary update and publish for a reading.
+
+        ``raw`` is the message as received from the producer; when given it is
+        published as-is instead of being re-encoded. ``parts`` limits the write
+        to some of the SENSOR_* parts; the publish goes with the latest value.
+        """
+        sensor_type = data["sensor_type"]
+        await self._store_sensor_script(
+            keys=[
+                sensor_key(device_id, "latest", sensor_type),
+                sensor_key(device_id, "history", sensor_type),
+                sensor_key(device_id, "summary"),
+                sensor_key(device_id, "types"),
+                SENSOR_DEVICES_KEY,
+            ],
+            args=[
+                device_id,
+                sensor_type,
+                data["value"],
+                data.get("unit", ""),
+                to_epoch_ms(data.get("timestamp")),
+                settings.SENSOR_HISTORY_MAXLEN,
+                parts,
+            ],
+            client=pipe,
+        )
+        if parts & SENSOR_LATEST:
+            pipe.publish(
+                sensor_channel(device_id, sensor_type),
+                (
+                    raw
+                    if raw is not None
+                    else json.dumps({**data, "device_id": device_id})
+                ),
+            )
+
+    async def store_timing_data(self, device_id: str, data: Dict[str, Any]) -> None:
+        """Store a single timing message"""
+        await self.store_batch(timing_data=[{**data, "device_id": device_id}])
+
+    async def store_sensor_data(self, device_id: str, data: Dict[str, Any]) -> None:
+        """Store a single sensor reading"""
+        await self.store_batch(sensor_data=[{**data, "device_id": device_id}])
+
+    async def store_batch(
+        self,
+        timing_data: Iterable[Dict[str, Any]] = (),
+        sensor_data: Iterable[Dict[str, Any]] = (),
+        timing_raw: Optional[Sequence[bytes]] = None,
+        sensor_raw: Optional[Sequence[bytes]] = None,
+        sensor_parts: Optional[Sequence[int]] = None,
+    ) -> int:
+        """Write a batch of timing and sensor messages in a single pipeline.
+
+        ``timing_raw``/``sensor_raw`` optionally hold the original encoded
+        bodies, index-aligned with the data, to publish without re-encoding.
+        ``sensor_parts``, index-aligned as well, holds the SENSOR_* parts to
+        write of each reading (all by default). Returns the number of messages
+        written.
+        """
+        redis_client = await self.get_connection()
+        count = 0
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for i, data in enumerate(timing_data):
+                raw = timing_raw[i] if timing_raw is not None else None
+                await self._stage_timing(pipe, data["device_id"], data, raw)
+                count += 1
+            for i, data in enumerate(sensor_data):
+                raw = sensor_raw[i] if sensor_raw is not None else None
+                parts = sensor_parts[i] if sensor_parts is not None else SENSOR_ALL
+                await self._stage_sensor(pipe, data["device_id"], data, raw, parts)
+                count += 1
+            if count:
+                with redis_operation("store_batch", len(pipe)):
+                    await pipe.execute()
+        logger.debug(f"Stored batch of {count} messages")
+        return count
+
+    async def store_summaries(
+        self, summaries: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]]
+    ) -> None:
+        """Write windowed statistics and announce them on SUMMARY_UPDATES_CHANNEL.
+
+        ``summaries`` maps ``(device_id, sensor_type)`` to ``{window: {stat: value}}``.
+        Statistics are stored in ``sensor:{device}:summary`` as
+        ``{type}:{window}:{stat}`` fields next to the running totals.
+        """
+        redis_client = await self.get_connection()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for (device_id, sensor_type), windows in summaries.items():
+                fields = {
+                    f"{sensor_type}:{window}:{stat}": value
+                    for window, stats in windows.items()
+                    for stat, value in stats.items()
+                    if value is not None
+                }
+                if fields:
+                    pipe.hset(sensor_key(device_id, "summary"), mapping=fields)
+                pipe.publish(
+                    settings.SUMMARY_UPDATES_CHANNEL,
+                    json.dumps(
+                        {
+                            "device_id": device_id,
+                            "sensor_type": sensor_type,
+                            "windows": windows,
+                        }
+                    ),
+                )
+            with redis_operation("store_summaries", len(pipe)):
+                await pipe.execute()
+
+    async def get_timing_board(self) -> Dict[str, Dict[str, Any]]:
+        """Latest lap and summary for every timing device, keyed by device_id"""
+        redis_client = await self.get_connection()
+        with redis_operation("smembers"):
+            devices = sorted(await redis_client.smembers(TIMING_DEVICES_KEY))
+        if not devices:
+            return {}
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for device_id in devices:
+                pipe.hgetall(timing_key(device_id, "latest"))
+                pipe.hgetall(timing_key(device_id, "summary"))
+            with redis_operation("get_timing_board", len(pipe)):
+                results = await pipe.execute()
+
+        board = {}
+        for i, device_id in enumerate(devices):
+            latest, summary = results[2 * i], results[2 * i + 1]
+            if latest:
+                board[device_id] = _timing_row(latest, summary)
+        return board
+
+    async def get_standings(self) -> Dict[str, Any]:
+        """Running order with gaps and the overall records.
+
+        Returns ``{"standings": [row, ...], "best_lap": ..., "best_sectors": ...}``
+        with rows as published on STANDINGS_UPDATES_CHANNEL, leader first.
+        """
+        await self.get_connection()
+        with redis_operation("get_standings"):
+            encoded = await self._standings_snapshot_script(
+                keys=[STANDINGS_KEY, CROSSINGS_KEY, RECORDS_KEY]
+            )
+        return standings_snapshot(encoded)
+
+    async def get_timing_latest(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Latest lap and summary for one device, or None if it never reported"""
+        redis_client = await self.get_connection()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(timing_key(device_id, "latest"))
+            pipe.hgetall(timing_key(device_id, "summary"))
+            with redis_operation("get_timing_latest"):
+                latest, summary = await pipe.execute()
+        if not latest:
+            return None
+        return {"device_id": device_id, **_timing_row(latest, summary)}
+
+    async def get_sensor_latest(
+        self, device_id: str, sensor_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Latest reading for one sensor type, or for every type of the device"""
+        redis_client = await self.get_connection()
+        if sensor_type is None:
+            with redis_operation("smembers"):
+                sensor_types = sorted(
+                    await redis_client.smembers(sensor_key(device_id, "types"))
+                )
+        else:
+            sensor_types = [sensor_type]
+        if not sensor_types:
+            return []
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for sensor_type in sensor_types:
+                pipe.hgetall(sensor_key(device_id, "latest", sensor_type))
+            with redis_operation("get_sensor_latest", len(pipe)):
+                results = await pipe.execute()
+        return [
+            {
+                "device_id": device_id,
+                "sensor_type": sensor_type,
+                "value": float(latest["value"]),
+                "unit": latest.get("unit", ""),
+                "last_update": int(latest["ts"]),
+            }
+            for sensor_type, latest in zip(sensor_types, results)
+            if latest
+        ]
+
+    async def get_history(
+        self,
+        key: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        count: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Tuple[str, Dict[str, str]]], Optional[str]]:
+        """Read a history stream between two sample times.
+
+        Returns ``(entries, next_cursor)``. With ``count`` the result is one
+        page and ``next_cursor`` is the entry ID to resume after; without it the
+        whole range is read in chunks and ``next_cursor`` is None.
+        """
+        redis_client = await self.get_connection()
+        start = f"({cursor}" if cursor else ("-" if start_ms is None else str(start_ms))
+        end = "+" if end_ms is None else str(end_ms)
+
+        if count is not None:
+            with redis_operation("xrange"):
+                entries = await redis_client.xrange(
+                    key, min=start, max=end, count=count + 1
+                )
+            if len(entries) > count:
+                entries = entries[:count]
+                return entries, entries[-1][0]
+            return entries, None
+
+        entries: List[Tuple[str, Dict[str, str]]] = []
+        while True:
+            with redis_operation("xrange"):
+                chunk = await redis_client.xrange(
+                    key, min=start, max=end, count=settings.HISTORY_READ_CHUNK
+                )
+            entries.extend(chunk)
+            if len(chunk) < settings.HISTORY_READ_CHUNK:
+                return entries, None
+            start = f"({chunk[-1][0]}"
+
+    async def get_sensor_series(self) -> List[Tuple[str, str]]:
+        """Every ``(device_id, sensor_type)`` that reported a reading"""
+        redis_client = await self.get_connection()
+        with redis_operation("smembers"):
+            devices = sorted(await redis_client.smembers(SENSOR_DEVICES_KEY))
+        if not devices:
+            return []
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for device_id in devices:
+                pipe.smembers(sensor_key(device_id, "types"))
+            with redis_operation("get_sensor_series", len(pipe)):
+                results = await pipe.execute()
+        return [
+            (device_id, sensor_type)
+            for device_id, sensor_types in zip(devices, results)
+            for sensor_type in sorted(sensor_types)
+        ]
+
+    async def trim_history(self, key: str, min_id: str) -> int:
+        """Drop history entries with IDs below ``min_id``; returns how many"""
+        redis_client = await self.get_connection()
+        with redis_operation("xtrim"):
+            return await redis_client.xtrim(key, minid=min_id, approximate=False)
+
     async def close(self) -> None:
-        """Close Redis connection"""
-        if self.redis:
-            await self.redis.close()
+        """Close Redis connection; the next use opens a new client"""
+        pubsub_redis, self.pubsub_redis = self.pubsub_redis, None
+        redis_client, self.redis = self.redis, None
+        if pubsub_redis:
+            await pubsub_redis.aclose()
+        if redis_client:
+            await redis_client.aclose()
             logger.info("Redis connection closed")
 
     async def __aenter__(self):
@@ -0,0 +1,187 @@
+# src/services/standings.py
+"""Race standings derived from completed laps.
+
+Every lap stored by the consumer also runs ``UPDATE_STANDINGS_SCRIPT`` in the
+same pipeline. The standings live in Redis rather than in a consumer process
+because workers only see the devices of their own shards.
+
+The running order is a sorted set whose members sort by laps completed
+(descending), then by the time the last lap was completed, so a lap costs a
+ZREM/ZADD/ZRANK (O(log n)) instead of re-sorting the board. The time each
+device completed each lap is kept so that gaps compare the moments two cars
+completed the same lap: the gap to the leader and the interval to the car
+ahead. Against a car laps ahead the time is null and the laps down are given
+instead.
+
+Only the rows a lap changes are published on STANDINGS_UPDATES_CHANNEL: the
+device that completed it, the cars it passed, and the car now behind its old
+place (every row when the leader changes). Each update also carries the
+device's personal bests and the overall records. Best sectors and the
+theoretical best lap (sum of personal best sectors) come from the optional
+``sector_times`` of a lap.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+# Key layout
+#   timing:standings            zset  running order (members described below)
+#   timing:standings:members    hash  device -> its current zset member
+#   timing:crossings            hash  {device}:{lap} -> epoch ms the lap was completed
+#   timing:sector_bests         hash  {device}:{i} -> personal best of sector i,
+#                                     {device}:n -> number of sectors seen
+#   timing:records              hash  lap, lap:device, s{i}, s{i}:device
+STANDINGS_KEY = "timing:standings"
+STANDINGS_MEMBERS_KEY = "timing:standings:members"
+CROSSINGS_KEY = "timing:crossings"
+SECTOR_BESTS_KEY = "timing:sector_bests"
+RECORDS_KEY = "timing:records"
+
+# All scores are 0, so members sort lexicographically: 6 digits of
+# 999999 - laps, 13 digits of completion time in ms, then the device_id
+_ROWS_LUA = """
+local function split(member)
+    return 999999 - tonumber(string.sub(member, 1, 6)),
+        tonumber(string.sub(member, 7, 19)), string.sub(member, 20)
+end
+
+-- Seconds between the car ahead and this one completing lap ``laps`` when
+-- they are on the same lap (null when laps down), and the laps down
+local function behind(crossings, ahead, laps, ts)
+    local ahead_laps, _, ahead_device = split(ahead)
+    local gap = cjson.null
+    if ahead_laps == laps then
+        local crossed = redis.call('HGET', crossings, ahead_device .. ':' .. laps)
+        if crossed then gap = (ts - tonumber(crossed)) / 1000 end
+    end
+    return gap, ahead_laps - laps
+end
+
+-- Standings rows of ranks lo..hi (0-based)
+local function rows(standings, crossings, lo, hi)
+    local result = {}
+    local first = math.max(lo - 1, 0)
+    local members = redis.call('ZRANGE', standings, first, hi)
+    local leader = members[1]
+    if first > 0 then leader = redis.call('ZRANGE', standings, 0, 0)[1] end
+    for i = lo - first + 1, #members do
+        local laps, ts, device = split(members[i])
+        local row = {device_id = device, position = first + i, laps = laps,
+            timestamp = ts, gap = 0, interval = 0, laps_behind = 0,
+            interval_laps = 0}
+        if first + i > 1 then
+            row.gap, row.laps_behind = behind(crossings, leader, laps, ts)
+            row.interval, row.interval_laps = behind(crossings, members[i - 1], laps, ts)
+        end
+        result[#result + 1] = row
+    end
+    return result
+end
+
+local function records(key)
+    local best = redis.call('HMGET', key, 'lap', 'lap:device')
+    local result = {best_lap = cjson.null, best_sectors = cjson.null}
+    if best[1] then
+        result.best_lap = {time = tonumber(best[1]), device_id = best[2]}
+    end
+    local i = 1
+    while true do
+        local sector = redis.call('HMGET', key, 's' .. i, 's' .. i .. ':device')
+        if not sector[1] then break end
+        if i == 1 then result.best_sectors = {} end
+        result.best_sectors[i] = {time = tonumber(sector[1]), device_id = sector[2]}
+        i = i + 1
+    end
+    return result
+end
+"""
+
+# KEYS: standings, members, crossings, sector_bests, records, device summary
+# ARGV: device_id, lap_time, sector_times (JSON array or ""), ts_ms, channel
+UPDATE_STANDINGS_SCRIPT = _ROWS_LUA + """
+local device, lap = ARGV[1], tonumber(ARGV[2])
+local ts = tonumber(ARGV[4])
+local summary = redis.call('HMGET', KEYS[6], 'lap_count', 'best_lap')
+local laps = tonumber(summary[1] or '0')
+
+local old = redis.call('HGET', KEYS[2], device)
+local old_rank = nil
+if old then
+    old_rank = redis.call('ZRANK', KEYS[1], old)
+    redis.call('ZREM', KEYS[1], old)
+end
+local member = string.format('%06d%013d', 999999 - laps, ts) .. device
+redis.call('ZADD', KEYS[1], 0, member)
+redis.call('HSET', KEYS[2], device, member)
+redis.call('HSET', KEYS[3], device .. ':' .. laps, ts)
+local rank = redis.call('ZRANK', KEYS[1], member)
+local last = redis.call('ZCARD', KEYS[1]) - 1
+
+-- Cars between the old and new place moved down a position, the car behind
+-- the old place has a new car ahead; a new car or leader moves everyone
+local hi = last
+if old_rank and not (rank == 0 and old_rank ~= 0) then
+    hi = math.min(math.max(rank, old_rank) + 1, last)
+end
+
+local prefix = device .. ':'
+local count = tonumber(redis.call('HGET', KEYS[4], prefix .. 'n') or '0')
+if ARGV[3] ~= '' then
+    local sectors = cjson.decode(ARGV[3])
+    for i, time in ipairs(sectors) do
+        local best = tonumber(redis.call('HGET', KEYS[4], prefix .. i))
+        if not best or time < best then redis.call('HSET', KEYS[4], prefix .. i, time) end
+        local record = tonumber(redis.call('HGET', KEYS[5], 's' .. i))
+        if not record or time < record then
+            redis.call('HSET', KEYS[5], 's' .. i, time, 's' .. i .. ':device', device)
+        end
+    end
+    if #sectors > count then
+        count = #sectors
+        redis.call('HSET', KEYS[4], prefix .. 'n', count)
+    end
+end
+local record = tonumber(redis.call('HGET', KEYS[5], 'lap'))
+if not record or lap < record then
+    redis.call('HSET', KEYS[5], 'lap', ARGV[2], 'lap:device', device)
+end
+
+local update = {device_id = device, laps = laps, timestamp = ts,
+    best_lap = tonumber(summary[2]) or cjson.null,
+    best_sectors = cjson.null, theoretical_best = cjson.null,
+    records = records(KEYS[5]),
+    standings = rows(KEYS[1], KEYS[3], rank, hi)}
+if count > 0 then
+    local bests, sum = {}, 0
+    for i = 1, count do
+        local best = tonumber(redis.call('HGET', KEYS[4], prefix .. i))
+        bests[i] = best or cjson.null
+        if best and sum then sum = sum + best else sum = nil end
+    end
+    update.best_sectors = bests
+    if sum then update.theoretical_best = sum end
+end
+redis.call('PUBLISH', ARGV[5], cjson.encode(update))
+return rank + 1
+"""
+
+# KEYS: standings, crossings, records
+STANDINGS_SNAPSHOT_SCRIPT = _ROWS_LUA + """
+local result = records(KEYS[3])
+result.standings = cjson.null
+local last = redis.call('ZCARD', KEYS[1]) - 1
+if last >= 0 then result.standings = rows(KEYS[1], KEYS[2], 0, last) end
+return cjson.encode(result)
+"""
+
+
+def standings_snapshot(encoded: str) -> Dict[str, Any]:
+    """Decoded ``STANDINGS_SNAPSHOT_SCRIPT`` result"""
+    snapshot = json.loads(encoded)
+    snapshot["standings"] = snapshot.get("standings") or []
+    return snapshot
+
+
+def sector_times_arg(sector_times: Optional[List[float]]) -> str:
+    """``sector_times`` of a lap as ``UPDATE_STANDINGS_SCRIPT`` takes them"""
+    return json.dumps(sector_times) if sector_times else ""
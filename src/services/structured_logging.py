@@ -0,0 +1,188 @@
+# src/services/structured_logging.py
+"""Non-blocking, structured logging.
+
+Log calls only build a ``LogRecord`` and put it on a bounded in-memory queue
+(``QueueHandler``); a ``QueueListener`` thread formats it as one JSON object
+per line and writes it to stderr. Records are passed to the listener as-is,
+so ``%``-style arguments are only formatted there, and only for records that
+survived the level check and the per-device sampler. When the queue is full,
+records are dropped and counted instead of blocking the event loop.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import settings
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message and any extras"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeviceSampler(logging.Filter):
+    """Rate-limit records carrying a ``device_id`` extra, per device.
+
+    Each device gets a token bucket of ``rate`` records per second with a
+    burst of ``burst``. The next record that gets through reports how many
+    were suppressed in between (``suppressed``), so a misbehaving car cannot
+    flood the log while its problem stays visible. Records without a
+    device_id are never sampled.
+    """
+
+    def __init__(self, rate: float, burst: float = 5.0, max_devices: int = 10000):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_devices = max_devices
+        # device_id -> [tokens, last refill time, suppressed since last record]
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        device_id = getattr(record, "device_id", None)
+        if device_id is None or self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(device_id)
+            if bucket is None:
+                if len(self._buckets) >= self.max_devices:
+                    self._buckets.clear()
+                bucket = self._buckets[device_id] = [self.burst, now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return False
+            bucket[0] = tokens - 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """``QueueHandler`` that never blocks and leaves formatting to the listener"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record does not need to be
+        # made picklable; formatting it here would defeat lazy formatting.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+    level: Optional[str] = None, json_format: Optional[bool] = None
+) -> logging.handlers.QueueListener:
+    """Route the root logger through the queue; safe to call more than once"""
+    global _listener
+    level = level or settings.LOG_LEVEL
+    if json_format is None:
+        json_format = settings.LOG_FORMAT == "json"
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(
+        JsonFormatter()
+        if json_format
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    handler.addFilter(DeviceSampler(settings.LOG_SAMPLE_PER_DEVICE_PER_SECOND))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(
+        handler.queue, output, respect_handler_level=True
+    )
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def set_level(level: str, logger_name: Optional[str] = None) -> None:
+    """Change a logger's level at runtime (the root logger by default).
+
+    Raises ValueError for unknown level names.
+    """
+    level = level.upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Unknown log level: {level}")
+    if logger_name in ("", "root"):
+        logger_name = None
+    logging.getLogger(logger_name).setLevel(level)
+
+
+def get_levels() -> Dict[str, str]:
+    """Explicitly set levels: the root logger plus any overridden loggers"""
+    levels = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return levels
+
+
+def apply_level_command(command: Any) -> None:
+    """Apply a ``{"level": ..., "logger": ...}`` broadcast on LOG_LEVEL_CHANNEL"""
+    if isinstance(command, (bytes, str)):
+        command = json.loads(command)
+    set_level(command["level"], command.get("logger"))
+    logging.getLogger(__name__).info(
+        "Log level of %s set to %s",
+        command.get("logger") or "root",
+        command["level"].upper(),
+    )
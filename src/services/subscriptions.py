@@ -0,0 +1,73 @@
+# src/services/subscriptions.py
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+WILDCARD = "*"
+
+SubscriptionKey = Tuple[str, str]
+
+
+class SubscriptionIndex:
+    """Index of subscribers keyed by (device_id, sensor_type).
+
+    Either part of a key may be ``WILDCARD``. Lookups for a concrete
+    (device_id, sensor_type) pair check at most four buckets, so routing cost
+    depends on the number of matching subscribers rather than on the total
+    number of connected clients.
+    """
+
+    def __init__(self):
+        self._by_key: Dict[SubscriptionKey, Set[Hashable]] = defaultdict(set)
+        self._by_subscriber: Dict[Hashable, Set[SubscriptionKey]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._by_subscriber)
+
+    def subscribe(
+        self, subscriber: Hashable, device_id: str = WILDCARD, sensor_type: str = WILDCARD
+    ) -> None:
+        key = (device_id or WILDCARD, sensor_type or WILDCARD)
+        self._by_key[key].add(subscriber)
+        self._by_subscriber[subscriber].add(key)
+
+    def unsubscribe(
+        self, subscriber: Hashable, device_id: str = WILDCARD, sensor_type: str = WILDCARD
+    ) -> None:
+        key = (device_id or WILDCARD, sensor_type or WILDCARD)
+        self._discard(subscriber, key)
+        keys = self._by_subscriber.get(subscriber)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subscriber[subscriber]
+
+    def remove(self, subscriber: Hashable) -> None:
+        """Drop every subscription held by ``subscriber``"""
+        for key in self._by_subscriber.pop(subscriber, ()):
+            self._discard(subscriber, key)
+
+    def _discard(self, subscriber: Hashable, key: SubscriptionKey) -> None:
+        subscribers = self._by_key.get(key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._by_key[key]
+
+    def subscriptions(self, subscriber: Hashable) -> List[SubscriptionKey]:
+        return sorted(self._by_subscriber.get(subscriber, ()))
+
+    def match(self, device_id: str, sensor_type: str) -> Set[Hashable]:
+        """Return every subscriber interested in a message for this pair"""
+        matched: Set[Hashable] = set()
+        for key in _candidate_keys(device_id, sensor_type):
+            subscribers = self._by_key.get(key)
+            if subscribers:
+                matched |= subscribers
+        return matched
+
+
+def _candidate_keys(device_id: str, sensor_type: str) -> Iterable[SubscriptionKey]:
+    yield (device_id, sensor_type)
+    yield (device_id, WILDCARD)
+    yield (WILDCARD, sensor_type)
+    yield (WILDCARD, WILDCARD)
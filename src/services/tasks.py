@@ -0,0 +1,70 @@
+# src/services/tasks.py
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import settings
+from services.metrics import BACKGROUND_TASK_RESTARTS
+
+logger = logging.getLogger(__name__)
+
+
+class TaskSupervisor:
+    """Named background tasks owned by the app's lifespan.
+
+    A task that raises is restarted with exponential backoff (capped at
+    TASK_RESTART_MAX_SECONDS; reset once it has stayed up for a minute). A
+    task that returns is done. ``stop`` cancels every task and waits for
+    them, so none outlive the app.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, run: Callable[[], Awaitable[None]]) -> None:
+        """Run ``run()`` under supervision as the task ``name``"""
+        if name in self._tasks and not self._tasks[name].done():
+            raise ValueError(f"Background task {name} is already running")
+        self._tasks[name] = asyncio.create_task(self._supervise(name, run), name=name)
+
+    async def _supervise(self, name: str, run: Callable[[], Awaitable[None]]) -> None:
+        loop = asyncio.get_running_loop()
+        restarts = 0
+        while True:
+            started_at = loop.time()
+            try:
+                await run()
+                logger.info(f"Background task {name} finished")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if loop.time() - started_at >= 60:
+                    restarts = 0
+                delay = min(settings.TASK_RESTART_MAX_SECONDS, 0.5 * 2**restarts)
+                restarts += 1
+                BACKGROUND_TASK_RESTARTS.labels(name).inc()
+                logger.error(
+                    f"Background task {name} crashed ({e!r}); "
+                    f"restarting in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    def status(self) -> Dict[str, str]:
+        """``running`` or ``finished`` per task"""
+        return {
+            name: "finished" if task.done() else "running"
+            for name, task in self._tasks.items()
+        }
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Cancel every task and wait up to ``timeout`` for them to unwind"""
+        tasks, self._tasks = list(self._tasks.values()), {}
+        for task in tasks:
+            task.cancel()
+        if not tasks:
+            return
+        timeout = settings.TASK_STOP_TIMEOUT_SECONDS if timeout is None else timeout
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            logger.warning(f"Background task {task.get_name()} did not stop in time")
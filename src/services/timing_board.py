@@ -0,0 +1,81 @@
+# src/services/timing_board.py
+from typing import Any, Dict, Optional
+
+from services.redis_service import to_epoch_ms
+
+TIMING_FIELDS = ("latest_lap", "best_lap", "sector", "segment", "lap_count", "last_update")
+
+
+def lap_changes(row: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """The timing fields of ``row`` after folding in the lap in ``update``"""
+    lap_time = float(update["lap_time"])
+    best_lap = row.get("best_lap")
+    return {
+        "latest_lap": lap_time,
+        "best_lap": lap_time if best_lap is None or lap_time < best_lap else best_lap,
+        "sector": update.get("sector"),
+        "segment": update.get("segment"),
+        "lap_count": (row.get("lap_count") or 0) + 1,
+        "last_update": to_epoch_ms(update.get("timestamp")),
+    }
+
+
+class TimingBoard:
+    """Server-side live timing table.
+
+    Incoming lap updates are folded into one row per device. New clients get
+    the whole table with ``snapshot()``; afterwards only the fields that
+    changed since the previous frame are sent, via ``take_delta()``. Deltas
+    carry absolute field values, so applying one twice is harmless, and every
+    frame has a sequence number so clients can detect gaps and ask for a new
+    snapshot.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self.seq = 0
+
+    def load(self, rows: Dict[str, Dict[str, Any]]) -> None:
+        """Seed the table, e.g. from Redis when the process starts"""
+        for device_id, row in rows.items():
+            self.rows[device_id] = {field: row.get(field) for field in TIMING_FIELDS}
+
+    def apply(self, update: Dict[str, Any]) -> None:
+        """Fold one timing message into the table.
+
+        Laps no newer than the device's row are already in it (e.g. in a
+        snapshot loaded after they were published) and are ignored.
+        """
+        device_id = str(update["device_id"])
+        row = self.rows.get(device_id)
+        if row is None:
+            row = self.rows[device_id] = dict.fromkeys(TIMING_FIELDS)
+        elif (
+            row["last_update"] is not None
+            and to_epoch_ms(update.get("timestamp")) <= row["last_update"]
+        ):
+            return
+
+        pending = None
+        for field, value in lap_changes(row, update).items():
+            if row[field] != value:
+                row[field] = value
+                if pending is None:
+                    pending = self._pending.setdefault(device_id, {})
+                pending[field] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "snapshot",
+            "seq": self.seq,
+            "devices": {device_id: dict(row) for device_id, row in self.rows.items()},
+        }
+
+    def take_delta(self) -> Optional[Dict[str, Any]]:
+        """Return the changes accumulated since the last frame, if any"""
+        if not self._pending:
+            return None
+        self.seq += 1
+        delta, self._pending = self._pending, {}
+        return {"type": "delta", "seq": self.seq, "devices": delta}
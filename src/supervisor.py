@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
+from datetime import datetime, timezone
+from multiprocessing.process import BaseProcess
+from multiprocessing.synchronize import Event as EventType
+from typing import Dict, List, Optional, Sequence
+
+from config import settings
+from services.rabbitmq_service import assign_shards
+from services.structured_logging import configure_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+
+def run_worker(
+    shards: Sequence[int],
+    prefetch_count: Optional[int],
+    ready: Optional[EventType] = None,
+):
+    """Entry point of a worker process; sets ``ready`` once it is consuming"""
+    from consumer import MessageConsumer
+
+    configure_logging()
+    consumer = MessageConsumer(shards=shards, prefetch_count=prefetch_count)
+    try:
+        asyncio.run(consumer.run(on_ready=ready.set if ready is not None else None))
+    finally:
+        shutdown_logging()
+
+
+class Worker:
+    def __init__(
+        self,
+        index: int,
+        shards: List[int],
+        process: BaseProcess,
+        ready: EventType,
+    ):
+        self.index = index
+        self.shards = shards
+        self.process = process
+        # Set by the worker once it consumes all of its shard queues
+        self.ready = ready
+        self.started_at = time.monotonic()
+        self.exited_at: Optional[float] = None
+        # Consecutive quick crashes, drives the restart backoff
+        self.restarts = 0
+
+    def restart_delay(self) -> float:
+        return min(settings.WORKER_RESTART_MAX_SECONDS, 0.5 * 2**self.restarts)
+
+
+class WorkerSupervisor:
+    """Run ``workers`` consumer processes, each owning a slice of the shards.
+
+    Shard queues allow a single active consumer, so every other consumer of a
+    shard (on this or another host) is a standby that takes over in order
+    when the active one leaves. The supervisor relies on that to resize
+    without gaps: it starts the new generation of workers first and waits
+    until each has registered as a standby on all of its shards (or
+    WORKER_READY_TIMEOUT_SECONDS passed), then stops the old generation one
+    by one. Each old
+    worker stops consuming, flushes and acks its batches and closes, and its
+    shards move to the new owners.
+
+    Crashed workers are restarted with exponential backoff. SIGTERM/SIGINT
+    stop every worker gracefully; SIGUSR1 adds a worker and SIGUSR2 removes
+    one.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        shards: Optional[int] = None,
+        prefetch_count: Optional[int] = None,
+        stop_timeout: float = settings.WORKER_STOP_TIMEOUT_SECONDS,
+        ready_timeout: float = settings.WORKER_READY_TIMEOUT_SECONDS,
+    ):
+        self.shards = settings.CONSUMER_SHARDS if shards is None else shards
+        if self.shards < 1:
+            raise ValueError(
+                "the supervisor needs CONSUMER_SHARDS > 0, which needs the"
+                " rabbitmq_consistent_hash_exchange plugin"
+            )
+        self.workers = max(1, min(workers, self.shards))
+        self.prefetch_count = prefetch_count
+        self.stop_timeout = stop_timeout
+        self.ready_timeout = ready_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._running: Dict[int, Worker] = {}
+        self._stopping = False
+        self._target: Optional[int] = None
+        self._metrics_dir: Optional[str] = None
+        self._owns_metrics_dir = False
+
+    def _spawn(self, index: int, shards: List[int]) -> Worker:
+        ready = self._context.Event()
+        process = self._context.Process(
+            target=run_worker,
+            args=(shards, self.prefetch_count, ready),
+            name=f"consumer-{index}",
+        )
+        process.start()
+        logger.info(f"Started worker {index} (pid {process.pid}) for shards {shards}")
+        return Worker(index, shards, process, ready)
+
+    def _wait_ready(self, workers: List[Worker]) -> bool:
+        """Wait until ``workers`` consume their shards; False on timeout or exit"""
+        deadline = time.monotonic() + self.ready_timeout
+        for worker in workers:
+            while not worker.ready.wait(0.1):
+                if not worker.process.is_alive() or time.monotonic() > deadline:
+                    logger.warning(f"Worker {worker.index} is not consuming yet")
+                    return False
+        return True
+
+    def _stop_worker(self, worker: Worker):
+        """Ask a worker to drain and exit, killing it after ``stop_timeout``"""
+        process = worker.process
+        if process.is_alive():
+            process.terminate()  # SIGTERM: the consumer flushes and acks first
+            process.join(self.stop_timeout)
+        if process.is_alive():
+            logger.warning(f"Worker {worker.index} did not stop in time, killing it")
+            process.kill()
+            process.join()
+        self._worker_exited(worker)
+        logger.info(f"Worker {worker.index} stopped")
+
+    def _worker_exited(self, worker: Worker):
+        if self._metrics_dir is not None:
+            from services.metrics import mark_worker_dead
+
+            mark_worker_dead(worker.process.pid)
+
+    def serve_metrics(self, port: int):
+        """Serve the metrics of all workers, aggregated, on ``port``.
+
+        Workers write their samples to a shared directory (prometheus_client
+        multiprocess mode), so this has to run before they are started.
+        """
+        self._metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+        if not self._metrics_dir:
+            self._metrics_dir = tempfile.mkdtemp(prefix="livetiming-metrics-")
+            self._owns_metrics_dir = True
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = self._metrics_dir
+        from services.metrics import serve_multiprocess_metrics
+
+        serve_multiprocess_metrics(port)
+        logger.info(f"Serving worker metrics on port {port}")
+
+    def start(self):
+        for index in range(self.workers):
+            shards = assign_shards(index, self.workers, self.shards)
+            self._running[index] = self._spawn(index, shards)
+
+    def resize(self, workers: int):
+        """Change the number of workers without leaving any shard unconsumed"""
+        workers = max(1, min(workers, self.shards))
+        if workers == self.workers:
+            return
+        logger.info(f"Rebalancing {self.shards} shards over {workers} workers")
+        previous = list(self._running.values())
+        self._running = {
+            index: self._spawn(index, assign_shards(index, workers, self.shards))
+            for index in range(workers)
+        }
+        self.workers = workers
+        # Stopping an old worker before the new owner of its shards is a
+        # standby would leave them without a consumer
+        if not self._wait_ready(list(self._running.values())):
+            logger.warning("Stopping the previous workers anyway")
+        for worker in previous:
+            self._stop_worker(worker)
+
+    def stop(self):
+        for worker in self._running.values():
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self._running.values():
+            self._stop_worker(worker)
+        self._running.clear()
+
+    def _restart_dead_workers(self):
+        now = time.monotonic()
+        for index, worker in list(self._running.items()):
+            if worker.process.is_alive():
+                continue
+            if worker.exited_at is None:
+                worker.exited_at = now
+                self._worker_exited(worker)
+                logger.warning(
+                    f"Worker {index} exited with code {worker.process.exitcode}, "
+                    f"restarting in {worker.restart_delay():.1f}s"
+                )
+            if now - worker.exited_at < worker.restart_delay():
+                continue
+            restarted = self._spawn(index, worker.shards)
+            # The backoff resets once a worker has stayed up for a minute
+            if worker.exited_at - worker.started_at < 60:
+                restarted.restarts = worker.restarts + 1
+            self._running[index] = restarted
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def _request_resize(self, signum, frame):
+        delta = 1 if signum == signal.SIGUSR1 else -1
+        self._target = (self._target or self.workers) + delta
+
+    def run(self):
+        """Start the workers and supervise them until SIGTERM/SIGINT"""
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGUSR1, self._request_resize)
+        signal.signal(signal.SIGUSR2, self._request_resize)
+
+        self.start()
+        try:
+            while not self._stopping:
+                if self._target is not None:
+                    target, self._target = self._target, None
+                    self.resize(target)
+                self._restart_dead_workers()
+                time.sleep(0.5)
+        finally:
+            logger.info("Stopping workers...")
+            self.stop()
+            if self._owns_metrics_dir:
+                shutil.rmtree(self._metrics_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run sharded consumer workers")
+    parser.add_argument("--workers", type=int, default=settings.CONSUMER_WORKERS)
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=settings.CONSUMER_PREFETCH_COUNT,
+        help="unacknowledged messages in flight per shard queue",
+    )
+    args = parser.parse_args()
+    configure_logging()
+    if settings.RECORDING_DIR and not settings.RECORDING_SESSION:
+        # One session directory for every worker, restarts included
+        os.environ["RECORDING_SESSION"] = datetime.now(timezone.utc).strftime(
+            "%Y%m%dT%H%M%SZ"
+        )
+    supervisor = WorkerSupervisor(args.workers, prefetch_count=args.prefetch)
+    if settings.CONSUMER_METRICS_PORT:
+        supervisor.serve_metrics(settings.CONSUMER_METRICS_PORT)
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
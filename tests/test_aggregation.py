@@ -0,0 +1,61 @@
+import numpy as np
+from src.processing.aggregation import SensorAggregator
+
+START = 1706788800000
+
+
+def test_windowed_statistics():
+    aggregator = SensorAggregator([1, 10], percentiles=[50], capacity=1024)
+    # 20 s of battery readings at 10 Hz, dropping 0.1 %/sample
+    samples = [
+        ("ev_001", "battery", START + i * 100, 100 - i * 0.1) for i in range(200)
+    ]
+    for i in range(0, len(samples), 37):
+        aggregator.add_batch(samples[i : i + 37])
+
+    stats = aggregator.compute()[("ev_001", "battery")]
+    last_second = [v for _, _, _, v in samples[-10:]]
+    assert stats["1s"]["count"] == 10
+    assert np.isclose(stats["1s"]["mean"], np.mean(last_second))
+    assert np.isclose(stats["1s"]["min"], min(last_second))
+    assert np.isclose(stats["1s"]["max"], max(last_second))
+    assert np.isclose(stats["1s"]["std"], np.std(last_second))
+    assert np.isclose(stats["1s"]["p50"], np.median(last_second))
+    assert np.isclose(stats["1s"]["rate"], -1.0)
+    assert stats["10s"]["count"] == 100
+
+
+def test_only_dirty_series_are_reported():
+    aggregator = SensorAggregator([1], percentiles=[], capacity=16, initial_series=1)
+    aggregator.add_batch(
+        [("ev_001", "speed", START, 10.0), ("ev_002", "speed", START, 20.0)]
+    )
+    assert set(aggregator.compute()) == {("ev_001", "speed"), ("ev_002", "speed")}
+    assert aggregator.compute() == {}
+
+    aggregator.add_batch([("ev_002", "speed", START + 100, 22.0)])
+    result = aggregator.compute()
+    assert list(result) == [("ev_002", "speed")]
+    assert result[("ev_002", "speed")]["1s"]["mean"] == 21.0
+
+
+def test_ring_buffer_overwrites_oldest_samples():
+    aggregator = SensorAggregator([60], percentiles=[], capacity=8)
+    aggregator.add_batch(
+        ("ev_001", "temperature", START + i * 10, float(i)) for i in range(20)
+    )
+    stats = aggregator.compute()[("ev_001", "temperature")]["60s"]
+    assert stats["count"] == 8
+    assert stats["min"] == 12.0 and stats["max"] == 19.0
+
+
+def test_taken_series_are_summarized_while_batches_arrive():
+    aggregator = SensorAggregator([1], percentiles=[50], capacity=16)
+    aggregator.add_batch([("ev_001", "speed", START, 10.0)])
+    taken = aggregator.take()
+    assert aggregator.take() is None
+
+    # Added after the copy: reported by the next flush, not this one
+    aggregator.add_batch([("ev_001", "speed", START + 100, 30.0)])
+    assert aggregator.summarize(taken)[("ev_001", "speed")]["1s"]["p50"] == 10.0
+    assert aggregator.compute()[("ev_001", "speed")]["1s"]["p50"] == 20.0
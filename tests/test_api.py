@@ -1,15 +1,24 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
-from src.services.redis_service import RedisService
+from src.benchmark.fakes import memory_redis_factory
 from datetime import datetime
 
+# The modules the app uses (not their src.* twins)
+import api.routes.v1.rest as rest
+from services.redis_service import RedisService
+
 client = TestClient(app)
 
 
-@pytest.fixture
-def redis_service():
-    return RedisService()
+@pytest.fixture(autouse=True)
+def redis_service(monkeypatch):
+    pytest.importorskip("fakeredis")
+    redis_service = RedisService(memory_redis_factory())
+    monkeypatch.setattr(rest, "redis_service", redis_service)
+    return redis_service
 
 
 def test_health_check():
@@ -33,7 +42,7 @@ def test_get_timing_data(redis_service):
     }
 
     # Store test data in Redis
-    redis_service.store_timing_data(device_id, test_data)
+    asyncio.run(redis_service.store_timing_data(device_id, test_data))
 
     # Test API endpoint
     response = client.get(f"/api/v1/timing/{device_id}")
@@ -54,7 +63,7 @@ def test_get_sensor_data(redis_service):
     }
 
     # Store test data in Redis
-    redis_service.store_sensor_data(device_id, test_data)
+    asyncio.run(redis_service.store_sensor_data(device_id, test_data))
 
     # Test API endpoint
     response = client.get(f"/api/v1/sensor/{device_id}")
@@ -64,3 +73,32 @@ def test_get_sensor_data(redis_service):
     assert data[0]["device_id"] == device_id
     assert data[0]["sensor_type"] == test_data["sensor_type"]
     assert data[0]["latest_value"] == test_data["value"]
+
+
+def test_history_pages_follow_valid_cursors_only(redis_service):
+    device_id = "cursor-car"
+    for value in (1.0, 2.0, 3.0):
+        reading = {"sensor_type": "speed", "value": value, "unit": "km/h"}
+        asyncio.run(redis_service.store_sensor_data(device_id, reading))
+
+    url = f"/api/v1/sensor/{device_id}/speed/history"
+    first = client.get(url, params={"limit": 2}).json()
+    assert first["sensor_type"] == "speed"
+    assert [point["value"] for point in first["points"]] == [1.0, 2.0]
+    second = client.get(url, params={"cursor": first["next_cursor"]}).json()
+    assert [point["value"] for point in second["points"]] == [3.0]
+
+    for cursor in ("abc", "1-", "(0-0", "-"):
+        assert client.get(url, params={"cursor": cursor}).status_code == 422
+        response = client.get(
+            f"/api/v1/timing/{device_id}/history", params={"cursor": cursor}
+        )
+        assert response.status_code == 422
+
+
+def test_sensor_type_named_history_is_not_shadowed(redis_service):
+    reading = {"sensor_type": "history", "value": 1.0, "unit": ""}
+    asyncio.run(redis_service.store_sensor_data("odd-car", reading))
+    response = client.get("/api/v1/sensor/odd-car/history")
+    assert response.status_code == 200
+    assert response.json()["sensor_type"] == "history"
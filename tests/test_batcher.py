@@ -0,0 +1,62 @@
+import asyncio
+from src.processing.batcher import MessageBatcher
+
+
+def test_flushes_when_batch_is_full():
+    async def scenario():
+        flushed = []
+
+        async def flush(batch):
+            flushed.append(list(batch))
+
+        batcher = MessageBatcher(flush, max_size=3, flush_interval_ms=10_000)
+        for i in range(7):
+            batcher.add(i)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        pending = len(batcher)
+        await batcher.flush()
+        return flushed, pending
+
+    flushed, pending = asyncio.run(scenario())
+    assert pending == 1
+    assert flushed == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_flushes_after_interval():
+    async def scenario():
+        flushed = []
+
+        async def flush(batch):
+            flushed.append(list(batch))
+
+        batcher = MessageBatcher(flush, max_size=100, flush_interval_ms=5)
+        batcher.add("a")
+        batcher.add("b")
+        await asyncio.sleep(0.05)
+        return flushed
+
+    assert asyncio.run(scenario()) == [["a", "b"]]
+
+
+def test_flushes_are_serialized_in_order():
+    async def scenario():
+        order = []
+
+        async def flush(batch):
+            order.append(("start", batch[0]))
+            await asyncio.sleep(0.01 if batch[0] == 0 else 0)
+            order.append(("end", batch[0]))
+
+        batcher = MessageBatcher(flush, max_size=1, flush_interval_ms=10_000)
+        batcher.add(0)
+        batcher.add(1)
+        await batcher.flush()
+        return order
+
+    assert asyncio.run(scenario()) == [
+        ("start", 0),
+        ("end", 0),
+        ("start", 1),
+        ("end", 1),
+    ]
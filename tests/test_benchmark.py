@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from src.benchmark.latency import LatencyRecorder
+from src.benchmark.workload import STAMP_FIELD, Workload
+
+
+def test_latency_percentiles():
+    recorder = LatencyRecorder()
+    for i in range(1000):
+        recorder.record(0, (i + 1) * 1_000_000)  # 1..1000 ms
+    summary = recorder.summary()
+    assert summary["count"] == 1000
+    assert summary["p50_ms"] == pytest.approx(500.5)
+    assert summary["p99_ms"] == pytest.approx(990.01)
+    assert summary["max_ms"] == 1000.0
+
+
+def test_workload_publishes_real_payloads_on_real_routing_keys():
+    published = []
+
+    async def publish(routing_key, payload):
+        published.append((routing_key, payload))
+
+    workload = Workload(cars=2, sensors=3, hz=50, lap_seconds=0.05)
+    asyncio.run(workload.run(publish, duration=0.1))
+
+    sensor = [p for key, p in published if key.startswith("sensor.")]
+    laps = [p for key, p in published if key.startswith("timing.")]
+    assert len(sensor) == workload.sensor_messages == 6 * 5
+    assert laps and len(laps) == workload.timing_messages
+    key, payload = published[0]
+    assert key == f"sensor.{payload['device_id']}.{payload['sensor_type']}"
+    assert {"device_id", "sensor_type", "value", "unit", "timestamp"} <= set(payload)
+    assert all(STAMP_FIELD in p for _, p in published)
+
+
+def test_in_memory_pipeline_end_to_end():
+    pytest.importorskip("fakeredis")
+    from src.benchmark.harness import run_benchmark
+
+    report = asyncio.run(
+        run_benchmark(cars=2, sensors=2, hz=10, duration=0.5, warmup=0.2)
+    )
+    assert report["published"]["sensor"] == 20
+    assert report["latency"]["count"] > 0
+    assert report["latency"]["count"] + report["delivered"]["coalesced"] == 20
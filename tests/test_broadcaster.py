@@ -0,0 +1,63 @@
+import asyncio
+from src.services.broadcaster import Broadcaster, OverflowPolicy
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = []
+        self.closed_with = None
+        self.client = None
+
+    async def send_text(self, frame):
+        await asyncio.sleep(self.delay)
+        self.received.append(frame)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def run_broadcast(policy, frames, max_queue=2):
+    async def scenario():
+        closed = []
+        broadcaster = Broadcaster(max_queue, policy, 1.0, lambda ws, kind: closed.append(ws))
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=0.05)
+        broadcaster.register(fast, "sensor")
+        broadcaster.register(slow, "sensor")
+        await asyncio.sleep(0)
+        for frame, key in frames:
+            broadcaster.publish(frame, [fast, slow], key)
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.3)
+        stats = broadcaster.stats()
+        await broadcaster.close()
+        return fast, slow, closed, stats
+
+    return asyncio.run(scenario())
+
+
+FRAMES = [(f"m{i}", "battery") for i in range(6)]
+
+
+def test_slow_client_does_not_delay_fast_client():
+    fast, slow, _, stats = run_broadcast(OverflowPolicy.DROP_OLDEST, FRAMES)
+    assert fast.received == [f for f, _ in FRAMES]
+    assert len(slow.received) < len(FRAMES)
+    assert slow.received[-1] == "m5"
+    assert stats["dropped"] > 0
+
+
+def test_coalesce_keeps_latest_per_key():
+    frames = [("a1", "a"), ("b1", "b"), ("a2", "a"), ("a3", "a"), ("b2", "b")]
+    _, slow, _, stats = run_broadcast(OverflowPolicy.COALESCE, frames, max_queue=10)
+    # a1 is already being sent; b1 and a2 are replaced in their queue slots
+    assert slow.received == ["a1", "b2", "a3"]
+    assert stats["sessions"][1]["coalesced"] == 2
+    assert stats["dropped"] == 0
+
+
+def test_disconnect_policy_closes_slow_client():
+    fast, slow, closed, _ = run_broadcast(OverflowPolicy.DISCONNECT, FRAMES)
+    assert closed == [slow]
+    assert slow.closed_with == 1013
+    assert fast.closed_with is None
@@ -0,0 +1,50 @@
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.services.codec import (
+    JSON,
+    MSGPACK,
+    CodecError,
+    Payload,
+    decode,
+    encode,
+    normalize_content_type,
+    sniff_content_type,
+)
+
+client = TestClient(app)
+
+MESSAGE = {"device_id": "ev_001", "sensor_type": "battery", "value": 85.5, "unit": "%"}
+
+
+def test_decode_by_content_type():
+    assert decode(encode(MESSAGE, MSGPACK), "application/x-msgpack") == MESSAGE
+    assert decode(encode(MESSAGE), "application/json; charset=utf-8") == MESSAGE
+    assert decode(encode(MESSAGE), None) == MESSAGE
+    with pytest.raises(CodecError):
+        decode(b"{not json", JSON)
+    with pytest.raises(CodecError):
+        normalize_content_type("text/plain")
+
+
+def test_sniff_pubsub_payloads():
+    assert sniff_content_type(encode(MESSAGE, MSGPACK)) == MSGPACK
+    assert sniff_content_type(encode(MESSAGE)) == JSON
+
+
+def test_payload_passes_raw_bytes_through():
+    raw = encode(MESSAGE, MSGPACK)
+    payload = Payload(raw=raw)
+    assert payload.frame(MSGPACK) is raw
+    assert decode(payload.frame(JSON)) == MESSAGE
+
+    text = Payload(raw=encode(MESSAGE))
+    assert isinstance(text.frame(JSON), str)
+    assert msgpack.unpackb(text.frame(MSGPACK)) == MESSAGE
+
+
+def test_msgpack_websocket_frames():
+    with client.websocket_connect("/api/v1/ws/timing?format=msgpack") as ws:
+        snapshot = msgpack.unpackb(ws.receive_bytes())
+        assert snapshot["type"] == "snapshot"
@@ -0,0 +1,132 @@
+import asyncio
+
+import numpy as np
+
+from src.benchmark.fakes import memory_redis_factory
+from src.services.cold_storage import (
+    ColdStore,
+    Compactor,
+    open_segment,
+    read_sensor_history,
+)
+from src.services.redis_service import RedisService, sensor_key
+
+# The settings object the services read (not its src.config twin)
+from config import settings
+
+T0 = 1_700_000_000_000
+
+
+async def _store(redis, timestamps):
+    await redis.store_batch(
+        sensor_data=[
+            {
+                "device_id": "car/1",
+                "sensor_type": "speed",
+                "value": float(i),
+                "unit": "kmh",
+                "timestamp": ts,
+            }
+            for i, ts in enumerate(timestamps)
+        ]
+    )
+
+
+async def _read_all(redis, store, limit):
+    timestamps, values, cursor = [], [], None
+    while True:
+        t, v, cursor = await read_sensor_history(
+            redis, store, "car/1", "speed", count=limit, cursor=cursor
+        )
+        assert len(t) <= limit
+        timestamps.extend(t.tolist())
+        values.extend(v.tolist())
+        if cursor is None:
+            return timestamps, values
+
+
+def test_compaction_moves_old_history_and_reads_merge(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "COLD_SEGMENT_MAX_POINTS", 40)
+
+    async def scenario():
+        redis = RedisService(memory_redis_factory())
+        store = ColdStore(tmp_path)
+        compactor = Compactor(redis, store, age_seconds=1)
+        # Three samples share a millisecond around the first cutoff
+        timestamps = [T0 + 10 * i for i in range(50)] + [T0 + 490, T0 + 490]
+        timestamps += [T0 + 500 + 10 * i for i in range(48)]
+        await _store(redis, timestamps)
+
+        assert await compactor.compact(T0 + 490 + 1000) == 52
+        assert await compactor.compact(T0 + 490 + 1000) == 0
+        key = sensor_key("car/1", "history", "speed")
+        client = await redis.get_connection()
+        assert await client.xlen(key) == 48
+
+        # Redis keeps only the recent part; together nothing is lost or doubled
+        t, v, cursor = await read_sensor_history(redis, store, "car/1", "speed")
+        assert cursor is None
+        assert t.tolist() == timestamps
+        assert v.tolist() == [float(i) for i in range(100)]
+        for limit in (1, 7, 51, 52, 53, 500):
+            assert await _read_all(redis, store, limit) == (t.tolist(), v.tolist())
+
+        t, v, _ = await read_sensor_history(
+            redis, store, "car/1", "speed", T0 + 300, T0 + 600
+        )
+        assert t[0] == T0 + 300 and t[-1] == T0 + 600
+        assert len(t) == 33
+
+        assert await compactor.compact(T0 + 10_000) == 48
+        assert await client.xlen(key) == 0
+        # Merged into full segments of COLD_SEGMENT_MAX_POINTS
+        segments = store.segments("car/1", "speed")
+        assert [len(s.timestamps) for s in segments] == [40, 40, 20]
+        t, _, _ = await read_sensor_history(redis, store, "car/1", "speed")
+        assert t.tolist() == timestamps
+        await redis.close()
+
+    asyncio.run(scenario())
+
+
+def test_interrupted_compaction_is_not_archived_twice(tmp_path):
+    async def scenario():
+        redis = RedisService(memory_redis_factory())
+        store = ColdStore(tmp_path)
+        compactor = Compactor(redis, store, age_seconds=1)
+        await _store(redis, [T0 + i for i in range(10)])
+
+        async def crash(key, min_id):
+            raise ConnectionError("lost Redis before trimming")
+
+        trim, redis.trim_history = redis.trim_history, crash
+        try:
+            await compactor.compact(T0 + 1005)
+        except ConnectionError:
+            pass
+        redis.trim_history = trim
+
+        await _store(redis, [T0 + 10 + i for i in range(10)])
+        assert await compactor.compact(T0 + 2000) == 14
+        (segment,) = store.segments("car/1", "speed")
+        assert segment.timestamps.tolist() == [T0 + i for i in range(20)]
+        t, _, _ = await read_sensor_history(redis, store, "car/1", "speed")
+        assert len(t) == 20
+        await redis.close()
+
+    asyncio.run(scenario())
+
+
+def test_segments_are_memory_mapped(tmp_path):
+    store = ColdStore(tmp_path)
+    timestamps = np.arange(1000, dtype=np.int64) + T0
+    store.append("car/1", "speed", timestamps, timestamps * 0.5, ["1-0"] * 1000)
+    (path,) = store.series_dir("car/1", "speed").iterdir()
+    assert path.parent.parent.name == "car%2F1"
+
+    segment = open_segment(path)
+    assert not segment.timestamps.flags.owndata
+    assert not segment.timestamps.flags.writeable
+    t, v = store.read("car/1", "speed", T0 + 100, T0 + 199)
+    assert len(t) == 100 and np.shares_memory(t, store.segments("car/1", "speed")[0][0])
+    assert v[0] == (T0 + 100) * 0.5
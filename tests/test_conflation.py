@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from src.processing.conflation import SensorConflator
+from src.services.redis_service import (
+    SENSOR_ALL,
+    SENSOR_HISTORY,
+    SENSOR_LATEST,
+    SENSOR_SUMMARY,
+)
+
+# The settings the consumer uses (not their src.* twin)
+from config import settings
+
+T0 = 1714564800000
+
+
+def _reading(value, ts, sensor_type="speed"):
+    return {
+        "device_id": "car_1",
+        "sensor_type": sensor_type,
+        "value": value,
+        "unit": "",
+        "timestamp": ts,
+    }
+
+
+def test_latest_value_is_emitted_once_per_interval():
+    conflator = SensorConflator(
+        {"speed": 100, "gear": 0}, default_ms=0, history="downsample", history_ms=50
+    )
+    assert conflator.enabled and conflator.tick == 0.05
+
+    # The first reading goes out right away, then readings are held
+    first = conflator.add(_reading(1.0, T0), b"1", now=0.0)
+    assert first == SENSOR_SUMMARY | SENSOR_HISTORY | SENSOR_LATEST
+    assert conflator.add(_reading(2.0, T0 + 20), b"2", now=0.02) == SENSOR_SUMMARY
+    assert conflator.add(_reading(3.0, T0 + 60), b"3", now=0.06) == (
+        SENSOR_SUMMARY | SENSOR_HISTORY
+    )
+    assert conflator.add(_reading(1.0, T0, "gear"), b"g", now=0.06) == SENSOR_ALL
+    assert len(conflator) == 1
+
+    assert conflator.due(0.09) == []
+    assert conflator.due(0.1) == [(_reading(3.0, T0 + 60), b"3")]
+    assert conflator.due(0.15) == []
+
+    # The interval is up when the next reading arrives: it goes out itself
+    conflator.add(_reading(4.0, T0 + 80), b"4", now=0.15)
+    parts = conflator.add(_reading(5.0, T0 + 90), b"5", now=0.2)
+    assert parts & SENSOR_LATEST and not len(conflator)
+
+    conflator.add(_reading(6.0, T0 + 100), b"6", now=0.21)
+    due = conflator.due(0.35)
+    assert due == [(_reading(6.0, T0 + 100), b"6")]
+
+    # Failed writes are retried on the next poll, unless something newer came
+    conflator.restore(due)
+    assert conflator.due(0.36) == due
+    conflator.restore(due)
+    conflator.add(_reading(7.0, T0 + 110), b"7", now=0.37)
+    conflator.add(_reading(8.0, T0 + 120), b"8", now=0.38)
+    conflator.restore(due)
+    assert conflator.due(float("inf")) == [(_reading(8.0, T0 + 120), b"8")]
+
+
+def test_rollback_forgets_a_batch_that_was_not_written():
+    conflator = SensorConflator(
+        {"speed": 100}, default_ms=0, history="downsample", history_ms=50
+    )
+    conflator.add(_reading(1.0, T0), b"1", now=0.0)
+    conflator.add(_reading(2.0, T0 + 20), b"2", now=0.02)
+
+    batch = [_reading(3.0, T0 + 60), _reading(1.0, T0, "rpm")]
+    snapshot = conflator.snapshot(batch)
+    conflator.add(batch[0], b"3", now=0.15)
+    conflator.rollback(snapshot)
+
+    # The superseded reading is held again, and the redelivery is not throttled
+    assert conflator.due(0.16) == [(_reading(2.0, T0 + 20), b"2")]
+    snapshot = conflator.snapshot(batch)
+    conflator.add(_reading(4.0, T0 + 70), b"4", now=0.2)
+    conflator.rollback(snapshot)
+    assert not len(conflator)
+    parts = conflator.add(batch[0], b"3", now=0.3)
+    assert parts == SENSOR_SUMMARY | SENSOR_HISTORY | SENSOR_LATEST
+
+
+def test_consumer_publishes_conflated_sensors_and_keeps_full_history(monkeypatch):
+    pytest.importorskip("fakeredis")
+    from benchmark.fakes import InMemoryBroker, memory_redis_factory
+    from consumer import MessageConsumer
+    from services.redis_service import RedisService, sensor_key
+
+    monkeypatch.setattr(settings, "AGGREGATION_ENABLED", False)
+    monkeypatch.setattr(settings, "FLOW_CONTROL_ENABLED", False)
+    monkeypatch.setattr(settings, "SENSOR_CONFLATION_INTERVALS_MS", {"speed": 1000})
+    broker = InMemoryBroker()
+    redis = RedisService(memory_redis_factory())
+
+    async def scenario():
+        pubsub = await redis.get_pubsub()
+        await pubsub.psubscribe("sensor_updates:*")
+        consumer = MessageConsumer(redis=redis, rabbitmq=broker)
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.02)
+        for i in range(20):
+            for sensor_type in ("speed", "rpm"):
+                await broker.publish_message(
+                    f"sensor.car_1.{sensor_type}",
+                    _reading(float(i), T0 + i * 10, sensor_type),
+                )
+        await asyncio.sleep(0.1)
+        (speed,) = await redis.get_sensor_latest("car_1", "speed")
+        # Held until the interval is up, or the consumer stops
+        consumer.stop()
+        await task
+        (latest,) = await redis.get_sensor_latest("car_1", "speed")
+
+        published = []
+        while True:
+            message = await pubsub.get_message(timeout=0.01)
+            if message is None:
+                break
+            if message["type"] == "pmessage":
+                published.append(message["channel"])
+        await pubsub.aclose()
+        history, _ = await redis.get_history(sensor_key("car_1", "history", "speed"))
+        summary = await (await redis.get_connection()).hgetall(
+            sensor_key("car_1", "summary")
+        )
+        return speed, latest, published, history, summary
+
+    speed, latest, published, history, summary = asyncio.run(scenario())
+    assert speed["value"] == 0.0
+    assert latest["value"] == 19.0
+    assert published.count(b"sensor_updates:car_1:speed") == 2
+    assert published.count(b"sensor_updates:car_1:rpm") == 20
+    assert len(history) == 20
+    assert summary["speed:count"] == "20"
@@ -0,0 +1,291 @@
+import asyncio
+import json
+
+from src.consumer import MessageConsumer
+from src.services.rabbitmq_service import (
+    ATTEMPTS_HEADER,
+    QUARANTINE_EXCHANGE,
+    AsyncRabbitMQService,
+    retry_exchange,
+)
+
+# The settings the consumer uses (not their src.* twin)
+from config import settings
+
+
+class FakeMessage:
+    """Incoming message that records how it was settled in ``log``"""
+
+    def __init__(self, log, channel, tag, payload, routing_key="timing.car_1"):
+        self.log = log
+        self.consumer_tag = channel
+        self.delivery_tag = tag
+        self.body = json.dumps(payload).encode()
+        self.content_type = "application/json"
+        self.routing_key = routing_key
+        self.headers = {}
+        self.redelivered = False
+
+    async def ack(self, multiple=False):
+        self.log.append(("ack", self.consumer_tag, self.delivery_tag, multiple))
+
+    async def nack(self, multiple=False, requeue=True):
+        self.log.append(("nack", self.consumer_tag, self.delivery_tag, requeue))
+
+    async def reject(self, requeue=False):
+        self.log.append(("reject", self.consumer_tag, self.delivery_tag, requeue))
+
+
+class FakeRedis:
+    def __init__(self, log, error=None):
+        self.log = log
+        self.error = error
+
+    async def store_batch(self, timing_data=None, timing_raw=None, **kwargs):
+        self.log.append(("store", len(timing_data)))
+        if self.error is not None:
+            raise self.error
+
+
+class FakeBroker:
+    def __init__(self, log, dead_letters=True, retries=True):
+        self.log = log
+        self.dead_letters = dead_letters
+        self.retries = retries
+
+    async def dead_letter(self, message, reason, detail, queue):
+        self.log.append(("dead_letter", message.consumer_tag, message.delivery_tag))
+        return self.dead_letters
+
+    async def retry(self, message, reason, detail, queue):
+        if not self.retries:
+            raise ConnectionError("broker down")
+        self.log.append(("retry", message.consumer_tag, message.delivery_tag))
+        return False
+
+
+def _lap(lap_time=91.5):
+    return {"device_id": "car_1", "lap_time": lap_time, "timestamp": 1714564800000}
+
+
+def _flush(log, items, redis=None, broker=None):
+    consumer = MessageConsumer(
+        redis=redis or FakeRedis(log), rabbitmq=broker or FakeBroker(log)
+    )
+    batch = [
+        (FakeMessage(log, channel, tag, payload), payload)
+        for channel, tag, payload in items
+    ]
+    asyncio.run(consumer.flush_timing_batch(batch))
+
+
+def test_last_message_of_each_channel_is_acked_after_the_store():
+    log = []
+    _flush(
+        log,
+        [
+            ("a", 1, _lap()),
+            ("b", 1, _lap()),
+            ("a", 2, _lap()),
+            ("b", 2, _lap()),
+            ("a", 3, _lap()),
+        ],
+    )
+    assert log[0] == ("store", 5)
+    assert sorted(log[1:]) == [("ack", "a", 3, True), ("ack", "b", 2, True)]
+
+
+def test_failed_dead_letter_is_rejected_and_left_out_of_the_ack():
+    log = []
+    _flush(
+        log,
+        [("a", 1, _lap()), ("a", 2, _lap(lap_time="fast"))],
+        broker=FakeBroker(log, dead_letters=False),
+    )
+    assert log == [
+        ("dead_letter", "a", 2),
+        ("reject", "a", 2, False),
+        ("store", 1),
+        ("ack", "a", 1, True),
+    ]
+
+
+def test_dead_lettered_messages_are_covered_by_the_ack():
+    log = []
+    _flush(log, [("a", 1, _lap()), ("a", 2, _lap(lap_time="fast"))])
+    assert log == [("dead_letter", "a", 2), ("store", 1), ("ack", "a", 2, True)]
+
+
+def test_store_failure_routes_the_batch_to_retry():
+    log = []
+    _flush(
+        log,
+        [("a", 1, _lap()), ("b", 1, _lap()), ("a", 2, _lap())],
+        redis=FakeRedis(log, ConnectionError("redis down")),
+    )
+    assert log[:4] == [
+        ("store", 3),
+        ("retry", "a", 1),
+        ("retry", "b", 1),
+        ("retry", "a", 2),
+    ]
+    assert sorted(log[4:]) == [("ack", "a", 2, True), ("ack", "b", 1, True)]
+
+
+def test_batch_is_requeued_when_retries_cannot_be_published():
+    log = []
+    _flush(
+        log,
+        [("a", 1, _lap()), ("a", 2, _lap())],
+        redis=FakeRedis(log, ConnectionError("redis down")),
+        broker=FakeBroker(log, retries=False),
+    )
+    assert log == [("store", 2), ("nack", "a", 2, True)]
+
+
+class FakeExchange:
+    def __init__(self, name):
+        self.name = name
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append((routing_key, message))
+
+
+class FakeQueue:
+    def __init__(self):
+        self.callback = None
+
+    async def consume(self, callback):
+        self.callback = callback
+        return "ctag-1"
+
+
+class FakeChannel:
+    def __init__(self):
+        self.is_closed = False
+        self.default_exchange = FakeExchange("")
+        self.prefetch_count = None
+        self.queues = {}
+
+    async def set_qos(self, prefetch_count):
+        self.prefetch_count = prefetch_count
+
+    async def get_queue(self, name):
+        return self.queues.setdefault(name, FakeQueue())
+
+
+class FakeConnection:
+    is_closed = False
+
+    def __init__(self):
+        self.channels = []
+
+    async def channel(self):
+        channel = FakeChannel()
+        self.channels.append(channel)
+        return channel
+
+
+def _service():
+    service = AsyncRabbitMQService(prefetch_count=50)
+    service.connection = FakeConnection()
+    service.channel = FakeChannel()
+    for name in [QUARANTINE_EXCHANGE] + [
+        retry_exchange(delay) for delay in settings.RETRY_DELAYS_MS
+    ]:
+        service._exchanges[name] = FakeExchange(name)
+    return service
+
+
+def test_each_queue_is_consumed_on_its_own_channel():
+    service = _service()
+
+    async def callback(message):
+        pass
+
+    async def scenario():
+        await service.consume_messages("timing_data", callback)
+        await service.consume_messages("sensor_data", callback)
+        await service.set_prefetch(["sensor_data"], 400)
+
+    asyncio.run(scenario())
+    timing, sensor = service.connection.channels
+    assert timing.queues["timing_data"].callback is callback
+    assert (timing.prefetch_count, sensor.prefetch_count) == (50, 400)
+
+
+def test_failed_messages_move_through_the_retry_tiers(monkeypatch):
+    monkeypatch.setattr(settings, "RETRY_MAX_ATTEMPTS", 3)
+    service = _service()
+    log = []
+    message = FakeMessage(log, "a", 1, _lap(), routing_key="timing.car_1")
+
+    async def fail_until_quarantined():
+        destinations = []
+        while True:
+            quarantined = await service.retry(message, "store_error", "x", "q")
+            exchange = next(
+                exchange
+                for exchange in service._exchanges.values()
+                if exchange.published
+            )
+            routing_key, copy = exchange.published.pop()
+            destinations.append((exchange.name, routing_key))
+            message.headers = copy.headers
+            if quarantined:
+                return destinations
+
+    destinations = asyncio.run(fail_until_quarantined())
+    assert destinations == [
+        (retry_exchange(settings.RETRY_DELAYS_MS[0]), "timing.car_1"),
+        (retry_exchange(settings.RETRY_DELAYS_MS[1]), "timing.car_1"),
+        (QUARANTINE_EXCHANGE, "timing.car_1"),
+    ]
+    assert message.headers[ATTEMPTS_HEADER] == 3
+    assert message.headers["x-reject-reason"] == "store_error"
+    # Republishing does not settle the original delivery
+    assert log == []
+
+
+def test_dead_letters_are_copied_to_the_dead_letter_queue():
+    service = _service()
+    message = FakeMessage([], "a", 1, _lap(), routing_key="timing.car_1")
+    assert asyncio.run(service.dead_letter(message, "invalid_value", "x", "q"))
+    ((routing_key, copy),) = service.channel.default_exchange.published
+    assert routing_key == settings.DEAD_LETTER_QUEUE
+    assert copy.body == message.body
+    assert copy.headers["x-original-routing-key"] == "timing.car_1"
+
+    # A failed copy is reported; the consumer then rejects the message itself
+    async def unreachable(message, routing_key):
+        raise ConnectionError("channel closed")
+
+    service.channel.default_exchange.publish = unreachable
+    assert not asyncio.run(service.dead_letter(message, "invalid_value", "x", "q"))
+
+
+class FakeRecorder:
+    def __init__(self):
+        self.records = []
+
+    def append(self, routing_key, content_type, headers, body):
+        self.records.append(headers)
+
+
+def test_only_first_deliveries_are_recorded():
+    log = []
+    consumer = MessageConsumer(redis=FakeRedis(log), rabbitmq=FakeBroker(log))
+    consumer.recorder = FakeRecorder()
+    messages = [FakeMessage(log, "a", tag, _lap()) for tag in range(1, 5)]
+    messages[0].headers = {settings.SHARD_HASH_HEADER: "car_1"}
+    messages[1].redelivered = True
+    messages[2].headers = {ATTEMPTS_HEADER: 1}
+    messages[3].headers = {"x-death": [{"count": 1}]}
+
+    async def scenario():
+        for message in messages:
+            await consumer.process_timing_data(message)
+
+    asyncio.run(scenario())
+    assert consumer.recorder.records == [{settings.SHARD_HASH_HEADER: "car_1"}]
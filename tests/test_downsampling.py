@@ -0,0 +1,35 @@
+import numpy as np
+from src.services.downsampling import DownsampleMethod, downsample, lttb_indices
+
+
+def _series(n=1000):
+    timestamps = np.arange(n, dtype=np.int64) * 20 + 1706788800000
+    values = np.sin(np.arange(n) / 25.0) * 50 + 50
+    return timestamps, values
+
+
+def test_short_series_is_returned_unchanged():
+    timestamps, values = _series(10)
+    out_t, out_v, mins, maxs = downsample(timestamps, values, 50, DownsampleMethod.AVG)
+    assert out_t is timestamps and out_v is values
+    assert mins is None and maxs is None
+
+
+def test_bucket_methods_keep_envelope():
+    timestamps, values = _series()
+    for method in (DownsampleMethod.AVG, DownsampleMethod.MIN, DownsampleMethod.MAX):
+        out_t, out_v, mins, maxs = downsample(timestamps, values, 100, method)
+        assert len(out_t) == len(out_v) == 100
+        assert np.all(mins <= out_v) and np.all(out_v <= maxs)
+        assert np.all(np.diff(out_t) > 0)
+    assert mins.min() == values.min() and maxs.max() == values.max()
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    timestamps, values = _series()
+    index = lttb_indices(timestamps, values, 100)
+    assert len(index) == 100
+    assert index[0] == 0 and index[-1] == len(values) - 1
+    assert np.all(np.diff(index) > 0)
+    assert np.isclose(values[index].max(), values.max(), atol=1.0)
+    assert np.isclose(values[index].min(), values.min(), atol=1.0)
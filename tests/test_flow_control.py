@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from src.processing.flow_control import FlowController
+
+# The settings the consumer uses (not their src.* twin)
+from config import settings
+
+
+def test_scales_with_the_backlog_and_degrades_with_hysteresis(monkeypatch):
+    monkeypatch.setattr(settings, "FLOW_CONTROL_BACKLOG", 100)
+    monkeypatch.setattr(settings, "FLOW_CONTROL_MAX_SCALE", 4)
+    monkeypatch.setattr(settings, "FLOW_CONTROL_DEGRADED_DEPTH", 1000)
+    monkeypatch.setattr(settings, "FLOW_CONTROL_DEGRADED_LATENCY_MS", 500)
+    flow = FlowController("sensor_data", prefetch_count=20, batch_size=10)
+
+    assert not flow.update(10, 0.01)
+    assert (flow.prefetch_count, flow.batch_size) == (20, 10)
+    assert flow.update(200, 0.01)
+    assert (flow.prefetch_count, flow.batch_size) == (40, 20)
+    flow.update(200, 0.01)
+    assert not flow.update(200, 0.01)
+    assert (flow.prefetch_count, flow.batch_size) == (80, 40)
+
+    # Redis is the bottleneck: bigger pipelines would not help
+    flow.scale = 1
+    flow.observe_store(settings.FLOW_CONTROL_SLOW_STORE_MS / 1000)
+    assert not flow.update(200, 0.01)
+    flow.store_seconds = 0.0
+
+    assert not flow.degraded
+    flow.update(1000, 0.01)
+    assert flow.degraded
+    # Stays degraded until the backlog is half drained
+    flow.update(600, 0.01)
+    assert flow.degraded
+    flow.update(400, 0.01)
+    assert not flow.degraded
+    flow.update(0, 0.6)
+    assert flow.degraded
+    flow.update(0, 0.2)
+    assert not flow.degraded
+
+    laps = FlowController("timing_data", degrade=False)
+    laps.update(1000, 1.0)
+    assert not laps.degraded and laps.scale == 2
+
+
+def test_degraded_consumer_keeps_latest_readings_and_every_lap(monkeypatch):
+    pytest.importorskip("fakeredis")
+    from benchmark.fakes import InMemoryBroker, memory_redis_factory
+    from consumer import MessageConsumer
+    from services.redis_service import RedisService, sensor_key, timing_key
+
+    monkeypatch.setattr(settings, "AGGREGATION_ENABLED", False)
+    monkeypatch.setattr(settings, "FLOW_CONTROL_ENABLED", False)
+    broker = InMemoryBroker()
+    redis = RedisService(memory_redis_factory())
+
+    async def scenario():
+        consumer = MessageConsumer(redis=redis, rabbitmq=broker)
+        consumer.sensor_flow.degraded = True
+        for i in range(5):
+            ts = 1714564800000 + i * 100
+            for sensor_type in ("speed", "rpm"):
+                await broker.publish_message(
+                    f"sensor.car_1.{sensor_type}",
+                    {
+                        "device_id": "car_1",
+                        "sensor_type": sensor_type,
+                        "value": float(i),
+                        "unit": "",
+                        "timestamp": ts,
+                    },
+                )
+            await broker.publish_message(
+                "timing.car_1",
+                {"device_id": "car_1", "lap_time": 90.0 + i, "timestamp": ts},
+            )
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.2)
+        consumer.stop()
+        await task
+
+        latest = await redis.get_sensor_latest("car_1")
+        speed, _ = await redis.get_history(sensor_key("car_1", "history", "speed"))
+        laps, _ = await redis.get_history(timing_key("car_1", "history"))
+        return latest, speed, laps
+
+    latest, speed, laps = asyncio.run(scenario())
+    assert [(r["sensor_type"], r["value"]) for r in latest] == [
+        ("rpm", 4.0),
+        ("speed", 4.0),
+    ]
+    assert len(speed) == 1
+    assert len(laps) == 5
+    assert all(not q.unacked and not q.pending for q in broker.queues.values())
@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from src.main import app
+from src.benchmark.fakes import memory_redis_factory
+
+# The modules the app uses (not their src.* twins)
+import api.routes.v1.rest as rest
+from services.latest_cache import LatestValueCache
+from services.redis_service import RedisService
+
+client = TestClient(app)
+
+
+def _reading(sensor_type, value, ts=1714564800000):
+    return {
+        "device_id": "car_1",
+        "sensor_type": sensor_type,
+        "value": value,
+        "unit": "kmh",
+        "last_update": ts,
+    }
+
+
+def _update(value, ts=1714564801000):
+    return json.dumps(
+        {
+            "device_id": "car_1",
+            "sensor_type": "speed",
+            "value": value,
+            "unit": "kmh",
+            "timestamp": ts,
+        }
+    ).encode()
+
+
+def test_misses_load_once_and_updates_keep_entries_current():
+    async def scenario():
+        cache = LatestValueCache(max_entries=2)
+        cache.set_live(True)
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await asyncio.sleep(0.01)
+            return [_reading("rpm", 9000.0), _reading("speed", 80.0)]
+
+        async def update_meanwhile():
+            await asyncio.sleep(0.001)
+            cache.on_sensor_update("car_1", "speed", _update(81.0))
+            return await cache.sensor_readings("car_1", load)
+
+        # Concurrent misses share one Redis load; an update that arrives while
+        # it is in flight wins over what was read
+        first, second = await asyncio.gather(
+            cache.sensor_readings("car_1", load), update_meanwhile()
+        )
+        assert len(loads) == 1
+        assert first == second
+        assert [r["value"] for r in first.value] == [9000.0, 81.0]
+
+        cache.on_sensor_update("car_1", "speed", _update(82.0, 1714564802000))
+        cached = await cache.sensor_readings("car_1", load)
+        assert len(loads) == 1
+        assert [r["value"] for r in cached.value] == [9000.0, 82.0]
+        assert cached.value[1]["last_update"] == 1714564802000
+        assert cached.etag != first.etag
+        assert (await cache.sensor_readings("car_1", load)).etag == cached.etag
+        reading = await cache.sensor_reading("car_1", "rpm", load)
+        assert reading.value["value"] == 9000.0 and len(loads) == 1
+
+        # Timing rows fold laps in like Redis does
+        async def load_row():
+            return {
+                "device_id": "car_1",
+                "latest_lap": 90.0,
+                "best_lap": 88.0,
+                "sector": None,
+                "segment": None,
+                "lap_count": 3,
+                "last_update": 1,
+            }
+
+        await cache.timing_row("car_1", load_row)
+        cache.on_timing_update(
+            {"device_id": "car_1", "lap_time": 87.5, "timestamp": 1714564802000}
+        )
+        row = (await cache.timing_row("car_1", load_row)).value
+        assert (row["latest_lap"], row["best_lap"], row["lap_count"]) == (87.5, 87.5, 4)
+
+        # Least recently read entries go first
+        assert len(cache) == 2
+        await cache.timing_board(lambda: asyncio.sleep(0, {}))
+        assert len(cache) == 2
+        await cache.sensor_readings("car_1", load)
+        assert len(loads) == 2
+
+        # A dropped subscription empties the cache and disables it
+        cache.set_live(False)
+        assert len(cache) == 0
+        await cache.sensor_readings("car_1", load)
+        await cache.sensor_readings("car_1", load)
+        assert len(loads) == 4
+
+    asyncio.run(scenario())
+
+
+def test_latest_value_routes_support_etags(monkeypatch):
+    redis = RedisService(memory_redis_factory())
+    cache = LatestValueCache()
+    cache.set_live(True)
+    monkeypatch.setattr(rest, "redis_service", redis)
+    monkeypatch.setattr(rest, "latest_values", cache)
+    asyncio.run(
+        redis.store_sensor_data(
+            "car_1",
+            {
+                "sensor_type": "speed",
+                "value": 80.0,
+                "unit": "kmh",
+                "timestamp": 1714564800000,
+            },
+        )
+    )
+
+    response = client.get("/api/v1/sensor/car_1")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.json()[0]["latest_value"] == 80.0
+
+    response = client.get("/api/v1/sensor/car_1", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["etag"] == etag
+    assert response.content == b""
+
+    cache.on_sensor_update("car_1", "speed", _update(82.5))
+    response = client.get("/api/v1/sensor/car_1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()[0]["latest_value"] == 82.5
+
+    response = client.get("/api/v1/timing")
+    assert response.status_code == 200 and response.json() == {"devices": {}}
+    assert client.get("/api/v1/sensor/car_2").status_code == 404
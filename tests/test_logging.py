@@ -0,0 +1,99 @@
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+from src.main import app
+from services.structured_logging import (
+    DeviceSampler,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    get_levels,
+    set_level,
+)
+
+# The settings the app uses (not their src.config twin)
+from config import settings
+
+client = TestClient(app)
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def _record(msg="lap %s", args=(1,), **extra):
+    record = logging.LogRecord("consumer", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extras():
+    line = JsonFormatter().format(_record(device_id="car_1"))
+    entry = json.loads(line)
+    assert entry["message"] == "lap 1"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "consumer"
+    assert entry["device_id"] == "car_1"
+
+
+def test_device_sampler_limits_each_device_and_reports_suppressed():
+    sampler = DeviceSampler(rate=0.001, burst=2)
+    passed = [sampler.filter(_record(device_id="car_1")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    # Other devices and records without a device_id are unaffected
+    assert sampler.filter(_record(device_id="car_2"))
+    assert sampler.filter(_record())
+
+    sampler._buckets["car_1"][0] = 1.0  # refilled
+    record = _record(device_id="car_1")
+    assert sampler.filter(record)
+    assert record.suppressed == 3
+
+
+def test_queue_handler_drops_when_full_and_defers_formatting():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    first = _record()
+    handler.emit(first)
+    handler.emit(_record())
+    assert handler.dropped == 1
+    queued = handler.queue.get_nowait()
+    assert queued is first
+    assert queued.msg == "lap %s"
+
+
+def test_set_level_validates_names():
+    set_level("debug", "test.logging")
+    assert logging.getLogger("test.logging").level == logging.DEBUG
+    assert get_levels()["test.logging"] == "DEBUG"
+    try:
+        set_level("LOUD")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown level accepted")
+
+
+def test_admin_logging_endpoint(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    response = client.put(
+        "/api/v1/admin/logging",
+        json={"level": "warning", "logger": "test.admin"},
+        headers=ADMIN,
+    )
+    assert response.status_code == 200
+    assert response.json()["level"] == "WARNING"
+    levels = client.get("/api/v1/admin/logging", headers=ADMIN).json()
+    assert levels["test.admin"] == "WARNING"
+
+    response = client.put(
+        "/api/v1/admin/logging", json={"level": "LOUD"}, headers=ADMIN
+    )
+    assert response.status_code == 400
+    response = client.get("/api/v1/admin/logging", headers={"X-Admin-Token": "no"})
+    assert response.status_code == 401
+
+
+def test_admin_endpoints_are_disabled_without_a_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get("/api/v1/admin/logging").status_code == 403
+    response = client.put("/api/v1/admin/logging", json={"level": "DEBUG"})
+    assert response.status_code == 403
+    assert client.delete("/api/v1/admin/queues/dead_letter").status_code == 403
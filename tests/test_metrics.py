@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+
+# Same module object the app records into; importing it as src.services.metrics
+# would register every metric a second time.
+from services.metrics import REDIS_ERRORS, QueueMetrics, redis_operation
+
+client = TestClient(app)
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "livetiming_websocket_clients" in response.text
+    assert "livetiming_redis_command_seconds" in response.text
+
+
+def test_queue_metrics_count_nacks_by_reason():
+    metrics = QueueMetrics("test_queue")
+    metrics.consumed.inc(3)
+    metrics.nacked("invalid")
+    metrics.nacked("store_error", 2)
+    text = client.get("/metrics").text
+    assert 'livetiming_messages_consumed_total{queue="test_queue"} 3.0' in text
+    assert (
+        'livetiming_messages_nacked_total{queue="test_queue",reason="store_error"} 2.0'
+        in text
+    )
+
+
+def test_redis_operation_records_failures():
+    errors = REDIS_ERRORS.labels("test_op")
+    before = errors._value.get()
+
+    async def failing():
+        with redis_operation("test_op", commands=5):
+            raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(failing())
+    assert errors._value.get() == before + 1
+    text = client.get("/metrics").text
+    assert 'livetiming_redis_pipeline_commands_count{operation="test_op"} 1.0' in text
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+from src.services.rabbitmq_service import AsyncRabbitMQService, _PublisherThread
+
+# The settings object the services read (not its src.config twin)
+from config import settings
+
+
+class FakeExchange:
+    """Confirms after a short delay; nacks routing keys containing "bad" """
+
+    def __init__(self):
+        self.published = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def publish(self, message, routing_key):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            if "bad" in routing_key:
+                raise RuntimeError("nacked")
+            self.published.append((routing_key, message))
+        finally:
+            self.in_flight -= 1
+
+
+class FakeChannel:
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.is_closed = False
+
+    async def get_exchange(self, name, ensure=True):
+        return self.exchange
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    is_closed = False
+
+    def __init__(self):
+        self.exchange = FakeExchange()
+        self.channels = 0
+
+    async def channel(self, publisher_confirms=True):
+        assert publisher_confirms
+        self.channels += 1
+        return FakeChannel(self.exchange)
+
+    async def close(self):
+        pass
+
+
+def _service():
+    service = AsyncRabbitMQService()
+    service.connection = FakeConnection()
+    return service
+
+
+def test_publish_batch_pipelines_confirms_within_the_window(monkeypatch):
+    monkeypatch.setattr(settings, "PUBLISH_CONFIRM_WINDOW", 50)
+    service = _service()
+    messages = [
+        (f"sensor.car_{i}.speed" if i % 100 else "bad.key", {"device_id": f"car_{i}"})
+        for i in range(1, 501)
+    ]
+    result = asyncio.run(service.publish_batch(messages))
+
+    exchange = service.connection.exchange
+    assert result.confirmed == 495
+    assert result.failed == [99, 199, 299, 399, 499]
+    assert exchange.max_in_flight == 50
+    routing_key, message = exchange.published[0]
+    assert message.headers == {settings.SHARD_HASH_HEADER: "car_1"}
+    assert message.delivery_mode == 2
+
+
+def test_unencodable_messages_fail_alone(monkeypatch):
+    monkeypatch.setattr(settings, "PUBLISH_CONFIRM_WINDOW", 2)
+    service = _service()
+    messages = [(f"timing.car_{i}", {"lap": i}) for i in range(6)]
+    messages[3] = ("timing.car_3", {"lap": object()})
+    result = asyncio.run(service.publish_batch(messages))
+
+    assert result.confirmed == 5
+    assert result.failed == [3]
+    published = service.connection.exchange.published
+    assert [routing_key for routing_key, _ in published] == [
+        f"timing.car_{i}" for i in (0, 1, 2, 4, 5)
+    ]
+
+
+def test_publisher_thread_is_shared_by_many_threads():
+    service = _service()
+    publisher = _PublisherThread(service)
+    results = []
+
+    def produce(worker):
+        messages = [(f"timing.car_{worker}", {"lap": n}) for n in range(100)]
+        results.append(publisher.run(service.publish_batch(messages), timeout=10))
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    publisher.close()
+
+    assert sum(result.confirmed for result in results) == 800
+    assert len(service.connection.exchange.published) == 800
+    # Pooled: concurrent producers never open more than the pool size
+    assert service.connection.channels <= settings.PUBLISH_CHANNEL_POOL_SIZE
@@ -0,0 +1,73 @@
+import asyncio
+
+from src.benchmark.fakes import memory_redis_factory
+from src.services.pubsub_relay import PubSubRelay, RelaySubscriber
+from src.services.redis_service import RedisService
+
+
+async def _until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_relay_shares_one_subscription_between_workers(tmp_path):
+    async def scenario():
+        factory = memory_redis_factory()
+        relay = PubSubRelay(str(tmp_path / "relay.sock"), RedisService(factory))
+        relay_task = asyncio.create_task(relay.run())
+        await _until(lambda: relay._server is not None)
+
+        received = [[], []]
+        states = [[], []]
+        workers = []
+        for i in range(2):
+            worker = RelaySubscriber(relay.path)
+            worker.add_pattern(
+                "timing_updates:*", lambda c, d, i=i: received[i].append((c, d))
+            )
+            worker.add_channel(
+                "admin:log_level", lambda c, d, i=i: received[i].append(d)
+            )
+            worker.add_state_handler(states[i].append)
+            workers.append(worker)
+        tasks = [asyncio.create_task(worker.run()) for worker in workers]
+        await _until(lambda: states == [[True], [True]])
+
+        publisher = factory(decode_responses=False)
+        # One Redis subscription however many workers there are
+        assert await publisher.execute_command("PUBSUB", "NUMPAT") == 1
+        await publisher.publish("timing_updates:car_1", b'{"lap_time": 90.1}')
+        await publisher.publish("sensor_updates:car_1:speed", b"not relayed")
+        await publisher.publish("admin:log_level", b"DEBUG")
+        await _until(lambda: len(received[0]) == len(received[1]) == 2)
+        assert (
+            received[0]
+            == received[1]
+            == [
+                ("timing_updates:car_1", b'{"lap_time": 90.1}'),
+                b"DEBUG",
+            ]
+        )
+
+        # A worker that cannot keep up is dropped and comes back (with a
+        # negative limit every write counts as falling behind)
+        relay.max_buffer = -1
+        await publisher.publish("admin:log_level", b"INFO")
+        await _until(lambda: relay.workers == 0)
+        relay.max_buffer = 1 << 20
+        await _until(lambda: relay.workers == 2)
+        await _until(lambda: states[0][-2:] == states[1][-2:] == [False, True])
+        assert [worker.reconnects for worker in workers] == [1, 1]
+
+        # Losing the relay is reported like losing Redis
+        relay.stop()
+        await relay_task
+        await _until(lambda: states[0][-1] is False and states[1][-1] is False)
+        for worker in workers:
+            worker.stop()
+        await asyncio.gather(*tasks)
+        await publisher.aclose()
+
+    asyncio.run(scenario())
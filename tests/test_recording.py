@@ -0,0 +1,152 @@
+import asyncio
+
+from src.recording.replay import Session, replay
+from src.recording.session import INDEX_SUFFIX, SessionReader, SessionWriter
+from src.services.codec import JSON, decode, encode
+from src.services.rabbitmq_service import PublishResult
+
+T0 = 1_700_000_000_000
+
+
+def _record(writer, device, ts_ms, kind="sensor"):
+    routing_key = f"{kind}.{device}.speed" if kind == "sensor" else f"timing.{device}"
+    body = encode({"device_id": device, "timestamp": ts_ms, "value": 1.0}, JSON)
+    writer.append(routing_key, JSON, {"device_id": device}, body, ts_ms=ts_ms)
+
+
+def _write_session(path, laps=5, per_lap=20):
+    """Two cars, ``per_lap`` sensor samples 100ms apart, then a lap each"""
+    writer = SessionWriter(path, chunk_records=7, chunk_seconds=60)
+    ts = T0
+    for _ in range(laps):
+        for _ in range(per_lap):
+            _record(writer, "car1", ts)
+            ts += 100
+        _record(writer, "car1", ts, "timing")
+        _record(writer, "car2", ts + 50, "timing")
+        ts += 100
+    writer.close()
+    return ts
+
+
+def test_round_trip_seek_and_laps(tmp_path):
+    path = tmp_path / "worker.ltr"
+    _write_session(path)
+
+    reader = SessionReader(path)
+    assert len(reader) == 5 * 22
+    assert reader.laps == {"car1": 5, "car2": 5}
+    assert [r.ts_ms for r in reader.records()] == sorted(
+        r.ts_ms for r in reader.records()
+    )
+
+    records = list(reader.records(T0 + 1234))
+    assert records[0].ts_ms == T0 + 1300
+    assert decode(records[0].body, records[0].content_type)["device_id"] == "car1"
+
+    # Lap 3 starts when the leader completes its 2nd lap
+    assert reader.lap_start(1) == T0
+    assert reader.lap_start(3) == T0 + 2 * 2100 - 100
+    assert reader.lap_start(3, "car2") == T0 + 2 * 2100 - 50
+    assert reader.lap_start(7) is None
+    reader.close()
+
+
+def test_torn_tail_and_missing_index_are_recovered(tmp_path):
+    path = tmp_path / "worker.ltr"
+    _write_session(path)
+    complete = SessionReader(path)
+    expected = list(complete.records())
+    complete.close()
+
+    # A crash in the middle of a chunk, with the index already gone
+    with open(path, "ab") as file:
+        file.write(b"\x00\x00\x10\x00partial")
+    path.with_suffix(INDEX_SUFFIX).unlink()
+
+    reader = SessionReader(path)
+    assert list(reader.records()) == expected
+    assert reader.lap_start(3) == T0 + 2 * 2100 - 100
+    reader.close()
+
+
+def test_quiet_tail_is_written_once_it_spans_a_chunk(tmp_path):
+    path = tmp_path / "worker.ltr"
+    writer = SessionWriter(path, chunk_records=100, chunk_seconds=1)
+    _record(writer, "car1", T0)
+    _record(writer, "car1", T0 + 200)
+
+    writer.flush_due(T0 + 999)
+    assert writer.records == 0
+    writer.flush_due(T0 + 1000)
+    assert writer.records == 2
+
+    reader = SessionReader(path)
+    assert [r.ts_ms for r in reader.records()] == [T0, T0 + 200]
+    reader.close()
+    writer.close()
+
+
+def test_replay_keeps_spacing_at_any_speed(tmp_path):
+    path = tmp_path / "session"
+    _write_session(path / "a.ltr", laps=1, per_lap=10)
+    writer = SessionWriter(path / "b.ltr")
+    _record(writer, "car3", T0 + 550)
+    writer.close()
+
+    session = Session(path)
+    assert len(session) == 13
+    assert [r.ts_ms for r in session.records()] == sorted(
+        r.ts_ms for r in session.records()
+    )
+
+    async def run(speed):
+        now = [0.0]
+        batches = []
+
+        async def publish(messages):
+            batches.append((now[0], messages))
+            return PublishResult(len(messages), [])
+
+        async def sleep(seconds):
+            now[0] += seconds
+
+        report = await replay(
+            session.records(),
+            publish,
+            speed=speed,
+            clock=lambda: now[0],
+            sleep=sleep,
+        )
+        return report, batches
+
+    report, batches = asyncio.run(run(2.0))
+    assert report["published"] == 13
+    # 1.05s of recording replayed in half the time, each record at its own time
+    assert report["seconds"] == 0.525
+    assert batches[5][0] == 0.25
+    assert batches[6][1][0][0] == "sensor.car3.speed"
+
+    report, batches = asyncio.run(run(0))
+    assert report["published"] == 13
+    assert len(batches) == 1
+    session.close()
+
+
+def test_replay_drops_failure_headers(tmp_path):
+    path = tmp_path / "worker.ltr"
+    writer = SessionWriter(path)
+    body = encode({"device_id": "car1", "timestamp": T0, "value": 1.0}, JSON)
+    headers = {"device_id": "car1", "x-attempts": 2, "x-reject-reason": "store_error"}
+    writer.append("sensor.car1.speed", JSON, headers, body, ts_ms=T0)
+    writer.close()
+    published = []
+
+    async def publish(messages):
+        published.extend(messages)
+        return PublishResult(len(messages), [])
+
+    reader = SessionReader(path)
+    asyncio.run(replay(reader.records(), publish, speed=0))
+    reader.close()
+    assert published == [("sensor.car1.speed", body, JSON, {"device_id": "car1"})]
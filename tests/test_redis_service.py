@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from src.services.redis_service import (
+    RedisService,
+    parse_sensor_channel,
+    sensor_channel,
+    sensor_key,
+    timing_key,
+    to_epoch_ms,
+)
+
+
+def test_to_epoch_ms_accepts_common_formats():
+    expected = 1706788800000
+    assert to_epoch_ms("2024-02-01T12:00:00Z") == expected
+    assert to_epoch_ms("2024-02-01T12:00:00") == expected
+    assert to_epoch_ms(datetime(2024, 2, 1, 12, tzinfo=timezone.utc)) == expected
+    assert to_epoch_ms(1706788800) == expected
+    assert to_epoch_ms(1706788800000) == expected
+
+
+def test_key_layout():
+    assert timing_key("ev_001", "latest") == "timing:ev_001:latest"
+    assert sensor_key("ev_001", "summary") == "sensor:ev_001:summary"
+    assert sensor_key("ev_001", "history", "battery") == "sensor:ev_001:battery:history"
+
+
+def test_sensor_channel_round_trip():
+    channel = sensor_channel("ev:001", "battery")
+    assert channel == "sensor_updates:ev:001:battery"
+    assert parse_sensor_channel(channel) == ("ev:001", "battery")
+
+
+def test_closed_service_reconnects_on_next_use():
+    pytest.importorskip("fakeredis")
+    from src.benchmark.fakes import memory_redis_factory
+
+    service = RedisService(memory_redis_factory())
+
+    async def scenario():
+        first = await service.get_connection()
+        await service.get_pubsub()
+        await service.close()
+        assert service.redis is None and service.pubsub_redis is None
+        second = await service.get_connection()
+        await second.set("key", "value")
+        value = await second.get("key")
+        await service.close()
+        return first, second, value
+
+    first, second, value = asyncio.run(scenario())
+    assert second is not first
+    assert value == "value"
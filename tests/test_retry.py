@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from src.main import app
+
+# The modules the app and consumer use (not their src.* twins)
+import api.routes.v1.admin as admin
+from config import settings
+from services.rabbitmq_service import (
+    ATTEMPTS_HEADER,
+    QUARANTINE_EXCHANGE,
+    replay_target,
+    retry_destination,
+    retry_exchange,
+)
+
+client = TestClient(app)
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def _reading(device_id="car_1"):
+    return {
+        "device_id": device_id,
+        "sensor_type": "speed",
+        "value": 88.0,
+        "unit": "km/h",
+        "timestamp": 1714564800000,
+    }
+
+
+def test_retry_tiers_then_quarantine(monkeypatch):
+    monkeypatch.setattr(settings, "RETRY_DELAYS_MS", [100, 1000])
+    monkeypatch.setattr(settings, "RETRY_MAX_ATTEMPTS", 4)
+    headers = {"device_id": "car_1"}
+    exchanges = []
+    for _ in range(4):
+        exchange, headers = retry_destination(
+            headers, "store_error", "down", "sensor_data", "sensor.car_1.speed"
+        )
+        exchanges.append(exchange)
+    assert exchanges == [
+        retry_exchange(100),
+        retry_exchange(1000),
+        retry_exchange(1000),
+        QUARANTINE_EXCHANGE,
+    ]
+    assert headers[ATTEMPTS_HEADER] == 4
+    assert headers["x-reject-reason"] == "store_error"
+
+    routing_key, clean = replay_target(headers, "ignored")
+    assert routing_key == "sensor.car_1.speed"
+    assert clean == {"device_id": "car_1"}
+
+
+class FailingRedis:
+    """RedisService stand-in whose writes always fail"""
+
+    def __init__(self):
+        self.attempts = 0
+
+    async def get_connection(self):
+        pass
+
+    async def get_pubsub(self):
+        raise ConnectionError("Redis is down")
+
+    async def store_batch(self, **payloads):
+        self.attempts += 1
+        raise ConnectionError("Redis is down")
+
+    async def close(self):
+        pass
+
+
+def test_failed_batches_are_retried_with_backoff_then_quarantined(monkeypatch):
+    from benchmark.fakes import InMemoryBroker
+    from consumer import MessageConsumer
+
+    monkeypatch.setattr(settings, "RETRY_DELAYS_MS", [20, 40])
+    monkeypatch.setattr(settings, "RETRY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "AGGREGATION_ENABLED", False)
+    broker = InMemoryBroker()
+    redis = FailingRedis()
+
+    async def scenario():
+        consumer = MessageConsumer(redis=redis, rabbitmq=broker)
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.02)
+        await broker.publish_message("sensor.car_1.speed", _reading())
+        await asyncio.sleep(0.3)
+        consumer.stop()
+        await task
+
+    asyncio.run(scenario())
+    # Stored three times (first delivery, two retries), then quarantined
+    assert redis.attempts == 3
+    quarantine = broker.queues[settings.QUARANTINE_QUEUE].pending
+    assert len(quarantine) == 1
+    _, _, routing_key, headers = quarantine[0]
+    assert routing_key == "sensor.car_1.speed"
+    assert headers[ATTEMPTS_HEADER] == 3
+    assert all(not queue.unacked for queue in broker.queues.values())
+
+    # Inspect and replay it through the admin API
+    monkeypatch.setattr(admin, "rabbitmq_service", broker)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    response = client.get("/api/v1/admin/queues/quarantine", headers=ADMIN)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["message_count"] == 1
+    (held,) = body["messages"]
+    assert held["reason"] == "store_error"
+    assert held["attempts"] == 3
+    assert held["payload"]["device_id"] == "car_1"
+
+    response = client.post("/api/v1/admin/queues/quarantine/replay", headers=ADMIN)
+    assert response.json()["replayed"] == 1
+    assert not quarantine
+    replayed = [
+        delivery
+        for name, queue in broker.queues.items()
+        if name.startswith(settings.SENSOR_QUEUE)
+        for delivery in queue.pending
+    ]
+    assert len(replayed) == 1
+    assert ATTEMPTS_HEADER not in replayed[0][3]
+    assert json.loads(replayed[0][0])["value"] == 88.0
+
+    response = client.get("/api/v1/admin/queues/unknown", headers=ADMIN)
+    assert response.status_code == 422
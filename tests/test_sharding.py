@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+from src.consumer import last_message_per_channel
+from src.services.rabbitmq_service import (
+    assign_shards,
+    consumer_queues,
+    message_headers,
+    shard_queue,
+)
+
+# The settings the services use (not their src.* twin)
+from config import settings
+
+
+def test_every_shard_has_exactly_one_worker():
+    for workers in range(1, 17):
+        owned = [
+            shard for w in range(workers) for shard in assign_shards(w, workers, 16)
+        ]
+        assert sorted(owned) == list(range(16))
+
+
+def test_consumer_queues_for_a_worker(monkeypatch):
+    monkeypatch.setattr(settings, "CONSUMER_SHARDS", 16)
+    assert consumer_queues("timing_data", [1, 5]) == [
+        "timing_data.shard.1",
+        "timing_data.shard.5",
+    ]
+    assert shard_queue("sensor_data", 3) == "sensor_data.shard.3"
+
+
+def test_messages_are_hashed_on_device_id():
+    assert message_headers({"device_id": 7, "lap_time": 80.1}) == {"device_id": "7"}
+    assert message_headers({"lap_time": 80.1}) == {}
+
+
+def test_batch_is_acked_once_per_channel():
+    def message(tag, consumer):
+        return SimpleNamespace(delivery_tag=tag, consumer_tag=consumer), {}
+
+    batch = [
+        message(1, "a"),
+        message(1, "b"),
+        message(2, "a"),
+        message(2, "b"),
+        message(3, "a"),
+    ]
+    last = last_message_per_channel(batch)
+    assert [(m.consumer_tag, m.delivery_tag) for m in last] == [("a", 3), ("b", 2)]
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from src.main import app
+from src.benchmark.fakes import memory_redis_factory
+from src.services.redis_service import RedisService
+
+# The modules the app uses (not their src.* twins)
+import api.routes.v1.rest as rest
+from config import settings
+
+T0 = 1_700_000_000_000
+
+
+def _lap(device_id, lap_time, ts, sector_times=None):
+    return {
+        "device_id": device_id,
+        "lap_time": lap_time,
+        "sector": 3,
+        "segment": "finish",
+        "sector_times": sector_times,
+        "timestamp": ts,
+    }
+
+
+def test_laps_update_running_order_gaps_and_bests():
+    async def scenario():
+        factory = memory_redis_factory()
+        redis = RedisService(factory)
+        pubsub = factory(decode_responses=True).pubsub()
+        await pubsub.subscribe(settings.STANDINGS_UPDATES_CHANNEL)
+        await pubsub.get_message(timeout=1)
+
+        async def lap(*args, **kwargs):
+            await redis.store_batch(timing_data=[_lap(*args, **kwargs)])
+            message = await pubsub.get_message(timeout=1)
+            return json.loads(message["data"])
+
+        update = await lap("car_1", 90.0, T0 + 90_000, [30.0, 30.5, 29.5])
+        assert [r["position"] for r in update["standings"]] == [1]
+        assert update["theoretical_best"] == 90.0
+        update = await lap("car_2", 91.5, T0 + 91_500, [29.0, 31.0, 31.5])
+        assert update["standings"] == [
+            {
+                "device_id": "car_2",
+                "position": 2,
+                "laps": 1,
+                "timestamp": T0 + 91_500,
+                "gap": 1.5,
+                "interval": 1.5,
+                "laps_behind": 0,
+                "interval_laps": 0,
+            }
+        ]
+        await lap("car_3", 93.0, T0 + 93_000)
+
+        # car_1 extends its lead, car_3 passes car_2 on lap 2
+        await lap("car_1", 89.0, T0 + 179_000, [29.5, 30.0, 29.5])
+        update = await lap("car_3", 87.0, T0 + 180_000)
+        assert [(r["device_id"], r["position"]) for r in update["standings"]] == [
+            ("car_3", 2),
+            ("car_2", 3),
+        ]
+        assert update["standings"][0]["gap"] == 1.0
+        lapped = update["standings"][1]
+        assert (lapped["gap"], lapped["interval"]) == (None, None)
+        assert (lapped["laps_behind"], lapped["interval_laps"]) == (1, 1)
+        assert update["records"]["best_lap"] == {"time": 87.0, "device_id": "car_3"}
+        assert update["best_sectors"] is None
+
+        update = await lap("car_2", 95.0, T0 + 186_500, [30.0, 33.0, 32.0])
+        assert update["best_lap"] == 91.5
+        assert update["best_sectors"] == [29.0, 31.0, 31.5]
+        assert update["theoretical_best"] == 91.5
+        assert update["records"]["best_sectors"] == [
+            {"time": 29.0, "device_id": "car_2"},
+            {"time": 30.0, "device_id": "car_1"},
+            {"time": 29.5, "device_id": "car_1"},
+        ]
+
+        snapshot = await redis.get_standings()
+        assert [
+            (r["device_id"], r["position"], r["gap"], r["interval"])
+            for r in snapshot["standings"]
+        ] == [
+            ("car_1", 1, 0, 0),
+            ("car_3", 2, 1.0, 1.0),
+            ("car_2", 3, 7.5, 6.5),
+        ]
+        assert snapshot["best_lap"]["device_id"] == "car_3"
+        await pubsub.aclose()
+        await redis.close()
+
+    asyncio.run(scenario())
+
+
+def test_standings_route(monkeypatch):
+    redis = RedisService(memory_redis_factory())
+    monkeypatch.setattr(rest, "redis_service", redis)
+    client = TestClient(app)
+    assert client.get("/api/v1/standings").json() == {
+        "standings": [],
+        "best_lap": None,
+        "best_sectors": None,
+    }
+
+    asyncio.run(redis.store_batch(timing_data=[_lap("car_1", 90.0, T0)]))
+    body = client.get("/api/v1/standings").json()
+    assert body["standings"][0]["device_id"] == "car_1"
+    assert body["best_lap"] == {"time": 90.0, "device_id": "car_1"}
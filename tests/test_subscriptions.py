@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from src.main import app
+from src.services.subscriptions import SubscriptionIndex, WILDCARD
+
+client = TestClient(app)
+
+
+def test_match_exact_and_wildcards():
+    index = SubscriptionIndex()
+    index.subscribe("exact", "ev_001", "battery")
+    index.subscribe("device", "ev_001", WILDCARD)
+    index.subscribe("type", WILDCARD, "battery")
+    index.subscribe("all")
+
+    assert index.match("ev_001", "battery") == {"exact", "device", "type", "all"}
+    assert index.match("ev_001", "speed") == {"device", "all"}
+    assert index.match("ev_002", "battery") == {"type", "all"}
+    assert index.match("ev_002", "speed") == {"all"}
+
+
+def test_unsubscribe_and_remove():
+    index = SubscriptionIndex()
+    index.subscribe("a", "ev_001", "battery")
+    index.subscribe("a", WILDCARD, "speed")
+    index.unsubscribe("a", "ev_001", "battery")
+    assert index.match("ev_001", "battery") == set()
+    assert index.subscriptions("a") == [(WILDCARD, "speed")]
+
+    index.remove("a")
+    assert index.match("ev_001", "speed") == set()
+    assert len(index) == 0
+
+
+def test_sensor_socket_subscription_commands():
+    with client.websocket_connect("/api/v1/ws/sensor/temperature?device_id=ev_001") as ws:
+        ws.send_text('{"action": "subscribe", "sensor_type": "battery"}')
+        reply = ws.receive_json()
+        assert reply["type"] == "subscriptions"
+        assert reply["subscriptions"] == [
+            {"device_id": "*", "sensor_type": "battery"},
+            {"device_id": "ev_001", "sensor_type": "temperature"},
+        ]
+
+        ws.send_text('{"action": "unsubscribe", "device_id": "ev_001", "sensor_type": "temperature"}')
+        assert ws.receive_json()["subscriptions"] == [
+            {"device_id": "*", "sensor_type": "battery"}
+        ]
+
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
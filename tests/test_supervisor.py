@@ -0,0 +1,66 @@
+import threading
+import time
+
+from src.supervisor import Worker, WorkerSupervisor
+
+
+class FakeProcess:
+    pid = 0
+
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+def test_resize_stops_old_workers_once_new_ones_consume():
+    supervisor = WorkerSupervisor(2, shards=4, ready_timeout=5)
+    events = []
+
+    def spawn(index, shards):
+        worker = Worker(index, shards, FakeProcess(), threading.Event())
+
+        def consuming():
+            events.append(("ready", index))
+            worker.ready.set()
+
+        # Spawned processes take a while to import, connect and subscribe
+        threading.Timer(0.05 * (index + 1), consuming).start()
+        return worker
+
+    def stop_worker(worker):
+        events.append(("stop", worker.index))
+
+    supervisor._spawn = spawn
+    supervisor._stop_worker = stop_worker
+    supervisor.start()
+    time.sleep(0.2)
+    events.clear()
+
+    supervisor.resize(3)
+    assert supervisor.workers == 3
+    assert sorted(events[:3]) == [("ready", 0), ("ready", 1), ("ready", 2)]
+    assert events[3:] == [("stop", 0), ("stop", 1)]
+
+
+def test_resize_gives_up_waiting_for_a_worker_that_died():
+    supervisor = WorkerSupervisor(1, shards=2, ready_timeout=5)
+    stopped = []
+
+    def spawn(index, shards):
+        process = FakeProcess()
+        ready = threading.Event()
+        if index == 1:
+            process.alive = False  # crashed while starting
+        else:
+            ready.set()
+        return Worker(index, shards, process, ready)
+
+    supervisor._spawn = spawn
+    supervisor._stop_worker = lambda worker: stopped.append(worker.index)
+    supervisor.start()
+    started = time.monotonic()
+    supervisor.resize(2)
+    assert time.monotonic() - started < 1
+    assert stopped == [0]
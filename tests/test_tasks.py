@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+import src.services.tasks as tasks_module
+from src.services.tasks import TaskSupervisor
+
+
+def test_crashed_tasks_restart_until_stopped(monkeypatch):
+    monkeypatch.setattr(tasks_module.settings, "TASK_RESTART_MAX_SECONDS", 0.01)
+
+    async def scenario():
+        tasks = TaskSupervisor()
+        runs = []
+
+        async def flaky():
+            runs.append(1)
+            if len(runs) < 3:
+                raise ConnectionError("redis went away")
+            await asyncio.Event().wait()
+
+        async def once():
+            pass
+
+        tasks.start("flaky", flaky)
+        tasks.start("once", once)
+        with pytest.raises(ValueError):
+            tasks.start("flaky", flaky)
+        for _ in range(100):
+            if len(runs) == 3:
+                break
+            await asyncio.sleep(0.01)
+        assert len(runs) == 3
+        assert tasks.status() == {"flaky": "running", "once": "finished"}
+
+        await tasks.stop(timeout=1)
+        assert tasks.status() == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from src.main import app
+from src.services.timing_board import TimingBoard
+
+# The modules the app uses (not their src.* twins)
+from api.routes.v1.websocket import ConnectionManager
+from services.latest_cache import LatestValueCache
+
+client = TestClient(app)
+
+
+def test_deltas_only_carry_changed_fields():
+    board = TimingBoard()
+    board.load({"ev_001": {"latest_lap": 90.0, "best_lap": 88.0, "lap_count": 4}})
+
+    board.apply({"device_id": "ev_001", "lap_time": 91.0, "timestamp": 1706788800})
+    board.apply(
+        {"device_id": "ev_002", "lap_time": 87.5, "sector": 2, "timestamp": 1706788801}
+    )
+    delta = board.take_delta()
+
+    assert delta["type"] == "delta" and delta["seq"] == 1
+    assert delta["devices"]["ev_001"] == {
+        "latest_lap": 91.0,
+        "lap_count": 5,
+        "last_update": 1706788800000,
+    }
+    assert delta["devices"]["ev_002"]["best_lap"] == 87.5
+    assert board.take_delta() is None
+
+
+def test_updates_between_frames_are_coalesced():
+    board = TimingBoard()
+    board.apply({"device_id": "ev_001", "lap_time": 92.0, "timestamp": 1})
+    board.apply({"device_id": "ev_001", "lap_time": 89.0, "timestamp": 2})
+    delta = board.take_delta()
+
+    assert delta["devices"]["ev_001"]["latest_lap"] == 89.0
+    assert delta["devices"]["ev_001"]["best_lap"] == 89.0
+    assert board.snapshot()["seq"] == 1
+    assert board.snapshot()["devices"]["ev_001"]["lap_count"] == 2
+
+
+def test_timing_socket_starts_with_snapshot():
+    with client.websocket_connect("/api/v1/ws/timing") as ws:
+        first = ws.receive_json()
+        assert first["type"] == "snapshot"
+        ws.send_text('{"action": "snapshot"}')
+        assert ws.receive_json()["type"] == "snapshot"
+
+
+T0 = 1714564800000
+
+
+def test_laps_already_on_the_board_are_ignored():
+    board = TimingBoard()
+    board.load({"ev_001": {"latest_lap": 90.0, "lap_count": 4, "last_update": T0}})
+    board.apply({"device_id": "ev_001", "lap_time": 90.0, "timestamp": T0})
+    assert board.take_delta() is None
+    board.apply({"device_id": "ev_001", "lap_time": 89.0, "timestamp": T0 + 1000})
+    assert board.take_delta()["devices"]["ev_001"]["lap_count"] == 5
+
+
+class SlowRedis:
+    """Serves a timing board that was read before ``release`` is set"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.release = asyncio.Event()
+
+    async def get_timing_board(self):
+        await self.release.wait()
+        return self.rows
+
+
+def _lap(lap_time, ts):
+    message = {"device_id": "ev_001", "lap_time": lap_time, "timestamp": ts}
+    return json.dumps(message).encode()
+
+
+def test_laps_published_while_the_board_loads_are_kept():
+    async def scenario():
+        redis = SlowRedis(
+            {
+                "ev_001": {
+                    "latest_lap": 91.0,
+                    "best_lap": 90.0,
+                    "lap_count": 3,
+                    "last_update": T0,
+                }
+            }
+        )
+        manager = ConnectionManager(redis=redis, latest=LatestValueCache())
+        manager._on_subscribed(True)
+        # Subscribed before the snapshot is read: one lap is already in it,
+        # the next one is not
+        manager.on_timing_update("timing_updates:ev_001", _lap(91.0, T0))
+        manager.on_timing_update("timing_updates:ev_001", _lap(89.5, T0 + 1000))
+        redis.release.set()
+        await manager._board_load
+        return manager.timing_board.snapshot()["devices"]["ev_001"]
+
+    row = asyncio.run(scenario())
+    assert row["lap_count"] == 4
+    assert (row["latest_lap"], row["best_lap"]) == (89.5, 89.5)
+    assert row["last_update"] == T0 + 1000
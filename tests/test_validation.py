@@ -0,0 +1,191 @@
+import asyncio
+import json
+
+import pytest
+from src.processing.validation import (
+    DECODE_ERROR,
+    INVALID_TIMESTAMP,
+    INVALID_VALUE,
+    MISSING_FIELD,
+    NOT_AN_OBJECT,
+    SENSOR_VALIDATOR,
+    TIMING_VALIDATOR,
+)
+from services.codec import CodecError
+
+
+def _reading(**overrides):
+    reading = {
+        "device_id": "car_1",
+        "sensor_type": "speed",
+        "value": 120.5,
+        "unit": "km/h",
+        "timestamp": "2024-05-01T12:00:00Z",
+    }
+    reading.update(overrides)
+    return reading
+
+
+def test_valid_batch_is_normalized():
+    normalized, rejected = SENSOR_VALIDATOR.validate(
+        [
+            _reading(),
+            _reading(timestamp=1714564800),  # epoch seconds
+            _reading(timestamp="2024-05-01T12:00:00", value="3"),
+        ]
+    )
+    assert rejected == []
+    assert [data["timestamp"] for data in normalized] == [1714564800000] * 3
+    assert normalized[2]["value"] == 3.0
+    assert set(normalized[0]) == {
+        "device_id",
+        "sensor_type",
+        "value",
+        "unit",
+        "timestamp",
+    }
+
+
+def test_missing_timestamp_is_stamped():
+    (data,), _ = TIMING_VALIDATOR.validate([{"device_id": "car_1", "lap_time": 91.2}])
+    assert isinstance(data["timestamp"], int)
+    assert data["sector"] is None
+
+
+def test_invalid_entries_are_rejected_with_reasons():
+    payloads = [
+        _reading(),
+        CodecError("bad json"),
+        _reading(value="fast"),
+        _reading(timestamp="yesterday"),
+        {"device_id": "car_1", "value": 1.0, "unit": "V"},
+        [1, 2, 3],
+        _reading(value=float("nan")),
+        _reading(device_id="car_2"),
+    ]
+    normalized, rejected = SENSOR_VALIDATOR.validate(payloads)
+    assert [(r.index, r.reason) for r in rejected] == [
+        (1, DECODE_ERROR),
+        (2, INVALID_VALUE),
+        (3, INVALID_TIMESTAMP),
+        (4, MISSING_FIELD),
+        (5, NOT_AN_OBJECT),
+        (6, INVALID_VALUE),
+    ]
+    assert rejected[1].detail.startswith("value:")
+    assert [data is not None for data in normalized] == [True] + [False] * 6 + [True]
+
+
+def test_consumer_dead_letters_invalid_messages():
+    pytest.importorskip("fakeredis")
+    from benchmark.fakes import InMemoryBroker, memory_redis_factory
+    from config import settings
+    from consumer import MessageConsumer
+    from services.redis_service import RedisService
+
+    async def scenario():
+        broker = InMemoryBroker()
+        redis = RedisService(memory_redis_factory())
+        consumer = MessageConsumer(redis=redis, rabbitmq=broker)
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.05)
+        await broker.publish_message("sensor.car_1.speed", _reading())
+        await broker.publish_message("sensor.car_1.speed", _reading(value="fast"))
+        await broker.publish_message("timing.car_1", {"device_id": "car_1"})
+        await asyncio.sleep(0.2)
+
+        dead = broker.queues[settings.DEAD_LETTER_QUEUE].pending
+        (latest,) = await redis.get_sensor_latest("car_1", "speed")
+        consumer.stop()
+        await task
+        return list(dead), latest, broker
+
+    dead, latest, broker = asyncio.run(scenario())
+    assert latest["value"] == 120.5
+    assert latest["last_update"] == 1714564800000
+    reasons = sorted(headers["x-reject-reason"] for _, _, _, headers in dead)
+    assert reasons == [INVALID_VALUE, MISSING_FIELD]
+    body, _, routing_key, headers = dead[0]
+    assert headers["x-original-routing-key"] == routing_key
+    assert json.loads(body)["device_id"] == "car_1"
+    # Everything was settled: stored, or acked after dead-lettering
+    assert all(not q.unacked for q in broker.queues.values())
+
+
+def test_consumer_publishes_normalized_payloads():
+    pytest.importorskip("fakeredis")
+    from benchmark.fakes import InMemoryBroker, memory_redis_factory
+    from consumer import MessageConsumer
+    from services.redis_service import RedisService
+
+    async def scenario():
+        broker = InMemoryBroker()
+        redis = RedisService(memory_redis_factory())
+        pubsub = await redis.get_pubsub()
+        await pubsub.psubscribe("sensor_updates:*")
+        consumer = MessageConsumer(redis=redis, rabbitmq=broker)
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.05)
+        # Already normalized: published as received, unknown fields included
+        await broker.publish_message(
+            "sensor.car_1.rpm",
+            _reading(sensor_type="rpm", timestamp=1714564800000, sent_at_ns=1),
+        )
+        unstamped = _reading()
+        del unstamped["timestamp"]
+        await broker.publish_message("sensor.car_1.speed", unstamped)
+        await asyncio.sleep(0.2)
+        consumer.stop()
+        await task
+
+        published = {}
+        while True:
+            message = await pubsub.get_message(timeout=0.01)
+            if message is None:
+                break
+            if message["type"] == "pmessage":
+                published[message["channel"].decode()] = json.loads(message["data"])
+        await pubsub.aclose()
+        (speed,) = await redis.get_sensor_latest("car_1", "speed")
+        return published, speed
+
+    published, speed = asyncio.run(scenario())
+    assert published["sensor_updates:car_1:rpm"]["sent_at_ns"] == 1
+    assert published["sensor_updates:car_1:speed"]["timestamp"] == speed["last_update"]
+
+
+def test_invalid_messages_are_rejected_when_dead_lettering_fails():
+    pytest.importorskip("fakeredis")
+    from benchmark.fakes import InMemoryBroker, memory_redis_factory
+    from config import settings
+    from consumer import MessageConsumer
+    from services.redis_service import RedisService
+
+    async def scenario():
+        broker = InMemoryBroker()
+
+        async def dead_letter(message, reason, detail, queue):
+            return False
+
+        broker.dead_letter = dead_letter
+        consumer = MessageConsumer(
+            redis=RedisService(memory_redis_factory()), rabbitmq=broker
+        )
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.05)
+        # The invalid message is the last of its channel: the ack must stop
+        # short of it
+        await broker.publish_message("sensor.car_1.speed", _reading())
+        await broker.publish_message("sensor.car_1.speed", _reading(value="fast"))
+        await asyncio.sleep(0.2)
+        consumer.stop()
+        await task
+        return [
+            queue
+            for name, queue in broker.queues.items()
+            if name.startswith(settings.SENSOR_QUEUE) and queue.acked + queue.dropped
+        ]
+
+    (queue,) = asyncio.run(scenario())
+    assert (queue.acked, queue.dropped) == (1, 1)
+    assert not queue.unacked